@@ -0,0 +1,351 @@
+# This file includes the classes used to record dense checkpoints of a game as keyframes and deltas
+
+############################################################################################
+# IMPORTS
+############################################################################################
+
+# Import imitation game classes made in the first notebooks
+from imitationGameClasses import GameState, CompactGameState, Phoneme, Sound, merge_similar_sounds_of_game_state, storage_dtypes;
+from communityImitationGameClasses import CommunityGameState, CommunityGameEngine;
+
+# Deep copy the agents of keyframes
+import copy;
+
+# Used for datatype representation
+import numpy as np;
+
+# Used for saving and loading series
+import pickle;
+import gzip;
+import os;
+
+############################################################################################
+# CHECKPOINT SERIES
+############################################################################################
+
+class CheckpointDelta:
+    """This is a class used to store the changes of a population between two checkpoints.
+    Sounds are identified by sound ids that are unique within a series, agents by their position in the new population."""
+    def __init__(self):
+        """Creates an empty Checkpoint Delta instance."""
+        # Names of the removed agents, copies and sound ids of the added agents, and the agent names when the order changed otherwise
+        self.removed_agents = [];
+        self.added_agents = [];
+        self.order = None;
+
+        # New game counts (games, success, speaker, imitator) and new community roles of agents
+        self.game_positions = np.zeros(0, dtype=np.int32);
+        self.game_counts = np.zeros((0, 4), dtype=np.int64);
+        self.roles = [];
+
+        # Removed sounds, new phonemes (p, h, r) of moved sounds and usage and success increments of used sounds
+        self.removed_sounds = np.zeros(0, dtype=np.int32);
+        self.moved_sounds = np.zeros(0, dtype=np.int32);
+        self.moved_phonemes = np.zeros((0, 3), dtype=np.float64);
+        self.counted_sounds = np.zeros(0, dtype=np.int32);
+        self.count_increments = np.zeros((0, 2), dtype=np.int32);
+
+        # Agent position, sound id, phoneme and usage and success counts of added sounds
+        self.added_positions = np.zeros(0, dtype=np.int32);
+        self.added_sounds = np.zeros(0, dtype=np.int32);
+        self.added_phonemes = np.zeros((0, 3), dtype=np.float64);
+        self.added_counts = np.zeros((0, 2), dtype=np.int64);
+
+        # Sound ids of agents whose sounds were reordered
+        self.sound_orders = {};
+
+class CheckpointSeries:
+    """This is a class used to record the population of a game at many checkpoints in little memory.
+    Every keyframe_interval checkpoints the full population is stored (a keyframe), the checkpoints in between only store
+    the changes since the previous checkpoint (a delta): changed phonemes, counter increments and added and removed sounds and agents.
+    Any checkpoint is rebuilt by applying the deltas to the nearest keyframe before it, and gives the same game state
+    as the engine would have captured. For example
+        series = CheckpointSeries(keyframe_interval = 20);
+        series.play(game_engine, list(range(100, 10001, 100)));
+        game_state = series.game_state(5000);
+    With float64 precision the rebuilt game states equal those captured by the engine, see differing_iterations."""
+    def __init__(self, keyframe_interval: int = 20, precision: str = "float64"):
+        """Creates a Checkpoint Series instance.
+        - keyframe_interval: amount of checkpoints between two keyframes
+        - precision: storage precision of the phonemes and counts, see storage_precisions, only "float64" rebuilds the exact game states"""
+        storage_dtypes(precision);
+        self.keyframe_interval = keyframe_interval;
+        self.precision = precision;
+
+        # Iteration, keyframe (CompactGameState of the agents and their sound ids, or None) and CheckpointDelta (or None) of every recorded checkpoint
+        self.iterations = [];
+        self.keyframes = [];
+        self.deltas = [];
+
+        # Game state class of the recorded engine, and the community behaviours agents change to when changing role
+        self.state_class = GameState;
+        self.community_behaviours = None;
+
+        # Sounds of every agent at the previous checkpoint, the sound objects are kept so that their id is never reused
+        #   agent name -> (agent, [(sound, sound id, p, h, r, usage count, success count)], game counts, community role)
+        self.previous_agents = {};
+        self.previous_order = [];
+        self.next_sound_id = 0;
+
+    def __len__(self):
+        """Returns the amount of recorded checkpoints."""
+        return len(self.iterations);
+
+    ########################################################################################
+    # Recording
+
+    def play(self, engine, checkpoints: list):
+        """Plays the remaining iterations of a live engine up to its last checkpoint, recording every checkpoint.
+        The engine calls record at the point where it would capture a game state, e.g. before a community ages."""
+        checkpoints = [checkpoint for checkpoint in checkpoints if engine.iteration < checkpoint <= engine.iterations];
+        if not checkpoints:
+            return;
+
+        engine.checkpoint_recorder = self;
+        try:
+            engine.play_iterations(max(checkpoints) - engine.iteration, checkpoints);
+        finally:
+            del engine.checkpoint_recorder;
+
+    def sound_entries(self, agent):
+        """Returns the sound entries of an agent, see previous_agents, giving new sounds a new id."""
+        previous_sound_ids = {id(entry[0]): entry[1] for entry in self.previous_agents[agent.name][1]} if agent.name in self.previous_agents else {};
+
+        entries = [];
+        for sound in agent.known_sounds:
+            sound_id = previous_sound_ids.get(id(sound));
+            if sound_id is None:
+                sound_id = self.next_sound_id;
+                self.next_sound_id += 1;
+            entries.append((sound, sound_id, sound.phoneme.p, sound.phoneme.h, sound.phoneme.r, sound.usage_count, sound.success_count));
+
+        return entries;
+
+    def make_delta(self, engine, entries: dict):
+        """Returns the CheckpointDelta of a live engine since the previous checkpoint.
+        - entries: sound entries of every agent, see sound_entries"""
+        delta = CheckpointDelta();
+        delta.removed_agents = [name for name in self.previous_order if name not in entries];
+        delta.added_agents = [(copy.deepcopy(agent), [entry[1] for entry in entries[agent.name]])
+                                for agent in engine.agents if agent.name not in self.previous_agents];
+
+        # Agents are only appended and removed, the order is only stored when this did not hold
+        order = [agent.name for agent in engine.agents];
+        expected_order = [name for name in self.previous_order if name in entries] + [agent.name for agent, _ in delta.added_agents];
+        delta.order = order if order != expected_order else None;
+
+        game_positions, game_counts = [], [];
+        removed_sounds = [];
+        moved_sounds, moved_phonemes = [], [];
+        counted_sounds, count_increments = [], [];
+        added_positions, added_sounds, added_phonemes, added_counts = [], [], [], [];
+        for position, agent in enumerate(engine.agents):
+            if agent.name not in self.previous_agents:
+                continue;
+            _, previous_entries, previous_game_counts, previous_role = self.previous_agents[agent.name];
+
+            agent_game_counts = (agent.games_count, agent.success_count, agent.speaker_count, agent.imitator_count);
+            if agent_game_counts != previous_game_counts:
+                game_positions.append(position);
+                game_counts.append(agent_game_counts);
+
+            role = getattr(agent, "community_role", None);
+            if role != previous_role:
+                delta.roles.append((position, role));
+
+            previous_entries = {entry[1]: entry for entry in previous_entries};
+            kept_sounds = [];
+            for _, sound_id, p, h, r, usage_count, success_count in entries[agent.name]:
+                previous = previous_entries.pop(sound_id, None);
+                if previous is None:
+                    added_positions.append(position);
+                    added_sounds.append(sound_id);
+                    added_phonemes.append((p, h, r));
+                    added_counts.append((usage_count, success_count));
+                    continue;
+                kept_sounds.append(sound_id);
+                if (p, h, r) != previous[2:5]:
+                    moved_sounds.append(sound_id);
+                    moved_phonemes.append((p, h, r));
+                if (usage_count, success_count) != previous[5:7]:
+                    counted_sounds.append(sound_id);
+                    count_increments.append((usage_count - previous[5], success_count - previous[6]));
+            removed_sounds += previous_entries;
+
+            # Sounds are only appended and removed, the order is only stored when this did not hold
+            if kept_sounds != [entry[1] for entry in self.previous_agents[agent.name][1] if entry[1] not in previous_entries]:
+                delta.sound_orders[position] = [entry[1] for entry in entries[agent.name]];
+
+        phoneme_dtype, count_dtype = storage_dtypes(self.precision);
+        delta.game_positions = np.array(game_positions, dtype=np.int32);
+        delta.game_counts = np.array(game_counts, dtype=count_dtype).reshape(-1, 4);
+        delta.removed_sounds = np.array(removed_sounds, dtype=np.int32);
+        delta.moved_sounds = np.array(moved_sounds, dtype=np.int32);
+        delta.moved_phonemes = np.array(moved_phonemes, dtype=phoneme_dtype).reshape(-1, 3);
+        delta.counted_sounds = np.array(counted_sounds, dtype=np.int32);
+        delta.count_increments = np.array(count_increments, dtype=count_dtype).reshape(-1, 2);
+        delta.added_positions = np.array(added_positions, dtype=np.int32);
+        delta.added_sounds = np.array(added_sounds, dtype=np.int32);
+        delta.added_phonemes = np.array(added_phonemes, dtype=phoneme_dtype).reshape(-1, 3);
+        delta.added_counts = np.array(added_counts, dtype=count_dtype).reshape(-1, 2);
+
+        return delta;
+
+    def record(self, engine):
+        """Records the population of a live engine at its current iteration, called by the engine during play."""
+        if not self.iterations:
+            self.state_class = CommunityGameState if isinstance(engine, CommunityGameEngine) else GameState;
+            self.community_behaviours = copy.deepcopy(getattr(engine, "community_behaviours", None));
+
+        entries = {agent.name: self.sound_entries(agent) for agent in engine.agents};
+
+        if len(self.iterations) % self.keyframe_interval == 0:
+            # The live agents are stored without copying them first
+            game_state = self.state_class.__new__(self.state_class);
+            game_state.agents = engine.agents;
+            game_state.iteration = engine.iteration;
+            keyframe = (CompactGameState(game_state, self.precision), [[entry[1] for entry in entries[agent.name]] for agent in engine.agents]);
+            delta = None;
+        else:
+            keyframe = None;
+            delta = self.make_delta(engine, entries);
+
+        self.iterations.append(engine.iteration);
+        self.keyframes.append(keyframe);
+        self.deltas.append(delta);
+
+        self.previous_agents = {agent.name: (agent, entries[agent.name],
+                                             (agent.games_count, agent.success_count, agent.speaker_count, agent.imitator_count),
+                                             getattr(agent, "community_role", None))
+                                    for agent in engine.agents};
+        self.previous_order = [agent.name for agent in engine.agents];
+
+    ########################################################################################
+    # Rebuilding game states
+
+    def apply_delta(self, agents: list, sound_ids: list, sounds: dict, delta):
+        """Applies a CheckpointDelta to rebuilt agents, returning the agents and their lists of sound ids after it.
+        - agents: rebuilt agents in the order of the previous checkpoint
+        - sound_ids: list of sound ids of every agent
+        - sounds: sound of every sound id, changed in place"""
+        # Population changes
+        removed_agents = set(delta.removed_agents);
+        kept = [index for index, agent in enumerate(agents) if agent.name not in removed_agents];
+        agents = [agents[index] for index in kept];
+        sound_ids = [sound_ids[index] for index in kept];
+        for agent, agent_sound_ids in copy.deepcopy(delta.added_agents):
+            agents.append(agent);
+            sound_ids.append(agent_sound_ids);
+            sounds.update(zip(agent_sound_ids, agent.known_sounds));
+        if delta.order is not None:
+            positions = {agent.name: index for index, agent in enumerate(agents)};
+            agents = [agents[positions[name]] for name in delta.order];
+            sound_ids = [sound_ids[positions[name]] for name in delta.order];
+
+        for position, agent_game_counts in zip(delta.game_positions.tolist(), delta.game_counts.tolist()):
+            agent = agents[position];
+            agent.games_count, agent.success_count, agent.speaker_count, agent.imitator_count = agent_game_counts;
+        for position, role in delta.roles:
+            agents[position].change_agent_role_and_behaviour(role, self.community_behaviours[role]);
+
+        # Sound changes, a new sound synthesises the same noiseless utterance as the improved one
+        for sound_id in delta.removed_sounds.tolist():
+            del sounds[sound_id];
+        for sound_id, phoneme in zip(delta.moved_sounds.tolist(), delta.moved_phonemes.tolist()):
+            sounds[sound_id].improve(Sound(Phoneme(*phoneme)));
+        for sound_id, (usage_increment, success_increment) in zip(delta.counted_sounds.tolist(), delta.count_increments.tolist()):
+            sounds[sound_id].usage_count += usage_increment;
+            sounds[sound_id].success_count += success_increment;
+
+        added = {};
+        for position, sound_id, phoneme, (usage_count, success_count) in zip(delta.added_positions.tolist(), delta.added_sounds.tolist(),
+                                                                              delta.added_phonemes.tolist(), delta.added_counts.tolist()):
+            sound = Sound(Phoneme(*phoneme));
+            sound.usage_count = usage_count;
+            sound.success_count = success_count;
+            sounds[sound_id] = sound;
+            added.setdefault(position, []).append(sound_id);
+
+        for position, agent in enumerate(agents):
+            if position in delta.sound_orders:
+                sound_ids[position] = delta.sound_orders[position];
+            else:
+                sound_ids[position] = [sound_id for sound_id in sound_ids[position] if sound_id in sounds] + added.get(position, []);
+            agent.known_sounds = [sounds[sound_id] for sound_id in sound_ids[position]];
+
+        return agents, sound_ids;
+
+    def populations(self, start: int = 0, stop: int = None):
+        """Yields the index, iteration and rebuilt (unmerged) agents of the checkpoints from start up to stop,
+        applying every delta once. The yielded agents are changed by the next checkpoint, copy them to keep them."""
+        stop = len(self.iterations) if stop is None else stop;
+        keyframe_index = max(index for index in range(start + 1) if self.keyframes[index] is not None);
+
+        for index in range(keyframe_index, stop):
+            if self.keyframes[index] is not None:
+                agents = self.keyframes[index][0].restore_agents();
+                sound_ids = [list(agent_sound_ids) for agent_sound_ids in self.keyframes[index][1]];
+                sounds = {sound_id: sound for agent, agent_sound_ids in zip(agents, sound_ids)
+                                          for sound_id, sound in zip(agent_sound_ids, agent.known_sounds)};
+            else:
+                agents, sound_ids = self.apply_delta(agents, sound_ids, sounds, self.deltas[index]);
+
+            if index >= start:
+                yield index, self.iterations[index], agents;
+
+    def make_game_state(self, agents: list, iteration: int):
+        """Returns the game state of rebuilt agents, merged the same way as a captured game state."""
+        game_state = self.state_class(agents, iteration);
+        merge_similar_sounds_of_game_state(game_state);
+
+        return game_state;
+
+    def game_state(self, iteration: int):
+        """Returns the game state of the checkpoint at the given iteration."""
+        if iteration not in self.iterations:
+            raise KeyError(f"No checkpoint was recorded at iteration {iteration}.");
+
+        index = self.iterations.index(iteration);
+        for _, _, agents in self.populations(index, index + 1):
+            return self.make_game_state(agents, iteration);
+
+    def game_states(self):
+        """Returns the game states of all checkpoints, rebuilt in a single pass over the deltas."""
+        return [self.make_game_state(agents, iteration) for _, iteration, agents in self.populations()];
+
+    def differing_iterations(self, game_states: dict):
+        """Returns the iterations at which the rebuilt game state differs from the captured one, to check a series.
+        Agents are compared in order on their community role, game counts and the phonemes and counts of their sounds,
+        not on their names which are random, so the game states can come from a game played again from the same seed.
+        - game_states: dictionary with the game states captured by the engine at the recorded iterations, e.g. from play_iterations"""
+        def summary(game_state):
+            return [(getattr(agent, "community_role", None),
+                     (agent.games_count, agent.success_count, agent.speaker_count, agent.imitator_count),
+                     [(sound.phoneme.p, sound.phoneme.h, sound.phoneme.r, sound.usage_count, sound.success_count) for sound in agent.known_sounds])
+                        for agent in game_state.agents];
+
+        return [iteration for iteration, game_state in zip(self.iterations, self.game_states())
+                    if iteration in game_states and summary(game_state) != summary(game_states[iteration])];
+
+    ########################################################################################
+    # Saving
+
+    def save(self, path: str, compresslevel: int = 6):
+        """Writes the recorded checkpoints to a gzip compressed file, recording cannot be continued after loading."""
+        temporary_path = path + ".tmp";
+        with gzip.open(temporary_path, "wb", compresslevel=compresslevel) as file:
+            pickle.dump((self.keyframe_interval, self.precision, self.iterations, self.keyframes, self.deltas, self.state_class, self.community_behaviours),
+                        file, protocol=pickle.HIGHEST_PROTOCOL);
+        os.replace(temporary_path, path);
+
+    @classmethod
+    def load(cls, path: str):
+        """Returns the checkpoint series written by save."""
+        with gzip.open(path, "rb") as file:
+            keyframe_interval, precision, iterations, keyframes, deltas, state_class, community_behaviours = pickle.load(file);
+
+        series = cls(keyframe_interval, precision);
+        series.iterations, series.keyframes, series.deltas = iterations, keyframes, deltas;
+        series.state_class, series.community_behaviours = state_class, community_behaviours;
+
+        return series;
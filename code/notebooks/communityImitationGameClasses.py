@@ -5,7 +5,7 @@
 ############################################################################################
 
 # Import imitation game classes made in the previous notebook
-from imitationGameClasses import Agent, Synthesizer, BarkOperator, Sound, Utterance, Statistics;
+from imitationGameClasses import Agent, SlottedObject, Synthesizer, BarkOperator, Sound, Utterance, GameState, Statistics, plotting, save_engine_state, load_engine_state, play_and_save, ConvergenceMonitor, SnapshotWriter, trace_game_start, trace_game_end, merge_similar_sounds_of_game_state;
 
 # Used for easier numerical operations
 import random as rnd;
@@ -16,11 +16,17 @@ from enum import Enum;
 # Deep copy lists
 import copy;
 
-# Used for saving and loading variables
-import pickle;
+# Used for caching the role indexes and views of game states
+import weakref;
 
-# Used for plotting
-import matplotlib.pyplot as plt;
+# Used for datatype representation
+import numpy as np;
+
+# Used for reporting progress and agent events
+from progressReporterClasses import ProgressReporter, PrintProgressReporter, report_event;
+
+# Used for selecting the backend of the agents
+from imitationGameKernels import resolve_kernel_backend;
 
 ############################################################################################
 # COMMUNITY ROLE ENUM
@@ -42,8 +48,10 @@ class CommunityRole(Enum):
 # COMMUNITY BEHAVIOUR
 ############################################################################################
 
-class CommunityBehaviour():
+class CommunityBehaviour(SlottedObject):
     """This is a class used to represent the innfluence and other community based parameters for an agent."""
+    __slots__ = ("new_sound_prob", "phoneme_step_size", "influence_dictionary", "synthesizer", "influential_agent_types");
+
     def __init__(self, new_sound_prob: float, phoneme_step_size: float, influence_dictionary: float,
                  synthesizer: Synthesizer, influential_agent_types: list):
         """Creates a CommunityBehaviour instance."""
@@ -69,13 +77,15 @@ class CommunityBehaviour():
 class CommunityAgent(Agent):
     """This is an extension of the agent class so that the agent represents
     an agent in the described community setting."""
+    __slots__ = ("community_role", "community_behaviour", "oponent_role");
+
     # Constructor
     def __init__(self, synthesizer: Synthesizer, bark_operator: BarkOperator,
                     community_role : CommunityRole, community_behaviour: CommunityBehaviour,
                     logger: bool = False,
                     phoneme_step_size: float = 0.1, max_similar_sound_loops: int = 20, max_semi_random_loop: int = 5,
                     sound_threshold_game: float = 0.5, sound_threshold_agent:float = 0.7, sound_minimum_tries: int = 5,
-                    cleanup_prob = 0.1, new_sound_prob = 0.01, merge_prob = 1      
+                    cleanup_prob = 0.1, new_sound_prob = 0.01, merge_prob = 1, kernel_backend: str = "python"
                 ):
         
         # Use init of Agent
@@ -85,7 +95,7 @@ class CommunityAgent(Agent):
                        max_semi_random_loop = max_semi_random_loop, sound_threshold_game = sound_threshold_game,
                        sound_threshold_agent = sound_threshold_agent, sound_minimum_tries = sound_minimum_tries,
                        cleanup_prob = cleanup_prob, new_sound_prob = new_sound_prob,
-                       merge_prob = merge_prob);
+                       merge_prob = merge_prob, kernel_backend = kernel_backend);
         
         # Store community role
         self.community_role = community_role;
@@ -115,22 +125,16 @@ class CommunityAgent(Agent):
         self.phoneme_step_size = new_behaviour.phoneme_step_size;
         
         if self.logger:
-            print(f"{self.name}: update my role and behaviour to reflect {new_role.name}.");
+            report_event(self.name, f"update my role and behaviour to reflect {new_role.name}.");
 
         
     # Edit so that we perform multiple loops based on influence
-    def improve_sound(self, original_sound: Sound, goal_utterance: Utterance):
+    def improve_sound(self, original_sound: Sound, goal_utterance: Utterance, steps: int = 1):
         """Returns improved original sound which is more like the goal sound.
         Considers all permutations of phoneme using phoneme_step_size.
-        Loops multiple times corresponding to oponent's influence"""
-        
-        # improved sound is original sound initially
-        improved_sound = original_sound;
-        
-        for _ in range(self.community_behaviour.influence_dictionary[self.oponent_role]):
-            improved_sound = super().improve_sound(improved_sound, goal_utterance);
-
-        return improved_sound;
+        Takes multiple steps corresponding to oponent's influence, in a single climb"""
+        return super().improve_sound(original_sound, goal_utterance,
+                                     steps = steps * self.community_behaviour.influence_dictionary[self.oponent_role]);
 
     # Edit so that we only change our vowel repetoire if we "care about" the oponent
     def process_non_verbal_imitation_confirmation(self, was_success):
@@ -141,14 +145,12 @@ class CommunityAgent(Agent):
             self.known_sounds[self.last_spoken_sound].was_success();
             # "Shift closer" if we care about oponent agent
             if self.oponent_role in self.community_behaviour.influential_agent_types:
-                improved_sound = self.improve_sound(self.known_sounds[self.last_spoken_sound], self.last_heard_utterance);
-                self.known_sounds[self.last_spoken_sound].improve(improved_sound);
+                self.shift_last_spoken_sound_closer();
         else:
             if self.known_sounds[self.last_spoken_sound].success_ratio() < self.sound_threshold_game:
                 # Probably bad sound - "Shift closer" and we care about oponent
                 if self.oponent_role in self.community_behaviour.influential_agent_types:
-                    improved_sound = self.improve_sound(self.known_sounds[self.last_spoken_sound], self.last_heard_utterance);
-                    self.known_sounds[self.last_spoken_sound].improve(improved_sound);
+                    self.shift_last_spoken_sound_closer();
             else:
                 # Probably good sound - add new sound to repetoire if we care about oponent
                 if self.oponent_role in self.community_behaviour.influential_agent_types:
@@ -157,7 +159,7 @@ class CommunityAgent(Agent):
 
         if self.logger:
             if was_success:
-                print(self.name + ": had a confirmed match, changed my sound to match closer.");
+                report_event(self.name, "had a confirmed match, changed my sound to match closer.");
 
         # End of current game
         self.prepare_for_new_game(was_imitator=True, was_succes= was_success);
@@ -167,209 +169,120 @@ class CommunityAgent(Agent):
 # COMMUNITY GAME STATE
 ############################################################################################
 
+# Role index and role views of every game state, kept as long as the game state itself exists
+role_index_cache = weakref.WeakKeyDictionary();
+role_view_cache = weakref.WeakKeyDictionary();
+
 class CommunityGameState:
     """This is a class used to represent the state of a community game."""
+    # Iteration at which a converged game was stopped, None when it played all iterations (or was saved before this was recorded)
+    stopping_iteration = None;
+
     def __init__(self, agents: list, iteration: int):
         """Creates a game state to be used to store community games."""
         self.agents = copy.deepcopy(agents);
         self.iteration = iteration;
 
-    def plot(self, title: str = None, show_legend: bool = True):
+    # Label and marker of every community role when plotted, in plotting order
+    role_plot_styles = {
+        CommunityRole.BABY: ("Babies", "o"),
+        CommunityRole.STUDENT: ("Students", "o"),
+        CommunityRole.PARENT: ("Parents", "x"),
+        CommunityRole.GRANDPARENT: ("Grandparents", "x"),
+        CommunityRole.DOCTORATE: ("Doctorates", "s"),
+        CommunityRole.PROFESSOR: ("Professor", "s"),
+        };
+
+    def role_index(self):
+        """Returns a dictionary with the indexes of the agents of every community role, computed once per game state."""
+        if self not in role_index_cache:
+            agent_roles = np.array([agent.community_role.value for agent in self.agents], dtype=np.int64);
+            role_index_cache[self] = {role: np.flatnonzero(agent_roles == role.value) for role in CommunityRole};
+
+        return role_index_cache[self];
+
+    def role_view(self, roles: list):
+        """Returns a view of the game state with only the agents of the given community roles, in their original order.
+        The view shares the agents of this game state instead of copying them, and is made once per set of roles."""
+        views = role_view_cache.setdefault(self, {});
+        key = frozenset(role.value for role in roles);
+        if key not in views:
+            views[key] = CommunityGameStateView(self, roles);
+
+        return views[key];
+
+    def bark_points_by_role(self):
+        """Returns a dictionary with the first formant barks and effective second formant barks of all known sounds per community role.
+        All points are converted in a single pass."""
+        f1, f2, agent_indexes = GameState.bark_points(self);
+        agent_roles = np.array([agent.community_role.value for agent in self.agents], dtype=np.int64);
+        point_roles = agent_roles[agent_indexes];
+
+        return {role: (f1[point_roles == role.value], f2[point_roles == role.value]) for role in CommunityRole};
+
+    def plot_roles(self, roles: list, title: str = None, show_legend: bool = True, mode: str = "scatter"):
+        """Plot all sounds of the agents with the given community roles, with a single call per community role.
+        - mode: "scatter", or "hexbin" / "density" for a density map of large populations"""
+        ax = plotting().new_pyplot_axes();
+        self.draw_roles(ax, roles, title = title, show_legend = show_legend, mode = mode);
+
+    def draw_roles(self, ax, roles: list, title: str = None, show_legend: bool = True, mode: str = "scatter"):
+        """Draws all sounds of the agents with the given community roles on the given axes, see plot_roles."""
+        # Plot the groups in the fixed role order
+        plotter = plotting().VowelSpacePlotter(mode = mode);
+        points = self.bark_points_by_role();
+        groups = [(label, marker, points[role][0], points[role][1])
+                        for role, (label, marker) in self.role_plot_styles.items() if role in roles];
+        plotter.plot_groups(ax, groups);
+
+        # Set titles and plot parameters
+        plotter.format_axes(ax, str(self.iteration) + " games" if title == None else title,
+                            show_legend = show_legend, legend_title = "Agents community role");
+
+    def draw(self, ax, title: str = None, show_legend: bool = True, mode: str = "scatter"):
+        """Draws all sounds of all agents grouped per community role on the given axes."""
+        self.draw_roles(ax, list(self.role_plot_styles.keys()), title = title, show_legend = show_legend, mode = mode);
+
+    def plot(self, title: str = None, show_legend: bool = True, mode: str = "scatter"):
         """Plot all sounds of all agents, grouped per community role."""
-        # Change plot size and color, then start new plot 
-        plt.rcParams["figure.figsize"] = (10,10);
-        plt.rcParams['figure.facecolor'] = 'white';
-        plt.figure();
-
-        # Plot babies
-        babies = [a for a in self.agents if a.community_role in [CommunityRole.BABY]]
-        f1 = [];
-        f2 = [];
-        for baby in babies:
-            f1 += [baby.bark_operator.bark_f1(sound.utterance) for sound in baby.known_sounds];
-            f2 += [baby.bark_operator.bark_f2(sound.utterance) for sound in baby.known_sounds];
-        
-        plt.plot(f2, f1, 'o', label="Babies");
-
-        # Plot students
-        students = [a for a in self.agents if a.community_role in [CommunityRole.STUDENT]]
-        f1 = [];
-        f2 = [];
-        for student in students:
-            f1 += [student.bark_operator.bark_f1(sound.utterance) for sound in student.known_sounds];
-            f2 += [student.bark_operator.bark_f2(sound.utterance) for sound in student.known_sounds];
-        
-        plt.plot(f2, f1, 'o', label="Students");
-
-        # Plot parents
-        parents = [a for a in self.agents if a.community_role in [CommunityRole.PARENT]]
-        f1 = [];
-        f2 = [];
-        for parent in parents:
-            f1 += [parent.bark_operator.bark_f1(sound.utterance) for sound in parent.known_sounds];
-            f2 += [parent.bark_operator.bark_f2(sound.utterance) for sound in parent.known_sounds];
-        
-        plt.plot(f2, f1, 'x', label="Parents");
-
-        # Plot grandparents
-        grandparents = [a for a in self.agents if a.community_role in [CommunityRole.GRANDPARENT]]
-        f1 = [];
-        f2 = [];
-        for grandparent in grandparents:
-            f1 += [grandparent.bark_operator.bark_f1(sound.utterance) for sound in grandparent.known_sounds];
-            f2 += [grandparent.bark_operator.bark_f2(sound.utterance) for sound in grandparent.known_sounds];
-        
-        plt.plot(f2, f1, 'x', label="Grandparents");
+        self.plot_roles(list(self.role_plot_styles.keys()), title = title, show_legend = show_legend, mode = mode);
 
-        # Plot doctorates
-        doctorates = [a for a in self.agents if a.community_role in [CommunityRole.DOCTORATE]]
-        f1 = [];
-        f2 = [];
-        for doctorate in doctorates:
-            f1 += [doctorate.bark_operator.bark_f1(sound.utterance) for sound in doctorate.known_sounds];
-            f2 += [doctorate.bark_operator.bark_f2(sound.utterance) for sound in doctorate.known_sounds];
-        
-        plt.plot(f2, f1, 's', label="Doctorates");
-
-        # Plot professors
-        professors = [a for a in self.agents if a.community_role in [CommunityRole.PROFESSOR]]
-        f1 = [];
-        f2 = [];
-        for professor in professors:
-            f1 += [professor.bark_operator.bark_f1(sound.utterance) for sound in professor.known_sounds];
-            f2 += [professor.bark_operator.bark_f2(sound.utterance) for sound in professor.known_sounds];
-        
-        plt.plot(f2, f1, 's', label="Professor");
-
-        # Set titles
-        if title == None:
-            plt.title(str(self.iteration) + " games");
-        else:
-            plt.title(title);
-        plt.xlabel("F'2 in bark");
-        plt.ylabel("F1 in bark");
-        
-        # Change pot parameters
-        plt.ylim(1, 8);
-        plt.xlim(7, 16);
-        plt.gca().invert_xaxis();
-        plt.gca().invert_yaxis();
-        plt.grid();
-
-        # Show legend
-        if show_legend:
-            plt.legend(title="Agents community role", loc="lower left");
-
-        # Reset figure size for next figures
-        plt.rcParams["figure.figsize"] = plt.rcParamsDefault["figure.figsize"];
-        plt.rcParams["figure.facecolor"] = plt.rcParamsDefault["figure.facecolor"];
-
-    def plot_highly_schooled(self, title: str = None, show_legend: bool = True):
+    def plot_highly_schooled(self, title: str = None, show_legend: bool = True, mode: str = "scatter"):
         """Plot all sounds of all doctorates and proffesor, grouped per community role."""
-        # Change plot size and color, then start new plot 
-        plt.rcParams["figure.figsize"] = (10,10);
-        plt.rcParams['figure.facecolor'] = 'white';
-        plt.figure();
-
-        # Plot doctorates
-        doctorates = [a for a in self.agents if a.community_role in [CommunityRole.DOCTORATE]]
-        f1 = [];
-        f2 = [];
-        for doctorate in doctorates:
-            f1 += [doctorate.bark_operator.bark_f1(sound.utterance) for sound in doctorate.known_sounds];
-            f2 += [doctorate.bark_operator.bark_f2(sound.utterance) for sound in doctorate.known_sounds];
-        
-        plt.plot(f2, f1, 's', label="Doctorates");
-
-        # Plot professors
-        professors = [a for a in self.agents if a.community_role in [CommunityRole.PROFESSOR]]
-        f1 = [];
-        f2 = [];
-        for professor in professors:
-            f1 += [professor.bark_operator.bark_f1(sound.utterance) for sound in professor.known_sounds];
-            f2 += [professor.bark_operator.bark_f2(sound.utterance) for sound in professor.known_sounds];
-        
-        plt.plot(f2, f1, 's', label="Professor");
+        self.plot_roles([CommunityRole.DOCTORATE, CommunityRole.PROFESSOR], title = title, show_legend = show_legend, mode = mode);
 
-        # Set titles
-        if title == None:
-            plt.title(str(self.iteration) + " games");
-        else:
-            plt.title(title);
-        plt.xlabel("F'2 in bark");
-        plt.ylabel("F1 in bark");
-        
-        # Change pot parameters
-        plt.ylim(1, 8);
-        plt.xlim(7, 16);
-        plt.gca().invert_xaxis();
-        plt.gca().invert_yaxis();
-        plt.grid();
-
-        # Show legend
-        if show_legend:
-            plt.legend(title="Agents community role", loc="lower left");
-
-        # Reset figure size for next figures
-        plt.rcParams["figure.figsize"] = plt.rcParamsDefault["figure.figsize"];
-        plt.rcParams["figure.facecolor"] = plt.rcParamsDefault["figure.facecolor"];
-
-    def plot_regular_schooled(self, title: str = None, show_legend: bool = True):
+    def plot_regular_schooled(self, title: str = None, show_legend: bool = True, mode: str = "scatter"):
         """Plot all sounds of all parents and grandparents, grouped per community role."""
-        # Change plot size and color, then start new plot 
-        plt.rcParams["figure.figsize"] = (10,10);
-        plt.rcParams['figure.facecolor'] = 'white';
-        plt.figure();
-
-        # Plot parents
-        parents = [a for a in self.agents if a.community_role in [CommunityRole.PARENT]]
-        f1 = [];
-        f2 = [];
-        for parent in parents:
-            f1 += [parent.bark_operator.bark_f1(sound.utterance) for sound in parent.known_sounds];
-            f2 += [parent.bark_operator.bark_f2(sound.utterance) for sound in parent.known_sounds];
-        
-        plt.plot(f2, f1, 'x', label="Parents");
-
-        # Plot grandparents
-        grandparents = [a for a in self.agents if a.community_role in [CommunityRole.GRANDPARENT]]
-        f1 = [];
-        f2 = [];
-        for grandparent in grandparents:
-            f1 += [grandparent.bark_operator.bark_f1(sound.utterance) for sound in grandparent.known_sounds];
-            f2 += [grandparent.bark_operator.bark_f2(sound.utterance) for sound in grandparent.known_sounds];
-        
-        plt.plot(f2, f1, 'x', label="Grandparents");
-
-        # Set titles
-        if title == None:
-            plt.title(str(self.iteration) + " games");
-        else:
-            plt.title(title);
-        plt.xlabel("F'2 in bark");
-        plt.ylabel("F1 in bark");
-        
-        # Change pot parameters
-        plt.ylim(1, 8);
-        plt.xlim(7, 16);
-        plt.gca().invert_xaxis();
-        plt.gca().invert_yaxis();
-        plt.grid();
-
-        # Show legend
-        if show_legend:
-            plt.legend(title="Agents community role", loc="lower left");
-
-        # Reset figure size for next figures
-        plt.rcParams["figure.figsize"] = plt.rcParamsDefault["figure.figsize"];
-        plt.rcParams["figure.facecolor"] = plt.rcParamsDefault["figure.facecolor"];
+        self.plot_roles([CommunityRole.PARENT, CommunityRole.GRANDPARENT], title = title, show_legend = show_legend, mode = mode);
     
+class CommunityGameStateView(CommunityGameState):
+    """This is a class used to represent the agents of some community roles of a community game state.
+    The agents are shared with the game state, so they should not be changed, use CommunityGameState.role_view to make one."""
+    def __init__(self, game_state: CommunityGameState, roles: list):
+        """Creates a view of the agents of the given community roles of the game state, without copying them.
+        The view does not refer to the game state itself, so it can be cached for as long as the game state exists."""
+        role_index = game_state.role_index();
+        indexes = np.sort(np.concatenate([role_index[role] for role in roles] + [np.empty(0, dtype=np.int64)]));
+
+        self.agents = [game_state.agents[i] for i in indexes];
+        self.iteration = game_state.iteration;
+        self.stopping_iteration = game_state.stopping_iteration;
+
 ############################################################################################
 # COMMUNITY GAME ENGINE
 ############################################################################################
 
 class CommunityGameEngine:
     """Community variant of the regular game engine, works with community agents."""
+    # Iteration at which the last played game converged, None when it played all iterations
+    stopping_iteration = None;
+
+    # Backend used by the agents, engines saved before backends existed use python
+    kernel_backend = "python";
+
+    # Recorder (e.g. a CheckpointSeries) called at every checkpoint instead of capturing a game state, see play_iterations
+    checkpoint_recorder = None;
+
     def __init__(self,
                  community_member_amounts: dict,
                  community_behaviours: dict,
@@ -377,8 +290,11 @@ class CommunityGameEngine:
                  
                  iterations: int, bark_operator: BarkOperator, 
                  agent_sound_threshold_game: float = 0.5, agent_sound_threshold_self:float = 0.7,
-                 agent_sound_minimum_tries: int = 5):
-        """Creates a Community Game Engine instance for the provided community settings."""
+                 agent_sound_minimum_tries: int = 5,
+                 progress_reporter: ProgressReporter = None, kernel_backend: str = "python"):
+        """Creates a Community Game Engine instance for the provided community settings.
+        The progress is printed (throttled) unless another progress_reporter is given.
+        All agents use the given kernel_backend, "python" or "numba" (python when numba is not installed)."""
         
         # Keep track of number of agents
         self.community_member_amounts = community_member_amounts;
@@ -401,6 +317,14 @@ class CommunityGameEngine:
         self.agent_sound_threshold_game = agent_sound_threshold_game;
         self.agent_sound_threshold_self = agent_sound_threshold_self;
         self.agent_sound_minimum_tries = agent_sound_minimum_tries;
+        self.kernel_backend = resolve_kernel_backend(kernel_backend);
+
+        # Reporter informed after every iteration
+        self.progress_reporter = progress_reporter if progress_reporter is not None else PrintProgressReporter();
+
+        # Keep track of the amount of iterations already played and the game states captured so far
+        self.iteration = 0;
+        self.captured_states = {};
 
         # Create the agents
         self.agents = [];
@@ -415,7 +339,8 @@ class CommunityGameEngine:
                                            sound_threshold_game= agent_sound_threshold_game,
                                            sound_threshold_agent= agent_sound_threshold_self,
                                            sound_minimum_tries= agent_sound_minimum_tries,
-                                           new_sound_prob = community_behaviours[community_role].new_sound_prob)
+                                           new_sound_prob = community_behaviours[community_role].new_sound_prob,
+                                           kernel_backend = self.kernel_backend)
                             for n in range(community_member_amounts[community_role])];
             
         # Keep track of parents of agents
@@ -452,10 +377,12 @@ class CommunityGameEngine:
         imitator.prepare_current_game(speaker.community_role);
         
         # play game
+        trace_game_start(self.iteration, speaker, imitator);
         start_utterance = speaker.say_something();
         imitated_utterance = imitator.imitate_sound(start_utterance);
         validation = speaker.validate_imitation(imitated_utterance);
         imitator.process_non_verbal_imitation_confirmation(validation);
+        trace_game_end(speaker, imitator, validation);
         
 
     def __play_full_agent_aging_round(self):
@@ -493,106 +420,204 @@ class CommunityGameEngine:
                 # Play game
                 self.__play_one_agent_pair(speaker, imitator);
         
-    def play_imitation_game(self, checkpoints: list):
-        """Plays an imitation game and returns a vector of CommunityGameState objects.
-        - checkpoints: list of iteration numbers at which the state of the game should be saved (after playing that iteration)."""
+    def play_imitation_game(self, checkpoints: list, save_path: str = None, save_interval: int = None,
+                            convergence_monitor: ConvergenceMonitor = None, snapshot_writer: SnapshotWriter = None):
+        """Plays the remaining iterations of an imitation game and returns a vector of CommunityGameState objects.
+        - checkpoints: list of iteration numbers at which the state of the game should be saved (after playing that iteration)
+        - save_path: file to which the full engine state is written every save_interval iterations, see resume_from
+        - save_interval: amount of iterations between two saves, only saved at the end when None
+        - convergence_monitor: stops the game early once converged, see play_and_save
+        - snapshot_writer: writes the saves in the background, see SnapshotWriter"""
+        self.captured_states.update(play_and_save(self, checkpoints, save_path, save_interval, convergence_monitor, snapshot_writer));
+
+        # Return the game states
+        return [self.captured_states.get(checkpoint) for checkpoint in checkpoints];
+
+    def play_iterations(self, amount: int, checkpoints: list):
+        """Plays the given amount of iterations, continuing from the current iteration of the engine.
+        Returns a dictionary with the CommunityGameState of every checkpoint reached.
+        - amount: number of full agent aging rounds to be played
+        - checkpoints: list of iteration numbers at which the state of the game should be saved (after playing that iteration),
+          recorded by the checkpoint_recorder instead when it is set"""
+        game_states = {};
         
-        game_states = [None] * len(checkpoints);
+        for _ in range(amount):
+            i = self.iteration;
 
-        for i in range(self.iterations):
             # Play one iteration of the game
             self.__play_full_agent_aging_round();
+            self.iteration += 1;
 
             # After playing the games, check if checkpoint reached for storing
             if i + 1 in checkpoints:
-                # Force merge of agent for Energy measure
-                for agent in self.agents:
-                    agent.merge_similar_sound();
-                    
-                # Store imitation game state
-                game_states[checkpoints.index(i + 1)] = CommunityGameState(self.agents, i + 1);
-            
+                if self.checkpoint_recorder is not None:
+                    self.checkpoint_recorder.record(self);
+                else:
+                    game_states[i + 1] = self.capture_game_state();
             
-            # Check if half aging round (babies become student)
-            if (i+1) % (self.category_age_width/2) == 0 and i != 0 and (i+1) % self.category_age_width != 0:
-                # make babies students
-                babies = [a for a in self.agents if a.community_role == CommunityRole.BABY];
-                for baby in babies:
-                    baby.change_agent_role_and_behaviour(new_role = CommunityRole.STUDENT,
-                                                         new_behaviour = self.community_behaviours[CommunityRole.STUDENT]);
-            
-            # Check if full aging round (every category shifts one ladder up)
-            if (i+1) % self.category_age_width == 0 and i != 0:
-                # Kill professors and grandparents
-                dead_agents = [a for a in self.agents if a.community_role in [CommunityRole.GRANDPARENT, CommunityRole.PROFESSOR]];
-                for dead_agent in dead_agents:
-                    if dead_agent in self.parent_tree: 
-                        del self.parent_tree[dead_agent];
-                    self.agents.remove(dead_agent);
-                    
-                # make doctorates professors
-                doctorates = [a for a in self.agents if a.community_role == CommunityRole.DOCTORATE];
-                for doctorate in doctorates:
-                    doctorate.change_agent_role_and_behaviour(new_role = CommunityRole.PROFESSOR, 
-                                                              new_behaviour = self.community_behaviours[CommunityRole.PROFESSOR]);
-                    
-                
-                # make parents grandparents
-                parents = [a for a in self.agents if a.community_role == CommunityRole.PARENT];
-                for parent in parents:
-                    parent.change_agent_role_and_behaviour(new_role = CommunityRole.GRANDPARENT, 
-                                                           new_behaviour = self.community_behaviours[CommunityRole.GRANDPARENT]);
-                    
-                # make students either doctorate or parent depending on parent
-                students = [a for a in self.agents if a.community_role == CommunityRole.STUDENT];
-                for student in students:
-                    if self.parent_tree[student].community_role == CommunityRole.PROFESSOR:
-                        student.change_agent_role_and_behaviour(new_role = CommunityRole.DOCTORATE,
-                                                                new_behaviour = self.community_behaviours[CommunityRole.DOCTORATE]);
-                        
-                    if self.parent_tree[student].community_role == CommunityRole.GRANDPARENT:
-                        student.change_agent_role_and_behaviour(new_role = CommunityRole.PARENT,
-                                                                new_behaviour = self.community_behaviours[CommunityRole.PARENT]);
-                    
-                # create new babies, one for each parent
-                new_parents = [a for a in self.agents if a.community_role in [CommunityRole.PARENT, CommunityRole.DOCTORATE]];
-                for parent in new_parents:
-                    new_baby = [CommunityAgent(synthesizer= self.community_behaviours[CommunityRole.BABY].synthesizer,
-                                               bark_operator= self.bark_operator, 
-                                               community_role = CommunityRole.BABY,
-                                               community_behaviour = self.community_behaviours[CommunityRole.BABY],
-                                               sound_threshold_game= self.agent_sound_threshold_game,
-                                               sound_threshold_agent= self.agent_sound_threshold_self,
-                                               sound_minimum_tries= self.agent_sound_minimum_tries,
-                                               new_sound_prob = self.community_behaviours[CommunityRole.BABY].new_sound_prob)];
-                                        
-                    # Store new baby and its parent
-                    self.agents += new_baby;
-                    self.parent_tree[new_baby[0]] = parent;
+            # Let the agents of the community age
+            self.__age_community(i);
 
             # Show progress
-            print(f"Just completed iteration: {i+1}", end='\r');
+            self.progress_reporter.progress(i + 1, self.iterations);
 
-        # Return the game states
         return game_states;
+
+    def capture_game_state(self):
+        """Returns the CommunityGameState at the current iteration."""
+        # Store imitation game state
+        game_state = CommunityGameState(self.agents, self.iteration);
+
+        # Force merge of agent for Energy measure, on the copied agents so that the game itself is not changed
+        merge_similar_sounds_of_game_state(game_state);
+
+        return game_state;
+
+    def save_state(self, path: str):
+        """Writes the full state of the engine, including the parent tree, to path, see save_engine_state."""
+        save_engine_state(self, path);
+
+    @classmethod
+    def resume_from(cls, path: str, progress_reporter: ProgressReporter = None):
+        """Returns the engine saved to path, continuing it gives exactly the same game as an uninterrupted run.
+        Raise iterations before playing to extend a finished game.
+        - progress_reporter: reporter informed after every iteration, printed (throttled) when None"""
+        return load_engine_state(path, cls, progress_reporter if progress_reporter is not None else PrintProgressReporter());
+
+    def __age_community(self, i: int):
+        """Changes the roles of the agents when a (half) aging round is reached after playing iteration i."""
+        # Check if half aging round (babies become student)
+        if (i+1) % (self.category_age_width/2) == 0 and i != 0 and (i+1) % self.category_age_width != 0:
+            # make babies students
+            babies = [a for a in self.agents if a.community_role == CommunityRole.BABY];
+            for baby in babies:
+                baby.change_agent_role_and_behaviour(new_role = CommunityRole.STUDENT,
+                                                     new_behaviour = self.community_behaviours[CommunityRole.STUDENT]);
+        
+        # Check if full aging round (every category shifts one ladder up)
+        if (i+1) % self.category_age_width == 0 and i != 0:
+            # Kill professors and grandparents
+            dead_agents = [a for a in self.agents if a.community_role in [CommunityRole.GRANDPARENT, CommunityRole.PROFESSOR]];
+            for dead_agent in dead_agents:
+                if dead_agent in self.parent_tree: 
+                    del self.parent_tree[dead_agent];
+                self.agents.remove(dead_agent);
+                
+            # make doctorates professors
+            doctorates = [a for a in self.agents if a.community_role == CommunityRole.DOCTORATE];
+            for doctorate in doctorates:
+                doctorate.change_agent_role_and_behaviour(new_role = CommunityRole.PROFESSOR, 
+                                                          new_behaviour = self.community_behaviours[CommunityRole.PROFESSOR]);
+                
+            
+            # make parents grandparents
+            parents = [a for a in self.agents if a.community_role == CommunityRole.PARENT];
+            for parent in parents:
+                parent.change_agent_role_and_behaviour(new_role = CommunityRole.GRANDPARENT, 
+                                                       new_behaviour = self.community_behaviours[CommunityRole.GRANDPARENT]);
+                
+            # make students either doctorate or parent depending on parent
+            students = [a for a in self.agents if a.community_role == CommunityRole.STUDENT];
+            for student in students:
+                if self.parent_tree[student].community_role == CommunityRole.PROFESSOR:
+                    student.change_agent_role_and_behaviour(new_role = CommunityRole.DOCTORATE,
+                                                            new_behaviour = self.community_behaviours[CommunityRole.DOCTORATE]);
+                    
+                if self.parent_tree[student].community_role == CommunityRole.GRANDPARENT:
+                    student.change_agent_role_and_behaviour(new_role = CommunityRole.PARENT,
+                                                            new_behaviour = self.community_behaviours[CommunityRole.PARENT]);
+                
+            # create new babies, one for each parent
+            new_parents = [a for a in self.agents if a.community_role in [CommunityRole.PARENT, CommunityRole.DOCTORATE]];
+            for parent in new_parents:
+                new_baby = [CommunityAgent(synthesizer= self.community_behaviours[CommunityRole.BABY].synthesizer,
+                                           bark_operator= self.bark_operator, 
+                                           community_role = CommunityRole.BABY,
+                                           community_behaviour = self.community_behaviours[CommunityRole.BABY],
+                                           sound_threshold_game= self.agent_sound_threshold_game,
+                                           sound_threshold_agent= self.agent_sound_threshold_self,
+                                           sound_minimum_tries= self.agent_sound_minimum_tries,
+                                           new_sound_prob = self.community_behaviours[CommunityRole.BABY].new_sound_prob,
+                                           kernel_backend = self.kernel_backend)];
+                                    
+                # Store new baby and its parent
+                self.agents += new_baby;
+                self.parent_tree[new_baby[0]] = parent;
     
 ############################################################################################
 # COMMUNITY STATISTICS
 ############################################################################################
 
+# Divergence matrices of every evaluated game state per method and second formant weight, kept as long as the game state exists
+divergence_cache = weakref.WeakKeyDictionary();
+
 class CommunityStatistics(Statistics):
     def extract_agents_with_type_from_community_game_state(self, game_state: CommunityGameState, allowed_roles: list):
-        """Returns game state object where only agents of specified type are visible."""
-        filtered_state = CommunityGameState(agents=[a for a in game_state.agents if a.community_role in allowed_roles], iteration= game_state.iteration);
-
-        return filtered_state;
+        """Returns game state object where only agents of specified type are visible.
+        This is a view sharing the agents of the game state, see CommunityGameState.role_view."""
+        return game_state.role_view(allowed_roles);
 
     def extract_agents_with_type_from_community_game_states(self, game_states: list, allowed_roles: list):
         """Returns list of game state objects where only agents of specified type are visible."""
-        # init filtered states
-        filtered_states = [];
-
-        for game_state in game_states:
-            filtered_states += [self.extract_agents_with_type_from_community_game_state(game_state, allowed_roles)];
-
-        return filtered_states;
\ No newline at end of file
+        return [self.extract_agents_with_type_from_community_game_state(game_state, allowed_roles) for game_state in game_states];
+
+    def divergence_matrix(self, game_state: CommunityGameState, method: str = "nearest_neighbour", chunk_size: int = 1024):
+        """Returns the (agents, agents) matrix of the divergence between the sound repetoires of every pair of agents, cached per game state.
+        The bark distances between all sounds are computed in chunks of chunk_size sounds, reduced per agent without loops over agents.
+        Agents without sounds have a nan divergence.
+        - method: "nearest_neighbour" for the mean bark distance of a sound to the closest sound of the other agent, averaged over both agents,
+          or "hausdorff" for the largest such distance"""
+        if method not in ["nearest_neighbour", "hausdorff"]:
+            raise ValueError(f"Unknown divergence method {method}, use nearest_neighbour or hausdorff.");
+
+        key = (method, self.bark_operator.second_formant_weight);
+        matrices = divergence_cache.setdefault(game_state, {});
+        if key in matrices:
+            return matrices[key];
+
+        f1, f2, agent_indexes = GameState.bark_points(game_state);
+        sizes = np.bincount(agent_indexes, minlength=len(game_state.agents));
+        speaking_agents = np.flatnonzero(sizes > 0);
+        starts = (np.cumsum(sizes) - sizes)[speaking_agents];
+
+        # Distance of every sound to the closest sound of every agent
+        closest_distances = np.empty((len(f1), len(speaking_agents)));
+        for start in range(0, len(f1), chunk_size):
+            chunk = slice(start, start + chunk_size);
+            distances = np.sqrt((f1[chunk, None] - f1[None, :])**2 + self.bark_operator.second_formant_weight * (f2[chunk, None] - f2[None, :])**2);
+            closest_distances[chunk] = np.minimum.reduceat(distances, starts, axis=1) if len(starts) > 0 else distances[:, :0];
+
+        # Directed divergence from the repetoire of every agent to that of every other agent
+        if method == "nearest_neighbour":
+            directed = (np.add.reduceat(closest_distances, starts, axis=0) / sizes[speaking_agents, None]) if len(starts) > 0 else closest_distances[:0];
+            speaking_divergence = (directed + directed.T) / 2;
+        else:
+            directed = np.maximum.reduceat(closest_distances, starts, axis=0) if len(starts) > 0 else closest_distances[:0];
+            speaking_divergence = np.maximum(directed, directed.T);
+
+        divergence = np.full((len(game_state.agents), len(game_state.agents)), np.nan);
+        divergence[np.ix_(speaking_agents, speaking_agents)] = speaking_divergence;
+        matrices[key] = divergence;
+
+        return divergence;
+
+    def role_divergence(self, game_state: CommunityGameState, roles: list = None, method: str = "nearest_neighbour"):
+        """Returns the (roles, roles) matrix of the mean divergence between the agents of every pair of community roles, see divergence_matrix.
+        Agents are not compared with themselves, pairs of roles without agents (to compare) are nan.
+        - roles: community roles in the order of the matrix, all roles when None"""
+        if roles is None:
+            roles = list(CommunityRole);
+
+        divergence = self.divergence_matrix(game_state, method = method);
+        role_index = game_state.role_index();
+        role_divergence = np.full((len(roles), len(roles)), np.nan);
+        for i, first_role in enumerate(roles):
+            for j, second_role in enumerate(roles):
+                block = divergence[np.ix_(role_index[first_role], role_index[second_role])];
+                if first_role == second_role:
+                    block = block[~np.eye(len(block), dtype=bool)];
+                block = block[~np.isnan(block)];
+                if len(block) > 0:
+                    role_divergence[i, j] = block.mean();
+
+        return role_divergence;
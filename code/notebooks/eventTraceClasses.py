@@ -0,0 +1,270 @@
+# This file includes the classes used to trace the events of imitation games and to replay them
+
+############################################################################################
+# IMPORTS
+############################################################################################
+
+# Import imitation game classes made in the first notebook
+import imitationGameClasses;
+
+# Used for random number generation
+import random as rnd;
+
+# Used for the event types
+from enum import Enum;
+
+# Used for the binary records
+import struct;
+
+# Used for datatype representation
+import numpy as np;
+
+############################################################################################
+# TRACE EVENTS
+############################################################################################
+
+class TraceEvent(Enum):
+    """Type of a traced event, stored as a single byte in every record."""
+    GAME = 0;             # agent: speaker, other_agent: imitator, value: 1 for a successful game, 0 otherwise
+    SPEAK = 1;            # agent: speaker, sound: spoken sound
+    IMITATE = 2;          # agent: imitator, sound: sound closest to the heard utterance, value: its distance
+    VALIDATE = 3;         # agent: speaker, sound: sound closest to the imitation, other_sound: spoken sound, value: its distance
+    IMPROVE = 4;          # agent: imitator, sound: sound shifted closer to the heard utterance
+    ADD_SIMILAR = 5;      # agent, sound: added sound similar to the heard utterance
+    ADD_RANDOM = 6;       # agent, sound: added random sound
+    ADD_SEMI_RANDOM = 7;  # agent, sound: added semi random sound
+    MERGE = 8;            # agent, sound: removed (worst) sound, other_sound: kept (best) sound
+    REMOVE = 9;           # agent, sound: removed bad sound
+
+# Binary layout of a record: iteration, event, agent, other agent, sound, other sound, value
+record_struct = struct.Struct("<IBIIIId");
+record_dtype = np.dtype([("iteration", "<u4"), ("event", "u1"), ("agent", "<u4"), ("other_agent", "<u4"),
+                         ("sound", "<u4"), ("other_sound", "<u4"), ("value", "<f8")]);
+
+# Identifier stored when a record has no (other) agent or sound
+no_identifier = 0xFFFFFFFF;
+
+############################################################################################
+# EVENT TRACER
+############################################################################################
+
+class EventTracer:
+    """This is a class used to record the events of games as compact binary records of 29 bytes.
+    Agents and sounds are identified by numbers given in order of their first event, so that a replay of the same game gives the same numbers.
+    The records are kept in a ring buffer of the last capacity events, or appended to a file when a path is given.
+    For example
+        tracer = EventTracer("trace.bin");
+        set_event_tracer(tracer);
+        game_states = game_engine.play_imitation_game(checkpoints);
+        set_event_tracer(None);
+        tracer.close();"""
+    def __init__(self, path: str = None, capacity: int = 1000000, buffer_size: int = 4096):
+        """Creates an Event Tracer instance.
+        - path: file the records are appended to, a ring buffer is used when None
+        - capacity: amount of records kept by the ring buffer
+        - buffer_size: amount of records written to the file at once"""
+        self.path = path;
+        self.capacity = capacity;
+        self.buffer_size = buffer_size;
+
+        # Storage of the records
+        if path is not None:
+            self.file = open(path, "wb");
+            self.buffer = [];
+        else:
+            self.file = None;
+            self.ring = bytearray(capacity * record_struct.size);
+
+        # Total amount of records made
+        self.count = 0;
+
+        # Identifiers of agents and sounds, the objects are kept so that their id is never reused
+        self.identifiers = {};
+
+        # Game being played
+        self.iteration = 0;
+
+    def identifier(self, item):
+        """Returns the number identifying an agent or sound."""
+        if item is None:
+            return no_identifier;
+
+        entry = self.identifiers.get(id(item));
+        if entry is None:
+            entry = (len(self.identifiers), item);
+            self.identifiers[id(item)] = entry;
+
+        return entry[0];
+
+    def record(self, event: TraceEvent, agent = None, other_agent = None, sound = None, other_sound = None, value: float = 0.0):
+        """Stores a record of an event during the current iteration."""
+        record = record_struct.pack(self.iteration, event.value, self.identifier(agent), self.identifier(other_agent),
+                                     self.identifier(sound), self.identifier(other_sound), value);
+
+        if self.file is not None:
+            self.buffer.append(record);
+            if len(self.buffer) >= self.buffer_size:
+                self.flush();
+        else:
+            offset = (self.count % self.capacity) * record_struct.size;
+            self.ring[offset:offset + record_struct.size] = record;
+
+        self.count += 1;
+
+    ########################################################################################
+    # Events, called by the engines and agents
+
+    def begin_game(self, iteration: int, speaker, imitator):
+        """Starts a game between the speaker and imitator during the given iteration."""
+        self.iteration = iteration;
+
+    def end_game(self, speaker, imitator, success: bool):
+        """Ends the game of the speaker and imitator."""
+        self.record(TraceEvent.GAME, speaker, imitator, value = 1.0 if success else 0.0);
+
+    def speak(self, agent, sound):
+        """Records the sound chosen by a speaker."""
+        self.record(TraceEvent.SPEAK, agent, sound = sound);
+
+    def imitate(self, agent, sound, distance: float):
+        """Records the sound an imitator chose to imitate the heard utterance with."""
+        self.record(TraceEvent.IMITATE, agent, sound = sound, value = distance);
+
+    def validate(self, agent, closest_sound, spoken_sound, distance: float):
+        """Records the sound a speaker found closest to the imitation."""
+        self.record(TraceEvent.VALIDATE, agent, sound = closest_sound, other_sound = spoken_sound, value = distance);
+
+    def improve(self, agent, sound):
+        """Records a sound that was shifted closer to the heard utterance."""
+        self.record(TraceEvent.IMPROVE, agent, sound = sound);
+
+    def add_similar(self, agent, sound):
+        """Records a sound added because it is similar to the heard utterance."""
+        self.record(TraceEvent.ADD_SIMILAR, agent, sound = sound);
+
+    def add_random(self, agent, sound):
+        """Records a random sound added to a repetoire."""
+        self.record(TraceEvent.ADD_RANDOM, agent, sound = sound);
+
+    def add_semi_random(self, agent, sound):
+        """Records a semi random sound added to a repetoire."""
+        self.record(TraceEvent.ADD_SEMI_RANDOM, agent, sound = sound);
+
+    def merge(self, agent, worst_sound, best_sound):
+        """Records the merge of the worst sound into the best sound."""
+        self.record(TraceEvent.MERGE, agent, sound = worst_sound, other_sound = best_sound);
+
+    def remove(self, agent, sound):
+        """Records the removal of a bad sound."""
+        self.record(TraceEvent.REMOVE, agent, sound = sound);
+
+    ########################################################################################
+    # Reading the records
+
+    def flush(self):
+        """Writes the buffered records to the file."""
+        if self.file is not None and self.buffer:
+            self.file.write(b"".join(self.buffer));
+            self.buffer = [];
+            self.file.flush();
+
+    def close(self):
+        """Writes the remaining records and closes the file."""
+        if self.file is not None and not self.file.closed:
+            self.flush();
+            self.file.close();
+
+    def first_record_index(self):
+        """Returns the index (in order of recording) of the oldest record still available."""
+        if self.file is not None:
+            return 0;
+
+        return max(0, self.count - self.capacity);
+
+    def records(self):
+        """Returns the available records, oldest first, as a numpy structured array with fields
+        iteration, event, agent, other_agent, sound, other_sound and value."""
+        if self.file is not None:
+            self.flush();
+            return read_trace(self.path);
+
+        available = min(self.count, self.capacity);
+        start = self.count % self.capacity if self.count > self.capacity else 0;
+        records = np.frombuffer(bytes(self.ring[:available * record_struct.size]), dtype=record_dtype);
+
+        return np.concatenate([records[start:], records[:start]]);
+
+def read_trace(path: str):
+    """Returns the records of a trace file as a numpy structured array, see EventTracer.records."""
+    return np.fromfile(path, dtype=record_dtype);
+
+def event_records(records: np.ndarray, event: TraceEvent):
+    """Returns the records of a single type of event."""
+    return records[records["event"] == event.value];
+
+############################################################################################
+# REPLAY
+############################################################################################
+
+class ReplayTracer(EventTracer):
+    """This is a tracer used while replaying a game, it compares every record with the traced one instead of storing it."""
+    def __init__(self, traced_records: np.ndarray, first_record_index: int = 0):
+        """Creates a Replay Tracer instance.
+        - traced_records: records of the original game
+        - first_record_index: index of the first traced record, non zero when a ring buffer dropped the oldest records"""
+        EventTracer.__init__(self, capacity = 1);
+        self.traced_records = traced_records;
+        self.first_record_index = first_record_index;
+
+    def record(self, event: TraceEvent, agent = None, other_agent = None, sound = None, other_sound = None, value: float = 0.0):
+        """Raises a RuntimeError when the record differs from the traced record at the same position."""
+        # Identifiers are also given before the first traced record, to number the objects as the traced game did
+        record = (self.iteration, event.value, self.identifier(agent), self.identifier(other_agent),
+                  self.identifier(sound), self.identifier(other_sound), value);
+
+        position = self.count - self.first_record_index;
+        self.count += 1;
+        if position < 0 or position >= len(self.traced_records):
+            return;
+
+        if record != self.traced_records[position].item():
+            raise RuntimeError(f"Replay diverged from the trace at record {self.count - 1} (iteration {self.iteration}): "
+                               f"{record} instead of {self.traced_records[position].item()}.");
+
+class GameReplayer:
+    """This is a class used to reconstruct the state of a traced game at any iteration.
+    The game is played again from its seed, which gives exactly the same game, while its events are checked against the trace.
+    For example
+        replayer = GameReplayer(lambda: GameEngine(20, 10000, synthesizer, bark_operator), seed = 42, records = read_trace("trace.bin"));
+        engine = replayer.replay(7345);"""
+    def __init__(self, engine_factory, seed: int, records: np.ndarray = None, first_record_index: int = 0):
+        """Creates a Game Replayer instance.
+        - engine_factory: function returning a new engine, made the same way as the traced one
+        - seed: seed given to rnd.seed right before the traced engine was made
+        - records: records of the traced game, no checks are done when None
+        - first_record_index: see ReplayTracer"""
+        self.engine_factory = engine_factory;
+        self.seed = seed;
+        self.records = records;
+        self.first_record_index = first_record_index;
+
+    def replay(self, iteration: int):
+        """Returns the engine with the population as it was after playing the given amount of iterations.
+        Raises a RuntimeError when the game diverges from the trace."""
+        tracer = ReplayTracer(self.records, self.first_record_index) if self.records is not None else None;
+        previous_tracer = imitationGameClasses.event_tracer;
+        random_state = rnd.getstate();
+
+        imitationGameClasses.set_event_tracer(tracer);
+        try:
+            rnd.seed(self.seed);
+            engine = self.engine_factory();
+            engine.iterations = max(engine.iterations, iteration);
+
+            # Checkpoints do not change the game, so none are needed
+            engine.play_iterations(iteration - engine.iteration, []);
+        finally:
+            imitationGameClasses.set_event_tracer(previous_tracer);
+            rnd.setstate(random_state);
+
+        return engine;
@@ -0,0 +1,324 @@
+# This file includes the classes used to keep a catalog of experiments in a local SQLite database
+
+############################################################################################
+# IMPORTS
+############################################################################################
+
+# Import imitation game classes made in the first notebooks
+import imitationGameClasses;
+import communityImitationGameClasses;
+from imitationGameClasses import Statistics, BarkOperator, CompactGameState;
+
+# Used for the database
+import sqlite3;
+
+# Used for storing the full parameters of a run
+import json;
+
+# Used for loading the snapshot files
+import pickle;
+import gzip;
+import os;
+
+# Used for datatype representation
+import numpy as np;
+
+############################################################################################
+# SNAPSHOT FILES
+############################################################################################
+
+class SnapshotUnpickler(pickle.Unpickler):
+    """This is an unpickler for snapshot files saved from the notebooks,
+    whose classes were pickled as part of __main__ after "from imitationGameClasses import *"."""
+    def find_class(self, module, name):
+        """Looks up classes of __main__ in the game class modules when they are not defined there."""
+        if module == "__main__":
+            for game_module in [communityImitationGameClasses, imitationGameClasses]:
+                if hasattr(game_module, name):
+                    return getattr(game_module, name);
+
+        return pickle.Unpickler.find_class(self, module, name);
+
+def load_snapshot(path: str):
+    """Returns the content of a snapshot file, e.g. the list of game states saved by a notebook.
+    Files ending with .gz are read as gzip compressed pickles."""
+    opener = gzip.open if path.endswith(".gz") else open;
+    with opener(path, "rb") as f:
+        return SnapshotUnpickler(f).load();
+
+def snapshot_game_states(content: list):
+    """Returns the game states of a snapshot holding a list of game states, archived CompactGameStates are restored."""
+    return [game_state.game_state() if isinstance(game_state, CompactGameState) else game_state for game_state in content];
+
+############################################################################################
+# RUN PARAMETERS
+############################################################################################
+
+# Engine that played the game of every type of game state
+engine_names = {"GameState": "GameEngine",
+                "CommunityGameState": "CommunityGameEngine"};
+
+# Parameters stored in their own (indexed) column, None when the agents of a run do not share a single value
+parameter_columns = ["number_of_agents", "max_noise_ambient", "max_noise_agent",
+                     "critical_distance", "second_formant_weight", "alternative_bark_conversion",
+                     "phoneme_step_size", "max_similar_sound_loops", "max_semi_random_loop",
+                     "sound_threshold_game", "sound_threshold_agent", "sound_minimum_tries",
+                     "cleanup_prob", "new_sound_prob", "merge_prob"];
+
+def agent_parameters(agent):
+    """Returns the parameters of an agent, its synthesizer and bark operator as a dictionary."""
+    return {"max_noise_ambient": agent.synthesizer.max_noise_ambient,
+            "max_noise_agent": agent.synthesizer.max_noise_agent,
+            "critical_distance": agent.bark_operator.critical_distance,
+            "second_formant_weight": agent.bark_operator.second_formant_weight,
+            "alternative_bark_conversion": agent.bark_operator.better_bark_conversion,
+            "phoneme_step_size": agent.phoneme_step_size,
+            "max_similar_sound_loops": agent.max_similar_sound_loops,
+            "max_semi_random_loop": agent.max_semi_random_loop,
+            "sound_threshold_game": agent.sound_threshold_game,
+            "sound_threshold_agent": agent.sound_threshold_agent,
+            "sound_minimum_tries": agent.sound_minimum_tries,
+            "cleanup_prob": agent.cleanup_prob,
+            "new_sound_prob": agent.new_sound_prob,
+            "merge_prob": agent.merge_prob};
+
+def parameters_from_agents(agents: list):
+    """Returns the parameters of a population, every parameter is None when the agents do not share a single value.
+    The parameters of community games are also given per community role."""
+    parameters = {"number_of_agents": len(agents)};
+
+    all_parameters = [agent_parameters(agent) for agent in agents];
+    for name in all_parameters[0]:
+        values = set(agent_parameter[name] for agent_parameter in all_parameters);
+        parameters[name] = values.pop() if len(values) == 1 else None;
+
+    # Community agents, parameters of the first agent of every role
+    roles = {};
+    for agent, agent_parameter in zip(agents, all_parameters):
+        if hasattr(agent, "community_role") and agent.community_role.name not in roles:
+            roles[agent.community_role.name] = dict(agent_parameter, number_of_agents = 0);
+        if hasattr(agent, "community_role"):
+            roles[agent.community_role.name]["number_of_agents"] += 1;
+    if roles:
+        parameters["roles"] = roles;
+
+    return parameters;
+
+############################################################################################
+# EXPERIMENT CATALOG
+############################################################################################
+
+class ExperimentCatalog:
+    """This is a class used to keep a catalog of runs (one configuration each) and the summary metrics of their trials
+    in a local SQLite database, linking every trial to the snapshot file holding its game state.
+    Aggregates over many experiments are single indexed queries instead of loading every snapshot file.
+    For example
+        catalog = ExperimentCatalog("saved_variables/catalog.sqlite");
+        catalog.index_directory("saved_variables");
+        catalog.aggregate("success_ratio", "max_noise_ambient", iteration = 5000);"""
+    # Summary metrics of every trial, the mean over the agents and its standard deviation
+    metrics = ["sound_size", "success_ratio", "energy"];
+
+    def __init__(self, path: str = "saved_variables/catalog.sqlite"):
+        """Creates an Experiment Catalog instance, the database is created when it does not exist.
+        - path: file of the SQLite database, ":memory:" for a catalog that is not saved"""
+        self.path = path;
+        self.connection = sqlite3.connect(path);
+
+        # Metrics of the game states, the bark operator is not used for these
+        self.statistics = Statistics(BarkOperator());
+
+        # Last loaded snapshot file, trials of a run are usually loaded together
+        self.loaded_snapshot = (None, None);
+
+        self.create_tables();
+
+    def create_tables(self):
+        """Creates the tables and indexes of the catalog when they do not exist."""
+        parameter_definitions = "".join(f"{name} REAL, " for name in parameter_columns);
+        metric_definitions = "".join(f"{metric} REAL, {metric}_std REAL, " for metric in self.metrics);
+
+        with self.connection:
+            self.connection.execute(f"""CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY, experiment TEXT, engine TEXT, seed INTEGER, iterations INTEGER, {parameter_definitions}
+                parameters TEXT, snapshot_path TEXT, snapshot_modified REAL)""");
+            self.connection.execute(f"""CREATE TABLE IF NOT EXISTS trials (
+                id INTEGER PRIMARY KEY, run_id INTEGER REFERENCES runs(id), trial INTEGER, iteration INTEGER, stopping_iteration INTEGER,
+                number_of_agents INTEGER, {metric_definitions} snapshot_path TEXT, snapshot_index INTEGER)""");
+
+            for name in ["experiment", "snapshot_path", "number_of_agents", "max_noise_ambient", "second_formant_weight", "critical_distance"]:
+                self.connection.execute(f"CREATE INDEX IF NOT EXISTS runs_{name} ON runs({name})");
+            self.connection.execute("CREATE INDEX IF NOT EXISTS trials_run_iteration ON trials(run_id, iteration)");
+            self.connection.execute("CREATE INDEX IF NOT EXISTS trials_iteration ON trials(iteration)");
+
+    def close(self):
+        """Closes the database."""
+        self.connection.close();
+
+    ########################################################################################
+    # Adding runs and trials
+
+    def add_run(self, experiment: str, parameters: dict, engine: str = "GameEngine", seed: int = None,
+                iterations: int = None, snapshot_path: str = None):
+        """Adds a run and returns its id.
+        - experiment: name of the experiment the run is part of, e.g. "2/noise-testing"
+        - parameters: parameters of the run, see parameters_from_agents
+        - engine: name of the engine class
+        - seed: random seed of the run, None when unknown
+        - iterations: amount of iterations of the run
+        - snapshot_path: file holding the game states of the run"""
+        snapshot_modified = os.path.getmtime(snapshot_path) if snapshot_path is not None and os.path.exists(snapshot_path) else None;
+        columns = ["experiment", "engine", "seed", "iterations"] + parameter_columns + ["parameters", "snapshot_path", "snapshot_modified"];
+        values = ([experiment, engine, seed, iterations] + [parameters.get(name) for name in parameter_columns]
+                  + [json.dumps(parameters), snapshot_path, snapshot_modified]);
+
+        with self.connection:
+            cursor = self.connection.execute(f"INSERT INTO runs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", values);
+
+        return cursor.lastrowid;
+
+    def trial_row(self, run_id: int, trial: int, game_state, snapshot_path: str = None, snapshot_index: int = None):
+        """Returns the values of a trial row, with the summary metrics of its game state."""
+        game_state_metrics = self.statistics.game_state_metrics(game_state);
+
+        metric_values = [];
+        for metric in self.metrics:
+            values = game_state_metrics[metric];
+            # Success ratios of agents which did not play yet are nan, these are left out of the aggregates as NULL
+            metric_values += [None if np.isnan(value) else float(value) for value in [values.mean(), values.std()]];
+
+        return [run_id, trial, game_state.iteration, game_state.stopping_iteration, len(game_state.agents)] + metric_values + [snapshot_path, snapshot_index];
+
+    def add_game_states(self, experiment: str, game_states: list, snapshot_path: str = None, seed: int = None, engine = None):
+        """Adds a run with a trial for every game state and returns the id of the run,
+        e.g. the game states of many trials of one configuration or the checkpoints of a single game.
+        - experiment: name of the experiment the run is part of
+        - game_states: game states of the run, the parameters are taken from the agents of the first one
+        - snapshot_path: file holding the list of game states, the trials refer to their position in it
+        - seed: random seed of the run, None when unknown
+        - engine: engine which played the run, used for its class name and iterations when given"""
+        if engine is not None:
+            engine_name, iterations = type(engine).__name__, engine.iterations;
+        else:
+            engine_name = engine_names.get(type(game_states[0]).__name__, type(game_states[0]).__name__);
+            iterations = max(game_state.iteration for game_state in game_states);
+
+        run_id = self.add_run(experiment, parameters_from_agents(game_states[0].agents), engine_name, seed, iterations, snapshot_path);
+
+        self.statistics.evaluate(game_states);
+        rows = [self.trial_row(run_id, trial, game_state, snapshot_path, trial if snapshot_path is not None else None)
+                    for trial, game_state in enumerate(game_states)];
+        columns = ["run_id", "trial", "iteration", "stopping_iteration", "number_of_agents"];
+        columns += [name for metric in self.metrics for name in [metric, f"{metric}_std"]];
+        columns += ["snapshot_path", "snapshot_index"];
+
+        with self.connection:
+            self.connection.executemany(f"INSERT INTO trials ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows);
+
+        return run_id;
+
+    def remove_run(self, run_id: int):
+        """Removes a run and its trials."""
+        with self.connection:
+            self.connection.execute("DELETE FROM trials WHERE run_id = ?", (run_id,));
+            self.connection.execute("DELETE FROM runs WHERE id = ?", (run_id,));
+
+    ########################################################################################
+    # Indexing snapshot files
+
+    def index_snapshot(self, path: str, experiment: str = None):
+        """Adds the run of a snapshot file holding a list of game states and returns its id.
+        Files indexed before are only indexed again when they changed since.
+        - experiment: name of the experiment, the directory of the file when None"""
+        if experiment is None:
+            experiment = os.path.dirname(path);
+
+        indexed = self.connection.execute("SELECT id, snapshot_modified FROM runs WHERE snapshot_path = ?", (path,)).fetchall();
+        if indexed and all(modified == os.path.getmtime(path) for _, modified in indexed):
+            return indexed[0][0];
+        for run_id, _ in indexed:
+            self.remove_run(run_id);
+
+        return self.add_game_states(experiment, snapshot_game_states(load_snapshot(path)), snapshot_path = path);
+
+    def index_directory(self, directory: str = "saved_variables", extensions: tuple = (".pickle", ".pickle.gz")):
+        """Indexes every snapshot file holding a list of game states below a directory, see index_snapshot.
+        Returns the ids of the runs, files holding other results are skipped."""
+        run_ids = [];
+        for root, _, files in sorted(os.walk(directory)):
+            for name in sorted(files):
+                if not name.endswith(extensions):
+                    continue;
+
+                path = os.path.join(root, name);
+                if not self.is_game_state_snapshot(path):
+                    continue;
+
+                run_ids.append(self.index_snapshot(path, experiment = os.path.relpath(root, directory)));
+
+        return run_ids;
+
+    def is_game_state_snapshot(self, path: str):
+        """Returns whether a snapshot file holds a non empty list of game states, files indexed before are not loaded."""
+        if self.connection.execute("SELECT 1 FROM runs WHERE snapshot_path = ? AND snapshot_modified = ?",
+                                   (path, os.path.getmtime(path))).fetchone() is not None:
+            return True;
+
+        try:
+            content = load_snapshot(path);
+        except (pickle.UnpicklingError, AttributeError, EOFError, OSError):
+            return False;
+
+        return isinstance(content, list) and len(content) > 0 and all(hasattr(game_state, "agents") or isinstance(game_state, CompactGameState)
+                                                                      for game_state in content);
+
+    ########################################################################################
+    # Queries
+
+    def query(self, sql: str, parameters: tuple = ()):
+        """Returns the rows of any SQL query on the runs and trials tables."""
+        return self.connection.execute(sql, parameters).fetchall();
+
+    def aggregate(self, metric: str, group_by: str, iteration: int = None, where: str = None, parameters: tuple = ()):
+        """Returns [group value, mean, standard deviation, trial count] of a metric over all trials per value of a run parameter.
+        Trials without a value (e.g. the success ratio before any game) are not counted, mean and standard deviation are None for groups without values.
+        - metric: "sound_size", "success_ratio" or "energy"
+        - group_by: column of the runs table, e.g. "max_noise_ambient" or "experiment"
+        - iteration: only use trials captured at this iteration, all trials when None
+        - where: extra SQL condition on the runs (r) and trials (t) tables, with ? for the given parameters"""
+        if metric not in self.metrics:
+            raise ValueError(f"Unknown metric {metric}, use one of {', '.join(self.metrics)}.");
+        if group_by not in ["experiment", "engine", "seed", "iterations"] + parameter_columns:
+            raise ValueError(f"Cannot group by {group_by}, use a column of the runs table.");
+
+        conditions = [];
+        if iteration is not None:
+            conditions.append("t.iteration = ?");
+            parameters = (iteration,) + tuple(parameters);
+        if where is not None:
+            conditions.append(f"({where})");
+
+        rows = self.query(f"""SELECT r.{group_by}, AVG(t.{metric}), AVG(t.{metric} * t.{metric}), COUNT(t.{metric})
+                              FROM trials t JOIN runs r ON r.id = t.run_id
+                              {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                              GROUP BY r.{group_by} ORDER BY r.{group_by}""", parameters);
+
+        return [[group, mean, float(np.sqrt(max(0.0, mean_of_squares - mean * mean))) if mean is not None else None, count]
+                    for group, mean, mean_of_squares, count in rows];
+
+    def run_parameters(self, run_id: int):
+        """Returns all parameters of a run as a dictionary."""
+        return json.loads(self.query("SELECT parameters FROM runs WHERE id = ?", (run_id,))[0][0]);
+
+    def load_game_state(self, trial_id: int):
+        """Returns the game state of a trial from its snapshot file."""
+        snapshot_path, snapshot_index = self.query("SELECT snapshot_path, snapshot_index FROM trials WHERE id = ?", (trial_id,))[0];
+        if snapshot_path is None:
+            raise ValueError(f"Trial {trial_id} is not linked to a snapshot file.");
+
+        if self.loaded_snapshot[0] != snapshot_path:
+            self.loaded_snapshot = (snapshot_path, load_snapshot(snapshot_path));
+
+        game_state = self.loaded_snapshot[1][snapshot_index];
+
+        return game_state.game_state() if isinstance(game_state, CompactGameState) else game_state;
@@ -0,0 +1,181 @@
+# This file includes the classes used to continue a single burned in imitation game in many trials
+
+############################################################################################
+# IMPORTS
+############################################################################################
+
+# Used for random number generation
+import random as rnd;
+
+# Used for running the continuations in worker processes
+import multiprocessing as mp;
+import os;
+
+# Used for leaving the captured burn in states out of the workers
+import copy;
+
+# Used for combining the progress of the continuations
+from progressReporterClasses import ProgressReporter, PrintProgressReporter, QueueProgressReporter, ProgressAggregator, set_event_reporter;
+
+############################################################################################
+# PARAMETER OVERRIDES
+############################################################################################
+
+def apply_parameter_overrides(engine, overrides):
+    """Changes the parameters of a (burned in) engine in place.
+    - overrides: function called as overrides(engine), or dictionary of attribute names and values
+      which is set on every agent, community behaviour, synthesizer and bark operator of the engine having that attribute,
+      e.g. {"max_noise_ambient": 0.15, "new_sound_prob": 0.02, "phoneme_step_size": 0.05, "second_formant_weight": 0.5}"""
+    if overrides is None:
+        return;
+
+    if callable(overrides):
+        overrides(engine);
+        return;
+
+    # Every object holding parameters, synthesizers, bark operators and behaviours are shared by many agents
+    owners = list(engine.agents);
+    owners += list(getattr(engine, "community_behaviours", {}).values());
+    owners += [owner.synthesizer for owner in owners];
+    owners += [agent.bark_operator for agent in engine.agents];
+    if hasattr(engine, "synthesizer"):
+        owners.append(engine.synthesizer);
+    owners.append(engine.bark_operator);
+
+    unique_owners = list({id(owner): owner for owner in owners}.values());
+
+    for name, value in overrides.items():
+        changed = False;
+        for owner in unique_owners:
+            if hasattr(owner, name):
+                setattr(owner, name, value);
+                changed = True;
+
+        if not changed:
+            raise ValueError(f"No agent, behaviour, synthesizer or bark operator of the engine has a parameter {name}.");
+
+############################################################################################
+# CONTINUATION WORKER
+############################################################################################
+
+# Burned in engine and progress queue of a worker process
+#   With the fork start method these are inherited from the parent process without being copied,
+#   the memory pages are only copied once a continuation changes them
+fork_source_engine = None;
+fork_progress_queue = None;
+
+def set_fork_source(engine, progress_queue):
+    """Initializes a worker process with the burned in engine and the progress queue of the parent process."""
+    global fork_source_engine, fork_progress_queue;
+    fork_source_engine = engine;
+    fork_progress_queue = progress_queue;
+
+def play_continuation(trial: int, overrides, seed: int, iterations: int, checkpoints: list):
+    """Plays a single continuation trial from the burned in engine of the worker process.
+    Returns a dictionary with the game state of every checkpoint reached."""
+    global fork_source_engine;
+    if fork_source_engine is None:
+        raise RuntimeError("The burned in engine of this worker process was already continued, use one process per trial.");
+
+    reporter = QueueProgressReporter(fork_progress_queue, worker_id = trial);
+    set_event_reporter(reporter);
+
+    # Every worker process plays a single trial, so the trial continues the image of the burned in game
+    #   inherited by this process instead of a deep copy, only the pages it changes are copied
+    engine = fork_source_engine;
+    fork_source_engine = None;
+    engine.progress_reporter = reporter;
+    engine.iterations = iterations;
+    apply_parameter_overrides(engine, overrides);
+
+    # Every trial uses its own random stream
+    rnd.seed(seed);
+
+    return engine.play_iterations(iterations - engine.iteration, checkpoints);
+
+def play_continuation_arguments(arguments: tuple):
+    """Plays a single continuation trial for a (trial, overrides, seed, iterations, checkpoints) tuple."""
+    return play_continuation(*arguments);
+
+############################################################################################
+# FORKED GAME ENGINE
+############################################################################################
+
+class ForkedGameEngine:
+    """This is a meta engine which plays the burn in of an imitation game once
+    and continues the burned in game in many trials, each with its own random stream and parameter overrides.
+    The trials run in worker processes which, when the fork start method is available,
+    share the memory of the burned in game instead of receiving a copy.
+    For example
+        forked_engine = ForkedGameEngine(CommunityGameEngine(...), burn_in_iterations = 2000, iterations = 3000,
+                                         overrides = [{"max_noise_ambient": noise} for noise in [0.1, 0.15, 0.2]]);
+        trial_game_states = forked_engine.play_imitation_game([1000, 2000, 2500, 3000]);"""
+    def __init__(self, engine, burn_in_iterations: int, iterations: int, overrides: list,
+                 seeds: list = None, workers: int = None, progress_reporter: ProgressReporter = None):
+        """Creates a Forked Game Engine instance.
+        - engine: GameEngine or CommunityGameEngine to be burned in, e.g. a new or resumed engine
+        - burn_in_iterations: amount of iterations played once before forking
+        - iterations: total amount of iterations of every continuation trial, including the burn in
+        - overrides: list of parameter overrides, one per trial, see apply_parameter_overrides (None keeps the parameters)
+        - seeds: random seed for every trial, random when None
+        - workers: amount of worker processes, the amount of CPUs when None
+        - progress_reporter: reporter for the combined progress of all trials, printed when None"""
+        self.engine = engine;
+        self.burn_in_iterations = burn_in_iterations;
+        self.iterations = iterations;
+        self.overrides = overrides;
+
+        if seeds is None:
+            seeds = [rnd.randrange(2**32) for _ in overrides];
+        self.seeds = seeds;
+
+        self.workers = workers if workers is not None else os.cpu_count();
+
+        if progress_reporter is None:
+            progress_reporter = PrintProgressReporter(description = "iterations over all trials");
+        self.progress_reporter = progress_reporter;
+
+    def play_burn_in(self, checkpoints: list):
+        """Plays the burn in, only the iterations not yet played by the engine, and returns its vector of game states.
+        Checkpoints after the burn in are None."""
+        self.engine.iterations = self.burn_in_iterations;
+
+        return self.engine.play_imitation_game(checkpoints);
+
+    def play_continuations(self, checkpoints: list):
+        """Plays all continuation trials from the burned in engine and returns a dictionary
+        with the game state of every checkpoint reached after the burn in, one per trial."""
+        # The captured burn in states are not needed in the workers
+        source_engine = copy.copy(self.engine);
+        source_engine.captured_states = {};
+
+        if "fork" in mp.get_all_start_methods():
+            context = mp.get_context("fork");
+        else:
+            context = mp.get_context();
+
+        # Combine the progress of all trials in a single report
+        progress_queue = context.Queue(maxsize = 1000);
+        aggregator = ProgressAggregator(progress_queue, reporter = self.progress_reporter);
+        aggregator.start();
+
+        trials = [(trial, overrides, seed, self.iterations, checkpoints)
+                    for trial, (overrides, seed) in enumerate(zip(self.overrides, self.seeds))];
+        try:
+            # Every trial changes the burned in engine of its worker process, so every trial gets a new process
+            with context.Pool(processes = max(1, min(self.workers, len(trials))), maxtasksperchild = 1,
+                              initializer = set_fork_source, initargs = (source_engine, progress_queue)) as pool:
+                trial_game_states = pool.map(play_continuation_arguments, trials, chunksize = 1);
+        finally:
+            aggregator.stop();
+
+        return trial_game_states;
+
+    def play_imitation_game(self, checkpoints: list):
+        """Plays the burn in and all continuation trials and returns a vector of game states per trial.
+        The game states of checkpoints within the burn in are shared by all trials.
+        - checkpoints: list of iteration numbers at which the state of the game should be saved (after playing that iteration)."""
+        burn_in_states = {checkpoint: state for checkpoint, state in zip(checkpoints, self.play_burn_in(checkpoints)) if state is not None};
+
+        return [[burn_in_states.get(checkpoint, game_states.get(checkpoint)) for checkpoint in checkpoints]
+                    for game_states in self.play_continuations(checkpoints)];
@@ -11,25 +11,127 @@ import uuid
 # Used for more complex mathematical operations
 import math
 
-# Used for plotting
-import matplotlib.pyplot as plt
 
 # Used for datatype representation
 import numpy as np
 
 # Easier iterations
 import itertools
-from collections import Counter
+from collections import Counter, OrderedDict
 
 # Deep copy lists
 import copy
 
+# Used for saving and resuming the full state of an engine
+import pickle
+import gzip
+import os
+
+# Used for writing snapshots in the background
+import threading
+import queue as queue_module
+import atexit
+
+# Used for caching and parallel evaluation of statistics
+import weakref
+import multiprocessing as mp
+
+# Used for reporting progress and agent events
+from progressReporterClasses import ProgressReporter, SilentProgressReporter, report_event
+
+# Compiled kernels of the "numba" backend
+import imitationGameKernels as kernels
+
+# Used for plotting, imported on first use so that the simulation itself does not load matplotlib
+def plotting():
+    """Returns the plotting classes module, importing it (and matplotlib) on first use."""
+    import plottingClasses
+    return plottingClasses
+
+# Tracer recording the events of all games in this process, None when not tracing, see eventTraceClasses
+event_tracer = None
+
+def set_event_tracer(tracer):
+    """Sets the tracer recording the events of all games in this process, None stops tracing."""
+    global event_tracer
+    event_tracer = tracer
+
+def trace_game_start(iteration: int, speaker, imitator):
+    """Informs the event tracer, if any, that the speaker and imitator start a game during the given iteration."""
+    if event_tracer is not None:
+        event_tracer.begin_game(iteration, speaker, imitator)
+
+def trace_game_end(speaker, imitator, success: bool):
+    """Informs the event tracer, if any, of the outcome of the game of the speaker and imitator."""
+    if event_tracer is not None:
+        event_tracer.end_game(speaker, imitator, success)
+
+############################################################################################
+# SLOTTED OBJECTS
+############################################################################################
+
+# Names of the slots of every slotted class, including those of its base classes
+slot_names_cache = {};
+
+def slot_names(slotted_class):
+    """Returns the names of the attributes stored in the __slots__ of a class and its base classes."""
+    if slotted_class not in slot_names_cache:
+        slot_names_cache[slotted_class] = tuple(name for base_class in reversed(slotted_class.__mro__)
+                                                    for name in base_class.__dict__.get("__slots__", ())
+                                                    if name not in ("__dict__", "__weakref__"));
+
+    return slot_names_cache[slotted_class];
+
+class SlottedObject:
+    """This is the base class of the classes with many instances, which keep their attributes in __slots__ instead of a __dict__.
+    They are pickled as a dictionary of their attributes, the same as before they used __slots__, so pickles of either version load."""
+    __slots__ = ();
+
+    # Values of attributes that objects pickled by older versions do not have
+    legacy_defaults = {};
+
+    def __getstate__(self):
+        """Returns the attributes that are set as a dictionary."""
+        state = {name: getattr(self, name) for name in slot_names(type(self)) if hasattr(self, name)};
+        state.update(getattr(self, "__dict__", {}));
+
+        return state;
+
+    def __setstate__(self, state):
+        """Sets the attributes of a pickled dictionary, dropping attributes that the class no longer has."""
+        # Pickled with the default state of slotted objects: (dictionary or None, dictionary of slots)
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **state[1]};
+
+        names = slot_names(type(self));
+        has_dict = hasattr(self, "__dict__");
+        for name, value in state.items():
+            if has_dict or name in names:
+                setattr(self, name, value);
+
+        for name, value in self.legacy_defaults.items():
+            if not hasattr(self, name):
+                setattr(self, name, value);
+
+class ImmutableSlottedObject(SlottedObject):
+    """This is the base class of slotted objects that are never changed after they were made,
+    so copies (e.g. of the agents in a game state) share them instead of copying them."""
+    __slots__ = ();
+
+    def __copy__(self):
+        return self;
+
+    def __deepcopy__(self, memo):
+        return self;
+
 ############################################################################################
 # UTTERANCE
 ############################################################################################
 
-class Utterance:
+class Utterance(ImmutableSlottedObject):
     """This class represent an utterance consisting of the different formants F."""
+    __slots__ = ("f1", "f2", "f3", "f4");
+
     def __init__(self, f1, f2, f3, f4):
         """Creates an utterance instance."""
         self.f1 = f1;
@@ -49,8 +151,10 @@ class Utterance:
 # PHONEME
 ############################################################################################
 
-class Phoneme:
+class Phoneme(ImmutableSlottedObject):
     """This class represent a phoneme consisting of the different vowel parameters."""
+    __slots__ = ("p", "h", "r");
+
     def __init__(self, p, h, r):
         """Creates a Phoneme instance."""
         # Values should be between 0 and 1
@@ -105,6 +209,29 @@ class Synthesizer:
         f4 +=((1480-602*phoneme.r)*pow(phoneme.h, 2)+(-1220+289*phoneme.r)*phoneme.h+3678-178*phoneme.r);
         
         return f4;
+
+    @staticmethod
+    def formant_array(phonemes: np.ndarray):
+        """Calculates the four noiseless formants of an (n, 3) array of p, h and r values as an (n, 4) array."""
+        p, h, r = phonemes[:, 0], phonemes[:, 1], phonemes[:, 2];
+
+        f1 = ((-392+392*r)*h**2+(596-668*r)*h-146+166*r)*p**2;
+        f1 += ((348-348*r)*h**2+(-494+606*r)*h+141-175*r)*p;
+        f1 += ((340-72*r)*h**2+(-796+108*r)*h+708-38*r);
+
+        f2 = ((-1200+1208*r)*h**2+(1320-1328*r)*h+118-158*r)*p**2;
+        f2 += ((1864-1488*r)*h**2+(-2644+1510*r)*h-561+221*r)*p;
+        f2 += ((-670+490*r)*h**2 + (1355-697*r)*h + 1517-117*r);
+
+        f3 = ((604-604*r)*h**2+(1038-1178*r)*h+246+566*r)*p**2;
+        f3 += ((-1150+1262*r)*h**2+(-1443+1313*r)*h-317-483*r)*p;
+        f3 += ((1130-836*r)*h**2+(-315+44*r)*h+2427-127*r);
+
+        f4 = ((-1120+16*r)*h**2+(1696-180*r)*h+500+522*r)*p**2;
+        f4 += ((-140+240*r)*h**2+(-578+214*r)*h-692-419*r)*p;
+        f4 += ((1480-602*r)*h**2+(-1220+289*r)*h+3678-178*r);
+
+        return np.stack([f1, f2, f3, f4], axis=1);
     
     def synthesise(self, phoneme: Phoneme):
         """Synthesises a phoneme using the synthesiser's noise settings."""
@@ -241,20 +368,158 @@ class BarkOperator:
         
         return math.sqrt(f1_difference + (self.second_formant_weight * f2_difference));
 
+    def distance_between_bark_points(self, f1_bark_1, f2_bark_1, f1_bark_2, f2_bark_2):
+        """Calculates the distance between 2 utterances given by their first and effective second formant barks."""
+        f1_difference = math.pow(f1_bark_1 - f1_bark_2, 2);
+        f2_difference = math.pow(f2_bark_1 - f2_bark_2, 2);
+
+        return math.sqrt(f1_difference + (self.second_formant_weight * f2_difference));
+
     def max_merge_distance(self, noise: float):
         """Maximum merge distance for non distinct sounding utterances."""
         return (math.log(1 + noise) / 0.1719) - (math.log(1 - noise) / 0.1719);
-    
+
+    def hertz_to_bark_array(self, hertz: np.ndarray):
+        """Converts an array of hertz values to bark, element wise the same as hertz_to_bark (up to rounding)."""
+        hertz = np.asarray(hertz, dtype=np.float64);
+
+        if(self.better_bark_conversion):
+            bark = (26.81*hertz)/(1960 + hertz) - 0.53;
+            bark = np.where(bark < 2, bark + (0.15 * (2 - bark)), bark);
+            return np.where(bark > 20.1, bark + (0.22 * (bark - 20.1)), bark);
+
+        # Clip below the boundary so the logarithm of the unused branch stays defined
+        return np.where(hertz > 271.32, (np.log(np.maximum(hertz, 271.32)/271.32) / 0.1719) + 2, (hertz-51)/110);
+
+    def weighted_f2_array(self, f2_bark: np.ndarray, f3_bark: np.ndarray, f4_bark: np.ndarray):
+        """Calculates the effective second formant for arrays of barks, element wise the same as weighted_f2."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight1 = (self.critical_distance - (f3_bark - f2_bark)) / self.critical_distance;
+            weight2 = np.abs(((f4_bark - f3_bark) - (f3_bark - f2_bark)) / (f4_bark - f2_bark));
+
+            conditions = [f3_bark - f2_bark > self.critical_distance,
+                          (f4_bark - f2_bark) > self.critical_distance,
+                          (f3_bark - f2_bark) < (f4_bark - f3_bark)];
+            choices = [f2_bark,
+                       (((2 - weight1) * f2_bark) + (weight1 * f3_bark)) / 2,
+                       (((weight2 * f2_bark) + ((2 - weight2) * f3_bark)) / 2) - 1];
+
+            return np.select(conditions, choices, ((((2 - weight2) * f3_bark) + (weight2 * f4_bark)) / 2) - 1);
+
+    def bark_points(self, formants: np.ndarray):
+        """Converts an (n, 4) array of formants in hertz to the first formant barks and the effective second formant barks."""
+        formants = np.asarray(formants, dtype=np.float64).reshape(-1, 4);
+        barks = self.hertz_to_bark_array(formants);
+
+        return barks[:, 0], self.weighted_f2_array(barks[:, 1], barks[:, 2], barks[:, 3]);
+
+    def utterance_bark_points(self, utterances: list):
+        """Converts a list of utterances to arrays of first formant barks and effective second formant barks."""
+        formants = [(utterance.f1, utterance.f2, utterance.f3, utterance.f4) for utterance in utterances];
+
+        return self.bark_points(formants);
+
+############################################################################################
+# SYNTHESIS CACHE
+############################################################################################
+
+class SynthesisCache:
+    """This is a bounded least recently used cache of noiseless syntheses.
+    It stores the utterance of a phoneme and its Bark point per bark operator setting.
+    By default phonemes are only equal when exactly equal, so games stay identical to games without the cache.
+    With a resolution phonemes are quantised, so revisiting a point of the step lattice reuses the earlier synthesis
+    even when rounding made the phoneme differ in its last digits (slightly changing the course of a game)."""
+    def __init__(self, max_size: int = 65536, resolution: float = None):
+        """Creates a Synthesis Cache instance.
+        - max_size: maximum amount of phonemes kept, 0 disables the cache
+        - resolution: phonemes closer than this are considered equal, exact equality when None"""
+        self.max_size = max_size;
+        self.resolution = resolution;
+        self.entries = OrderedDict();
+
+        # Keep track of the cache use
+        self.hits = 0;
+        self.misses = 0;
+
+    def key(self, phoneme: Phoneme):
+        """Returns the (quantised) phoneme used as cache key."""
+        if self.resolution is None:
+            return (phoneme.p, phoneme.h, phoneme.r);
+
+        return (round(phoneme.p / self.resolution), round(phoneme.h / self.resolution), round(phoneme.r / self.resolution));
+
+    def entry(self, phoneme: Phoneme):
+        """Returns the [utterance, bark points] entry of a phoneme, synthesising it on a miss."""
+        if self.max_size <= 0:
+            self.misses += 1;
+            return [Synthesizer(max_noise_ambient = 0).synthesise(phoneme), {}];
+
+        key = self.key(phoneme);
+        entry = self.entries.get(key);
+        if entry is not None:
+            self.hits += 1;
+            self.entries.move_to_end(key);
+            return entry;
+
+        self.misses += 1;
+        entry = [Synthesizer(max_noise_ambient = 0).synthesise(phoneme), {}];
+        self.entries[key] = entry;
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False);
+
+        return entry;
+
+    def utterance(self, phoneme: Phoneme):
+        """Returns the noiseless utterance of a phoneme."""
+        return self.entry(phoneme)[0];
+
+    def bark_point(self, phoneme: Phoneme, bark_operator: BarkOperator):
+        """Returns the first formant bark and effective second formant bark of the noiseless utterance of a phoneme."""
+        utterance, bark_points = self.entry(phoneme);
+
+        # The Bark point only depends on these bark operator settings
+        operator_key = (bark_operator.better_bark_conversion, bark_operator.critical_distance);
+        bark_point = bark_points.get(operator_key);
+        if bark_point is None:
+            bark_point = (bark_operator.bark_f1(utterance), bark_operator.bark_f2(utterance));
+            bark_points[operator_key] = bark_point;
+
+        return bark_point;
+
+    def statistics(self):
+        """Returns the hits, misses, hit ratio and size of the cache as a dictionary."""
+        lookups = self.hits + self.misses;
+
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups > 0 else float("nan"),
+                "size": len(self.entries)};
+
+    def clear(self):
+        """Removes all entries and resets the statistics."""
+        self.entries.clear();
+        self.hits = 0;
+        self.misses = 0;
+
+# Cache used for the noiseless syntheses of all sounds in this process
+synthesis_cache = SynthesisCache();
+
+def set_synthesis_cache(cache: SynthesisCache):
+    """Sets the cache used for the noiseless syntheses of all sounds in this process, e.g. SynthesisCache(max_size = 0) to disable it."""
+    global synthesis_cache;
+    synthesis_cache = cache;
+
 ############################################################################################
 # SOUND
 ############################################################################################
 
-class Sound:
+class Sound(SlottedObject):
     """This is a class used to represent known sounds in an agents repetoire."""
+    __slots__ = ("phoneme", "utterance", "usage_count", "success_count");
+
     def __init__(self, phoneme: Phoneme):
         """Creates a Sound instance."""
         self.phoneme = phoneme;
-        self.utterance = Synthesizer(max_noise_ambient = 0).synthesise(phoneme);
+        self.utterance = synthesis_cache.utterance(phoneme);
         self.usage_count = 0;
         self.success_count = 0;
         
@@ -288,16 +553,26 @@ class Sound:
 # AGENT
 ############################################################################################
 
-class Agent:
+class Agent(SlottedObject):
     """This is a class used to represent agents in the experiment.
     The known_phonemes are used to represent the vowels known by the agent."""
+    __slots__ = ("known_sounds", "last_spoken_sound", "last_heard_utterance",
+                 "games_count", "success_count", "speaker_count", "imitator_count", "name",
+                 "synthesizer", "bark_operator", "logger", "phoneme_step_size", "max_similar_sound_loops", "max_semi_random_loop",
+                 "sound_threshold_game", "sound_threshold_agent", "sound_minimum_tries",
+                 "cleanup_prob", "new_sound_prob", "merge_prob", "kernel_backend");
+
+    # Backend used for finding and improving sounds, agents saved before backends existed use python
+    legacy_defaults = {"kernel_backend": "python"};
+
     def __init__(self, synthesizer: Synthesizer, bark_operator: BarkOperator,
                     logger: bool = False,
                     phoneme_step_size: float = 0.1, max_similar_sound_loops: int = 20, max_semi_random_loop: int = 5,
                     sound_threshold_game: float = 0.5, sound_threshold_agent:float = 0.7, sound_minimum_tries: int = 5,
-                    cleanup_prob = 0.1, new_sound_prob = 0.01, merge_prob = 1):
+                    cleanup_prob = 0.1, new_sound_prob = 0.01, merge_prob = 1, kernel_backend: str = "python"):
         """Creates an instance of a Agent.
-        Default settings are those from de Boer."""
+        Default settings are those from de Boer.
+        - kernel_backend: "python" or "numba" (compiled kernels, python when numba is not installed)"""
         # --------- Variables to be set according to init
         # Init known sounds
         self.known_sounds = [];
@@ -335,6 +610,9 @@ class Agent:
         self.cleanup_prob = cleanup_prob;
         self.new_sound_prob = new_sound_prob;
         self.merge_prob = merge_prob;
+
+        # Backend used for finding and improving sounds
+        self.kernel_backend = kernels.resolve_kernel_backend(kernel_backend);
         
         
         
@@ -372,6 +650,35 @@ class Agent:
         """Returns the success ratio of the agent in games."""
         return self.success_count / self.games_count;
 
+    def compact_state(self, precision: str = "float64"):
+        """Returns the learned state of the agent (name, game counts and repetoire) as compact arrays.
+        The synthesizer, bark operator and agent settings are not included.
+        - precision: storage precision of the phonemes and counts, see storage_precisions"""
+        phoneme_dtype, count_dtype = storage_dtypes(precision);
+        phonemes = np.array([[sound.phoneme.p, sound.phoneme.h, sound.phoneme.r] for sound in self.known_sounds], dtype=phoneme_dtype).reshape(-1, 3);
+        counts = np.array([[sound.usage_count, sound.success_count] for sound in self.known_sounds], dtype=count_dtype).reshape(-1, 2);
+        game_counts = (self.games_count, self.success_count, self.speaker_count, self.imitator_count);
+
+        return (self.name, game_counts, phonemes, counts);
+
+    def restore_compact_state(self, compact_state: tuple):
+        """Replaces the learned state of the agent by the one made with compact_state.
+        The agent keeps its own synthesizer, bark operator and settings."""
+        name, game_counts, phonemes, counts = compact_state;
+
+        self.name = name;
+        self.games_count, self.success_count, self.speaker_count, self.imitator_count = game_counts;
+        self.last_spoken_sound = None;
+        self.last_heard_utterance = None;
+
+        # Rebuild the known sounds, utterances are noiseless so they are synthesised identically
+        self.known_sounds = [];
+        for (p, h, r), (usage_count, success_count) in zip(phonemes.tolist(), counts.tolist()):
+            sound = Sound(Phoneme(p, h, r));
+            sound.usage_count = usage_count;
+            sound.success_count = success_count;
+            self.known_sounds.append(sound);
+
     def energy(self):
         """Returns the energy the agent's sound repetoire according to its bark operator."""
         energy = 0;
@@ -395,8 +702,10 @@ class Agent:
         for sound in self.known_sounds:
             if (sound.usage_count > self.sound_minimum_tries and sound.success_ratio() < self.sound_threshold_agent):
                 sounds_to_remove.append(sound);
+                if event_tracer is not None:
+                    event_tracer.remove(self, sound);
                 if self.logger:
-                    print(self.name + ": Removed sound during cleanup.");
+                    report_event(self.name, "Removed sound during cleanup.");
                     
         # Do the remove at the end to ensure no buggy loops, ensure no dupes in list
         sounds_to_remove = list(set(sounds_to_remove))
@@ -404,9 +713,11 @@ class Agent:
             # Keep unique values
             self.known_sounds.remove(sound);
 
-    def merge_similar_sound(self):
+    def merge_similar_sound(self, candidates: list = None):
         """Cleans up an agent by removing similar sounds.
-        Does this by comparing the sounds using the logic from de Boer (2000) comparison code."""
+        Does this by comparing the sounds using the logic from de Boer (2000) comparison code.
+        - candidates: matrix of the sound pairs that may merge, see merge_similar_sounds_of_game_state, all pairs when None.
+          Merges of candidates are made on captured game states and are not traced as game events"""
         # Keep track of sounds needing removing
         sounds_to_remove = [];
                     
@@ -418,6 +729,10 @@ class Agent:
                  continue;
              
              for potential_merge_index in range(eval_index + 1, len(self.known_sounds)):
+                if candidates is not None and not candidates[eval_index][potential_merge_index]:
+                    # Too far apart to be merged
+                    continue;
+
                 potential_merge_sound = self.known_sounds[potential_merge_index];
                 if potential_merge_sound in sounds_to_remove:
                     # Don't consider this sound
@@ -443,6 +758,8 @@ class Agent:
                      
                     # Merge worst sound to best sound
                     best_sound.merge(worst_sound);
+                    if event_tracer is not None and candidates is None:
+                        event_tracer.merge(self, worst_sound, best_sound);
         
         # Do the remove at the end to ensure no buggy loops, ensure no dupes in list
         sounds_to_remove = list(set(sounds_to_remove))
@@ -460,10 +777,22 @@ class Agent:
         # Add phoneme to known sounds
         sound = Sound(phoneme);
         self.known_sounds.append(sound);
+        if event_tracer is not None:
+            event_tracer.add_random(self, sound);
         
         if self.logger:
-            print(self.name + ": Added a random sound to my repetoire.");
+            report_event(self.name, "Added a random sound to my repetoire.");
         
+    def summed_distance(self, new_sound: Sound):
+        """Returns the summed distance of a sound to all known sounds, with their Bark points from the synthesis cache."""
+        f1, f2 = self.bark_operator.bark_f1(new_sound.utterance), self.bark_operator.bark_f2(new_sound.utterance);
+
+        distance = 0;
+        for old_sound in self.known_sounds:
+            distance += self.bark_operator.distance_between_bark_points(f1, f2, *synthesis_cache.bark_point(old_sound.phoneme, self.bark_operator));
+
+        return distance;
+
     def add_semi_random_known_sound(self):
         """Adds random sound to agents repetoire by trying max_semi_random_loop variants.
         The variant with the highest summed distance to other vowels is picked."""
@@ -473,9 +802,7 @@ class Agent:
         new_r = rnd.uniform(0, 1);
         phoneme = Phoneme(new_p, new_h, new_r);
         best_sound = Sound(phoneme);
-        best_distance = 0;
-        for old_sound in self.known_sounds:
-                best_distance += self.bark_operator.distance_between_utterances(best_sound.utterance, old_sound.utterance);
+        best_distance = self.summed_distance(best_sound);
         
         # Now try the remainder
         for i in range(self.max_semi_random_loop - 1):
@@ -487,9 +814,7 @@ class Agent:
             new_sound = Sound(phoneme);
 
             # calculate distance
-            distance = 0;
-            for old_sound in self.known_sounds:
-                distance += self.bark_operator.distance_between_utterances(new_sound.utterance, old_sound.utterance);
+            distance = self.summed_distance(new_sound);
 
             # Check if best distance
             if distance > best_distance:
@@ -498,37 +823,64 @@ class Agent:
 
         # Add semi random sound
         self.known_sounds.append(best_sound);
+        if event_tracer is not None:
+            event_tracer.add_semi_random(self, best_sound);
 
         if self.logger:
-            print(self.name + ": Added a semi random sound to my repetoire.");
+            report_event(self.name, "Added a semi random sound to my repetoire.");
         
-    def improve_sound(self, original_sound: Sound, goal_utterance: Utterance):
+    # Offsets of the variations of a phoneme in phoneme_step_size units, in itertools.product order
+    variation_offsets = np.array(list(itertools.product([-1, 0, 1], repeat=3)), dtype=np.float64);
+
+    def improve_sound(self, original_sound: Sound, goal_utterance: Utterance, steps: int = 1):
         """Returns improved original sound which is more like the goal sound.
-        Considers all permutations of phoneme using phoneme_step_size"""
-        # Determine all possible variations of parameter modifications
-        variations = [p for p in itertools.product([-self.phoneme_step_size, 0, self.phoneme_step_size], repeat=3)];
-        
-        # Init vars
-        best_distance = float('inf');
-        best_sound = original_sound;
-        for variation in variations:
-            # Create variation sound
-            new_p = original_sound.phoneme.p + variation[0];
-            new_h = original_sound.phoneme.h + variation[1];
-            new_r = original_sound.phoneme.r + variation[2];
-            new_phoneme = Phoneme(new_p, new_h, new_r);
-            new_sound = Sound(new_phoneme);
-            
-            # Test variation
-            new_distance = self.bark_operator.distance_between_utterances(goal_utterance, new_sound.utterance);
-            if (new_distance < best_distance):
-                best_distance = new_distance;
-                best_sound = new_sound;
-            
+        Considers all permutations of phoneme using phoneme_step_size, evaluated together in one batch per step.
+        - steps: amount of improvement steps, stops early once the phoneme itself is the best permutation
+          as the following steps would not change it anymore"""
+        if self.kernel_backend == "numba":
+            return self.improve_sound_kernel(original_sound, goal_utterance, steps);
+
+        # Goal in bark, fixed over all steps
+        goal_f1 = self.bark_operator.bark_f1(goal_utterance);
+        goal_f2 = self.bark_operator.bark_f2(goal_utterance);
+
+        phoneme = np.array([original_sound.phoneme.p, original_sound.phoneme.h, original_sound.phoneme.r]);
+        offsets = self.variation_offsets * self.phoneme_step_size;
+        moved = False;
+
+        for _ in range(steps):
+            # All variations, limited to the phoneme boundaries like Phoneme does
+            variations = np.clip(phoneme + offsets, 0, 1);
+            f1, f2 = self.bark_operator.bark_points(Synthesizer.formant_array(variations));
+            distances = np.sqrt((goal_f1 - f1)**2 + (self.bark_operator.second_formant_weight * (goal_f2 - f2)**2));
+
+            # First best variation, the same one a sequential search keeps
+            best_variation = variations[np.argmin(distances)];
+            if np.array_equal(best_variation, phoneme):
+                break;
+
+            phoneme = best_variation;
+            moved = True;
+
         # Return best found variation
-        return best_sound;
-        
-        
+        if not moved:
+            return original_sound;
+
+        return Sound(Phoneme(*phoneme.tolist()));
+
+    def improve_sound_kernel(self, original_sound: Sound, goal_utterance: Utterance, steps: int = 1):
+        """Returns the same improved sound as improve_sound, with all steps taken in a single compiled kernel."""
+        phoneme = original_sound.phoneme;
+        p, h, r = kernels.improve_phoneme(phoneme.p, phoneme.h, phoneme.r, self.phoneme_step_size, steps,
+                                          goal_utterance.f1, goal_utterance.f2, goal_utterance.f3, goal_utterance.f4,
+                                          self.bark_operator.better_bark_conversion, self.bark_operator.critical_distance,
+                                          self.bark_operator.second_formant_weight);
+
+        if (p, h, r) == (phoneme.p, phoneme.h, phoneme.r):
+            return original_sound;
+
+        return Sound(Phoneme(p, h, r));
+
     def add_similar_sound(self, goal_utterance: Utterance):
         """Adds sound to agents repetoire that sounds similar to the given utterance."""
         # Start from a 'corner' as per de Boer's code
@@ -548,28 +900,49 @@ class Agent:
                 best_sound = new_sound;
         
         # Improve sound for specified amount of times
-        for i in range(self.max_similar_sound_loops):
-            best_sound = self.improve_sound(best_sound, goal_utterance);
+        best_sound = self.improve_sound(best_sound, goal_utterance, steps = self.max_similar_sound_loops);
             
         if self.logger:
-            print(self.name + ": Added a similar sound to the one I heard to my repetoire.");
+            report_event(self.name, "Added a similar sound to the one I heard to my repetoire.");
             
         # Add the best sound
         self.known_sounds.append(best_sound);
+        if event_tracer is not None:
+            event_tracer.add_similar(self, best_sound);
         
 
     def find_similar_sound(self, goal_utterance: Utterance):
         """Returns sound in repetoire closes to given utterance."""
+        if self.kernel_backend == "numba":
+            return self.find_similar_sound_kernel(goal_utterance);
+
         best_distance = float('inf');
         best_sound = None;
+
+        # Goal in bark, the Bark points of the known sounds come from the synthesis cache
+        goal_f1 = self.bark_operator.bark_f1(goal_utterance);
+        goal_f2 = self.bark_operator.bark_f2(goal_utterance);
         
         for sound in self.known_sounds:
-            new_distance = self.bark_operator.distance_between_utterances(goal_utterance, sound.utterance);
+            new_distance = self.bark_operator.distance_between_bark_points(goal_f1, goal_f2, *synthesis_cache.bark_point(sound.phoneme, self.bark_operator));
             if (new_distance < best_distance):
                 best_distance = new_distance;
                 best_sound = sound;
                 
         return best_sound;
+
+    def find_similar_sound_kernel(self, goal_utterance: Utterance):
+        """Returns the same sound as find_similar_sound, with the distances calculated in a single compiled kernel."""
+        if not self.known_sounds:
+            return None;
+
+        formant_table = np.array([(sound.utterance.f1, sound.utterance.f2, sound.utterance.f3, sound.utterance.f4)
+                                    for sound in self.known_sounds], dtype=np.float64);
+        index = kernels.nearest_formants(formant_table, goal_utterance.f1, goal_utterance.f2, goal_utterance.f3, goal_utterance.f4,
+                                         self.bark_operator.better_bark_conversion, self.bark_operator.critical_distance,
+                                         self.bark_operator.second_formant_weight);
+
+        return self.known_sounds[index] if index >= 0 else None;
         
     def say_something(self):
         """Produces a random utterance and stores it has said it.
@@ -584,12 +957,14 @@ class Agent:
         
         # Register use
         sound.was_used();
+        if event_tracer is not None:
+            event_tracer.speak(self, sound);
         
         # Produce an utterance from the chosen sound
         utterance = self.synthesizer.synthesise(sound.phoneme);
         
         if self.logger:
-            print(self.name + ": saying " + utterance.string());
+            report_event(self.name, "saying " + utterance.string());
         
         # Return the utterance
         return utterance;
@@ -597,7 +972,7 @@ class Agent:
     def imitate_sound(self, heard_utterance: Utterance):
         """Produces an utterance based on the utterance it just heard."""
         if self.logger:
-            print(self.name + ": heard " + heard_utterance.string());
+            report_event(self.name, "heard " + heard_utterance.string());
             
         # Safe just heard sound
         self.last_heard_utterance = heard_utterance;
@@ -615,9 +990,11 @@ class Agent:
         # Register use
         self.last_spoken_sound = self.known_sounds.index(closest_sound);
         closest_sound.was_used();
+        if event_tracer is not None:
+            event_tracer.imitate(self, closest_sound, self.bark_operator.distance_between_utterances(heard_utterance, closest_sound.utterance));
         
         if self.logger:
-            print(self.name + ": imitated " + closest_sound.utterance.string());
+            report_event(self.name, "imitated " + closest_sound.utterance.string());
         
         
         # Return the utterance
@@ -626,7 +1003,7 @@ class Agent:
     def validate_imitation(self, heard_utterance: Utterance):
         """Returns true if imitation is correct according to agent, ending the game cycle."""
         if self.logger:
-            print(self.name + ": heard " + heard_utterance.string());
+            report_event(self.name, "heard " + heard_utterance.string());
             
         # Find closest sound
         closest_sound = self.find_similar_sound(heard_utterance);
@@ -636,31 +1013,39 @@ class Agent:
         
         if good_imitation:
             self.known_sounds[self.last_spoken_sound].was_success();
+        if event_tracer is not None:
+            event_tracer.validate(self, closest_sound, self.known_sounds[self.last_spoken_sound],
+                                  self.bark_operator.distance_between_utterances(heard_utterance, closest_sound.utterance));
         
         if self.logger:
             if good_imitation:
-                print(self.name + ": confirmed match with " + closest_sound.utterance.string());
+                report_event(self.name, "confirmed match with " + closest_sound.utterance.string());
             else:
-                print(self.name + ": rejected match with  " + closest_sound.utterance.string());
+                report_event(self.name, "rejected match with  " + closest_sound.utterance.string());
                 
         # End of current game
         self.prepare_for_new_game(was_imitator=False, was_succes= good_imitation);
         
         return good_imitation;
     
+    def shift_last_spoken_sound_closer(self):
+        """Improves the last spoken sound so that it sounds more like the last heard utterance."""
+        sound = self.known_sounds[self.last_spoken_sound];
+        sound.improve(self.improve_sound(sound, self.last_heard_utterance));
+        if event_tracer is not None:
+            event_tracer.improve(self, sound);
+
     def process_non_verbal_imitation_confirmation(self, was_success):
         """Processes the non verbal confirmation if an imitation was correct, ending the game cycle."""
         if was_success:
             # Save success
             self.known_sounds[self.last_spoken_sound].was_success();
             # "Shift closer"
-            improved_sound = self.improve_sound(self.known_sounds[self.last_spoken_sound], self.last_heard_utterance);
-            self.known_sounds[self.last_spoken_sound].improve(improved_sound);
+            self.shift_last_spoken_sound_closer();
         else:
             if self.known_sounds[self.last_spoken_sound].success_ratio() < self.sound_threshold_game:
                 # Probably bad sound - "Shift closer"
-                improved_sound = self.improve_sound(self.known_sounds[self.last_spoken_sound], self.last_heard_utterance);
-                self.known_sounds[self.last_spoken_sound].improve(improved_sound);
+                self.shift_last_spoken_sound_closer();
             else:
                 # Probably good sound - add new sound to repetoire
                 self.add_similar_sound(self.last_heard_utterance);
@@ -668,7 +1053,7 @@ class Agent:
             
         if self.logger:
             if was_success:
-                print(self.name + ": had a confirmed match, changed my sound to match closer.");
+                report_event(self.name, "had a confirmed match, changed my sound to match closer.");
                 
         # End of current game
         self.prepare_for_new_game(was_imitator=True, was_succes= was_success);
@@ -680,6 +1065,9 @@ class Agent:
 
 class GameState:
     """This is a class used to represent the state of a game."""
+    # Iteration at which a converged game was stopped, None when it played all iterations (or was saved before this was recorded)
+    stopping_iteration = None;
+
     def __init__(self, agents: list, iteration: int):
         """Creates a Game Engine instance.
         - agents: list of agent objects to be stored
@@ -687,40 +1075,426 @@ class GameState:
         self.agents = copy.deepcopy(agents);
         self.iteration = iteration;
 
-    def plot(self, title: str = None, show_legend: bool = True):
-        # Change plot size and color, then start new plot 
-        plt.rcParams["figure.figsize"] = (10,10);
-        plt.rcParams['figure.facecolor'] = 'white';
-        plt.figure();
-        
-        # Plot the utterances on an agent per agent basis
-        for agent in self.agents:
-            f1 = [agent.bark_operator.bark_f1(sound.utterance) for sound in agent.known_sounds];
-            f2 = [agent.bark_operator.bark_f2(sound.utterance) for sound in agent.known_sounds];
-            plt.plot(f2, f1, 'o', label=agent.name);
+    def bark_points(self):
+        """Returns the first formant barks, effective second formant barks and agent index of all known sounds as arrays.
+        The conversion is done in one pass per bark operator used by the agents."""
+        formants = [];
+        agent_indexes = [];
+        operator_indexes = {};
+        for index, agent in enumerate(self.agents):
+            formants += [(sound.utterance.f1, sound.utterance.f2, sound.utterance.f3, sound.utterance.f4) for sound in agent.known_sounds];
+            agent_indexes += [index] * len(agent.known_sounds);
+            operator_indexes.setdefault(agent.bark_operator, []).append(index);
+
+        formants = np.array(formants, dtype=np.float64).reshape(-1, 4);
+        agent_indexes = np.array(agent_indexes, dtype=np.int64);
+        f1 = np.empty(len(formants));
+        f2 = np.empty(len(formants));
+
+        # Agents normally share a single bark operator
+        for bark_operator, indexes in operator_indexes.items():
+            mask = np.isin(agent_indexes, indexes);
+            f1[mask], f2[mask] = bark_operator.bark_points(formants[mask]);
+
+        return f1, f2, agent_indexes;
+
+    def plot(self, title: str = None, show_legend: bool = True, mode: str = "scatter"):
+        """Plot all sounds of all agents with a single call, coloured per agent.
+        - mode: "scatter", or "hexbin" / "density" for a density map of large populations"""
+        ax = plotting().new_pyplot_axes();
+        self.draw(ax, title = title, show_legend = show_legend, mode = mode);
+
+    def draw(self, ax, title: str = None, show_legend: bool = True, mode: str = "scatter"):
+        """Draws all sounds of all agents on the given axes, see plot."""
+        # Plot the utterances of all agents at once
+        plotter = plotting().VowelSpacePlotter(mode = mode);
+        f1, f2, agent_indexes = self.bark_points();
+        plotter.plot_agents(ax, f1, f2, agent_indexes, [agent.name for agent in self.agents], show_legend);
+
+        # Set titles and plot parameters
+        plotter.format_axes(ax, str(self.iteration) + " games" if title == None else title);
+
+def merge_similar_sounds_of_game_state(game_state, margin: float = 1e-9):
+    """Merges the similar sounds of every agent of a captured game state, exactly as Agent.merge_similar_sound does.
+    The phoneme and bark distances of all sound pairs of all agents are computed in one pass over padded repetoire arrays,
+    after which only the agents having pairs close enough to merge run the merge, limited to those pairs.
+    - margin: added to the merge distances so that no pair is missed through rounding, pairs are checked exactly by the merge"""
+    agents = game_state.agents;
+    sizes = np.array([len(agent.known_sounds) for agent in agents], dtype=np.int64);
+    if len(agents) == 0 or sizes.max() < 2:
+        return;
+
+    # Padded (agent, sound) arrays of the phonemes and bark points, padding is nan and never close
+    f1, f2, agent_indexes = GameState.bark_points(game_state);
+    positions = np.arange(len(agent_indexes)) - np.repeat(np.cumsum(sizes) - sizes, sizes);
+    shape = (len(agents), sizes.max());
+
+    phonemes = np.full(shape + (3,), np.nan);
+    phonemes[agent_indexes, positions] = [(sound.phoneme.p, sound.phoneme.h, sound.phoneme.r) for agent in agents for sound in agent.known_sounds];
+    f1_barks = np.full(shape, np.nan);
+    f1_barks[agent_indexes, positions] = f1;
+    f2_barks = np.full(shape, np.nan);
+    f2_barks[agent_indexes, positions] = f2;
+
+    second_formant_weights = np.array([agent.bark_operator.second_formant_weight for agent in agents]);
+    merge_distances = np.array([agent.bark_operator.max_merge_distance(agent.synthesizer.max_noise_ambient) for agent in agents]);
+
+    # Distances between all sound pairs of every agent
+    phoneme_distances = np.sqrt(((phonemes[:, :, None, :] - phonemes[:, None, :, :])**2).sum(axis=3));
+    utterance_distances = np.sqrt((f1_barks[:, :, None] - f1_barks[:, None, :])**2
+                                  + second_formant_weights[:, None, None] * (f2_barks[:, :, None] - f2_barks[:, None, :])**2);
+
+    candidates = (phoneme_distances < 0.17 + margin) | (utterance_distances < merge_distances[:, None, None] + margin);
+    candidates &= np.triu(np.ones((shape[1], shape[1]), dtype=bool), k=1);
+
+    for agent_index in np.flatnonzero(candidates.any(axis=(1, 2))):
+        agents[agent_index].merge_similar_sound(candidates[agent_index].tolist());
 
-        # Set titles
-        if title == None:
-            plt.title(str(self.iteration) + " games");
-        else:
-            plt.title(title);
-        plt.xlabel("F'2 in bark");
-        plt.ylabel("F1 in bark");
-        
-        # Change pot parameters
-        plt.ylim(1, 8);
-        plt.xlim(7, 16);
-        plt.gca().invert_xaxis();
-        plt.gca().invert_yaxis();
-        plt.grid();
 
-        # Show legend
-        if show_legend:
-            plt.legend(title="Agent names", loc="lower left");
+############################################################################################
+# COMPACT GAME STATE
+############################################################################################
 
-        # Reset figure size for next figures
-        plt.rcParams["figure.figsize"] = plt.rcParamsDefault["figure.figsize"];
-        plt.rcParams["figure.facecolor"] = plt.rcParamsDefault["figure.facecolor"];
+# Datatypes of the phonemes and of the usage, success and game counters of every storage precision
+storage_precisions = {"float64": (np.float64, np.int64),
+                      "float32": (np.float32, np.int32)};
+
+def storage_dtypes(precision: str):
+    """Returns the phoneme and counter datatypes of a storage precision."""
+    if precision not in storage_precisions:
+        raise ValueError(f"Unknown storage precision {precision}, use one of {', '.join(storage_precisions)}.");
+
+    return storage_precisions[precision];
+
+class CompactGameState:
+    """This is a class used to archive a game state as a few arrays instead of sound objects.
+    The phonemes and counters of all agents are stored in a single array each, in float32 and int32 by default,
+    which takes half the memory of float64 arrays and pickles to less than half of the game state. For example
+        archived_states = [CompactGameState(game_state) for game_state in game_states];
+        game_state = archived_states[-1].game_state();"""
+    def __init__(self, game_state, precision: str = "float32"):
+        """Creates a Compact Game State instance.
+        - game_state: GameState or CommunityGameState to be stored
+        - precision: storage precision of the phonemes and counts, see storage_precisions"""
+        self.state_class = type(game_state);
+        self.iteration = game_state.iteration;
+        self.stopping_iteration = game_state.stopping_iteration;
+        self.precision = precision;
+
+        # Agents without their sounds, they keep their settings, role, synthesizer and bark operator
+        agent_settings = [copy.copy(agent) for agent in game_state.agents];
+        for agent in agent_settings:
+            agent.known_sounds = [];
+            agent.last_spoken_sound = None;
+            agent.last_heard_utterance = None;
+        self.agent_settings = copy.deepcopy(agent_settings);
+
+        # Learned state of all agents, the sounds of agent i are the sound_counts[i] rows after those of the agents before it
+        compact_states = [agent.compact_state(precision) for agent in game_state.agents];
+        phoneme_dtype, count_dtype = storage_dtypes(precision);
+        self.names = [compact_state[0] for compact_state in compact_states];
+        self.game_counts = np.array([compact_state[1] for compact_state in compact_states], dtype=count_dtype).reshape(-1, 4);
+        self.sound_counts = np.array([len(compact_state[2]) for compact_state in compact_states], dtype=np.int32);
+        self.phonemes = np.concatenate([compact_state[2] for compact_state in compact_states] + [np.zeros((0, 3), dtype=phoneme_dtype)]);
+        self.counts = np.concatenate([compact_state[3] for compact_state in compact_states] + [np.zeros((0, 2), dtype=count_dtype)]);
+
+    def nbytes(self):
+        """Returns the amount of bytes taken by the arrays of the learned state."""
+        return self.game_counts.nbytes + self.sound_counts.nbytes + self.phonemes.nbytes + self.counts.nbytes;
+
+    def restore_agents(self):
+        """Returns new agents with the stored settings and learned state."""
+        agents = copy.deepcopy(self.agent_settings);
+        offsets = np.concatenate([[0], np.cumsum(self.sound_counts)]).tolist();
+        for index, agent in enumerate(agents):
+            start, stop = offsets[index], offsets[index + 1];
+            agent.restore_compact_state((self.names[index], tuple(self.game_counts[index].tolist()),
+                                         self.phonemes[start:stop], self.counts[start:stop]));
+
+        return agents;
+
+    def game_state(self):
+        """Returns the stored game state as a GameState or CommunityGameState, with phonemes of the stored precision."""
+        game_state = self.state_class.__new__(self.state_class);
+        game_state.agents = self.restore_agents();
+        game_state.iteration = self.iteration;
+        game_state.stopping_iteration = self.stopping_iteration;
+
+        return game_state;
+
+############################################################################################
+# CONVERGENCE MONITOR
+############################################################################################
+
+class ConvergenceMonitor:
+    """This is a class used to detect that a game stopped changing, so that it can be stopped early.
+    Every check_interval iterations the population is measured:
+    - success ratio of the games played since the previous check
+    - mean amount of known sounds per agent (repertoire size)
+    - drift of the vowels, median bark distance of every sound to the nearest sound the same agent knew at the previous check
+      (the median ignores the few sounds that were added at random since the previous check)
+    The game has converged when the success ratio and repertoire size vary within their tolerance over the last patience + 1 checks
+    and the vowel drift stays within its tolerance at the last patience checks.
+    The range over the window is used instead of the change since the previous check, so that a slow trend is not taken for a plateau."""
+    def __init__(self, check_interval: int, success_tolerance: float = 0.05, size_tolerance: float = 0.5,
+                 drift_tolerance: float = 1.0, patience: int = 3, min_iterations: int = 0):
+        """Creates a Convergence Monitor instance.
+        - check_interval: amount of iterations between two checks (the window of the success ratio)
+        - success_tolerance: maximum range of the windowed success ratio over the last patience + 1 checks
+        - size_tolerance: maximum range of the mean repertoire size over the last patience + 1 checks
+        - drift_tolerance: maximum median vowel drift in bark between two checks
+        - patience: amount of checks after the first check of the window needed to stop
+        - min_iterations: the game is never stopped before this iteration"""
+        self.check_interval = check_interval;
+        self.success_tolerance = success_tolerance;
+        self.size_tolerance = size_tolerance;
+        self.drift_tolerance = drift_tolerance;
+        self.patience = patience;
+        self.min_iterations = min_iterations;
+        self.reset();
+
+    def reset(self):
+        """Forgets all previous checks, done when a game starts playing."""
+        self.history = [];
+        self.previous_agents = None;
+
+    def iterations_until_check(self, iteration: int):
+        """Returns the amount of iterations to be played after iteration before the next check."""
+        return self.check_interval - iteration % self.check_interval;
+
+    def measure(self, agents: list):
+        """Returns the game and success counts and the bark points of the known sounds of every agent, by agent name."""
+        measured_agents = {};
+        for agent in agents:
+            f1, f2 = agent.bark_operator.utterance_bark_points([sound.utterance for sound in agent.known_sounds]);
+            measured_agents[agent.name] = (agent.games_count, agent.success_count, np.stack([f1, f2], axis=1));
+
+        return measured_agents;
+
+    def vowel_drift(self, measured_agents: dict):
+        """Returns the median bark distance of the sounds of every agent to the nearest sound it knew at the previous check.
+        Only agents that knew sounds at both checks are taken into account."""
+        drifts = [];
+        for name, (_, _, points) in measured_agents.items():
+            previous = self.previous_agents.get(name);
+            if previous is None or len(points) == 0 or len(previous[2]) == 0:
+                continue;
+
+            distances = np.sqrt(((points[:, None, :] - previous[2][None, :, :])**2).sum(axis=2));
+            drifts.append(distances.min(axis=1));
+
+        return float(np.median(np.concatenate(drifts))) if drifts else float("nan");
+
+    def check(self, engine):
+        """Measures the agents of the engine and returns whether the game has converged."""
+        measured_agents = self.measure(engine.agents);
+
+        # Success ratio of the games played since the previous check, by the agents that were there at that check
+        games = 0;
+        successes = 0;
+        for name, (games_count, success_count, _) in measured_agents.items():
+            previous = self.previous_agents.get(name, (0, 0)) if self.previous_agents is not None else (0, 0);
+            games += games_count - previous[0];
+            successes += success_count - previous[1];
+
+        measures = {"iteration": engine.iteration,
+                    "success_ratio": successes / games if games > 0 else float("nan"),
+                    "sound_size": float(np.mean([len(agent.known_sounds) for agent in engine.agents])),
+                    "vowel_drift": self.vowel_drift(measured_agents) if self.previous_agents is not None else float("nan")};
+
+        self.history.append(measures);
+        self.previous_agents = measured_agents;
+
+        return self.stationary() and engine.iteration >= self.min_iterations;
+
+    def stationary(self):
+        """Returns whether the measures of the last patience + 1 checks stay within their tolerances.
+        Missing measures (nan) are never stationary."""
+        window = self.history[-(self.patience + 1):];
+        if len(window) < self.patience + 1:
+            return False;
+
+        success_ratios = np.array([measures["success_ratio"] for measures in window]);
+        sound_sizes = np.array([measures["sound_size"] for measures in window]);
+        vowel_drifts = np.array([measures["vowel_drift"] for measures in window[1:]]);
+
+        return bool(np.ptp(success_ratios) <= self.success_tolerance
+                    and np.ptp(sound_sizes) <= self.size_tolerance
+                    and np.all(vowel_drifts <= self.drift_tolerance));
+
+############################################################################################
+# ENGINE STATE
+############################################################################################
+
+def save_engine_state(engine, path: str, compresslevel: int = 6):
+    """Writes the full state of an engine to a compressed binary file so that it can be resumed later.
+    This includes the agents, the iteration counter, the game states captured so far and the state of the random generator.
+    The progress reporter is not saved, the file is replaced atomically so an interrupted save keeps the previous state.
+    - engine: GameEngine or CommunityGameEngine to be saved
+    - path: file to write the state to
+    - compresslevel: gzip compression level, from 1 (fastest) to 9 (smallest)"""
+    write_compressed_file(path, engine_state_bytes(engine), compresslevel);
+
+def engine_state_bytes(engine):
+    """Returns the full state of an engine pickled to bytes, as written by save_engine_state."""
+    engine_state = {name: value for name, value in vars(engine).items() if name != "progress_reporter"};
+
+    return pickle.dumps((type(engine), engine_state, rnd.getstate()), protocol=pickle.HIGHEST_PROTOCOL);
+
+def write_compressed_file(path: str, data: bytes, compresslevel: int = 6):
+    """Writes bytes to a gzip compressed file, replacing it atomically so an interrupted write keeps the previous file."""
+    temporary_path = path + ".tmp";
+    with gzip.open(temporary_path, "wb", compresslevel=compresslevel) as file:
+        file.write(data);
+    os.replace(temporary_path, path);
+
+def load_engine_state(path: str, engine_class, progress_reporter: ProgressReporter):
+    """Returns the engine saved by save_engine_state and restores the state of the random generator,
+    so that continuing the game gives exactly the same result as an uninterrupted game.
+    - engine_class: expected class of the saved engine
+    - progress_reporter: reporter given to the resumed engine"""
+    with gzip.open(path, "rb") as file:
+        saved_class, engine_state, random_state = pickle.load(file);
+
+    if not issubclass(saved_class, engine_class):
+        raise TypeError(f"{path} holds a {saved_class.__name__}, not a {engine_class.__name__}.");
+
+    engine = saved_class.__new__(saved_class);
+    engine.__dict__.update(engine_state);
+    engine.progress_reporter = progress_reporter;
+
+    # Continue the random stream where the saved game left off
+    rnd.setstate(random_state);
+
+    return engine;
+
+class SnapshotWriter:
+    """This is a class used to write snapshots to compressed files in a background thread, so a game does not wait for the disk.
+    Snapshots wait in a queue of at most max_pending snapshots, adding one to a full queue waits until one was written.
+    Errors of the background thread are raised by the next call. For example
+        with SnapshotWriter() as writer:
+            game_states = game_engine.play_imitation_game(checkpoints, "engine.gz", 1000, snapshot_writer = writer);
+            writer.write("game_states.pickle.gz", game_states);"""
+    def __init__(self, max_pending: int = 4, compresslevel: int = 6):
+        """Creates a Snapshot Writer instance and starts its background thread.
+        - max_pending: amount of snapshots that can wait to be written
+        - compresslevel: gzip compression level, from 1 (fastest) to 9 (smallest)"""
+        self.compresslevel = compresslevel;
+        self.queue = queue_module.Queue(maxsize=max_pending);
+        self.error = None;
+        self.written_count = 0;
+
+        self.thread = threading.Thread(target=self.__run, daemon=True);
+        self.thread.start();
+
+        # Write the remaining snapshots when the interpreter exits without closing the writer
+        atexit.register(self.close);
+
+    def __enter__(self):
+        return self;
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close();
+
+    def __run(self):
+        """Writes the queued snapshots until the writer is closed."""
+        while True:
+            item = self.queue.get();
+            try:
+                if item is None:
+                    return;
+
+                path, content, pickled = item;
+                data = content if pickled else pickle.dumps(content, protocol=pickle.HIGHEST_PROTOCOL);
+                write_compressed_file(path, data, self.compresslevel);
+                self.written_count += 1;
+            except Exception as error:
+                self.error = error;
+            finally:
+                self.queue.task_done();
+
+    def raise_error(self):
+        """Raises the error of the background thread, if any."""
+        if self.error is not None:
+            error, self.error = self.error, None;
+            raise RuntimeError("A snapshot could not be written.") from error;
+
+    def put(self, path: str, content, pickled: bool):
+        """Adds a snapshot to the queue, waiting while the queue is full."""
+        self.raise_error();
+        if not self.thread.is_alive():
+            raise RuntimeError("The snapshot writer is closed.");
+
+        self.queue.put((path, content, pickled));
+
+    def write(self, path: str, content):
+        """Pickles and writes any content in the background, e.g. a list of captured game states.
+        The content should not be changed until it was written, see flush."""
+        self.put(path, content, False);
+
+    def write_engine_state(self, engine, path: str):
+        """Writes the full state of an engine in the background, the same file as save_engine_state.
+        The engine is pickled right away, so it can continue playing while the state is compressed and written."""
+        self.put(path, engine_state_bytes(engine), True);
+
+    def flush(self):
+        """Waits until all queued snapshots were written."""
+        self.queue.join();
+        self.raise_error();
+
+    def close(self):
+        """Writes the remaining snapshots and stops the background thread."""
+        if self.thread.is_alive():
+            self.queue.put(None);
+            self.thread.join();
+        atexit.unregister(self.close);
+        self.raise_error();
+
+def play_and_save(engine, checkpoints: list, save_path: str = None, save_interval: int = None,
+                  convergence_monitor: ConvergenceMonitor = None, snapshot_writer: SnapshotWriter = None):
+    """Plays the remaining iterations of the engine, saving its full state every save_interval iterations
+    and once the game is finished. Returns a dictionary with the game state of every checkpoint reached.
+    The saves are written in the background by the snapshot_writer when given, flush it before reading the file.
+    When the convergence_monitor detects convergence the game stops early, engine.stopping_iteration is set
+    and the state at that iteration is used for all checkpoints that were not reached."""
+    game_states = {};
+    engine.stopping_iteration = None;
+    if convergence_monitor is not None:
+        convergence_monitor.reset();
+
+    while engine.iteration < engine.iterations:
+        amount = engine.iterations - engine.iteration;
+        if save_path is not None and save_interval is not None:
+            amount = min(amount, save_interval - engine.iteration % save_interval);
+        if convergence_monitor is not None:
+            amount = min(amount, convergence_monitor.iterations_until_check(engine.iteration));
+
+        game_states.update(engine.play_iterations(amount, checkpoints));
+
+        # Stop early once the game converged
+        if convergence_monitor is not None and convergence_monitor.check(engine):
+            engine.stopping_iteration = engine.iteration;
+            final_state = game_states[engine.iteration] if engine.iteration in game_states else engine.capture_game_state();
+            for checkpoint in checkpoints:
+                if checkpoint > engine.iteration:
+                    game_states[checkpoint] = final_state;
+
+        # Every state records where the game stopped
+        for game_state in game_states.values():
+            game_state.stopping_iteration = engine.stopping_iteration;
+
+        # Captured states are part of the engine state, so a resumed game returns them as well
+        if save_path is not None:
+            engine.captured_states.update(game_states);
+            if snapshot_writer is not None:
+                snapshot_writer.write_engine_state(engine, save_path);
+            else:
+                engine.save_state(save_path);
+
+        if engine.stopping_iteration is not None:
+            break;
+
+    return game_states;
 
 ############################################################################################
 # GAME ENGINE
@@ -728,18 +1502,36 @@ class GameState:
 
 class GameEngine:
     """This is a class used to represent an imitation game egine."""
+    # Iteration at which the last played game converged, None when it played all iterations
+    stopping_iteration = None;
+
+    # Backend used by the agents, engines saved before backends existed use python
+    kernel_backend = "python";
+
+    # Recorder (e.g. a CheckpointSeries) called at every checkpoint instead of capturing a game state, see play_iterations
+    checkpoint_recorder = None;
+
     def __init__(self, number_of_agents: int, iterations: int, synthesizer: Synthesizer, bark_operator: BarkOperator, 
                     agent_phoneme_step_size: float = 0.1, agent_sound_threshold_game: float = 0.5, agent_sound_threshold_self:float = 0.7,
-                    agent_sound_minimum_tries: int = 5, agent_new_sound_probability: float = 0.01):
+                    agent_sound_minimum_tries: int = 5, agent_new_sound_probability: float = 0.01,
+                    progress_reporter: ProgressReporter = None, kernel_backend: str = "python"):
         """Creates a Game Engine instance.
         - number_of_agents: number of equally loaded agents to be created, should be multiple of two
         - iterations: amount of iterations the game should be played for
         - synthesizer: synthesizer that should be used by all agents
-        - bark_operator: bark operator that should be used by all agents"""
+        - bark_operator: bark operator that should be used by all agents
+        - progress_reporter: reporter informed after every iteration, silent when None
+        - kernel_backend: "python" or "numba" (compiled kernels, python when numba is not installed) used by all agents"""
         self.number_of_agents = number_of_agents;
         self.iterations = iterations;
         self.synthesizer = synthesizer;
         self.bark_operator = bark_operator;
+        self.progress_reporter = progress_reporter if progress_reporter is not None else SilentProgressReporter();
+        self.kernel_backend = kernels.resolve_kernel_backend(kernel_backend);
+
+        # Keep track of the amount of iterations already played and the game states captured so far
+        self.iteration = 0;
+        self.captured_states = {};
 
         # Create the agents
         self.agents = [Agent(synthesizer= synthesizer, bark_operator= bark_operator, 
@@ -747,7 +1539,8 @@ class GameEngine:
                                 sound_threshold_game= agent_sound_threshold_game,
                                 sound_threshold_agent= agent_sound_threshold_self,
                                 sound_minimum_tries= agent_sound_minimum_tries,
-                                new_sound_prob = agent_new_sound_probability)
+                                new_sound_prob = agent_new_sound_probability,
+                                kernel_backend = self.kernel_backend)
                                     for n in range(number_of_agents)];
 
     def __play_all_agents_imitation_round(self):
@@ -778,273 +1571,505 @@ class GameEngine:
         speaker, imitator = rnd.sample(self.agents, 2);
 
         # play game
+        trace_game_start(self.iteration, speaker, imitator);
         start_utterance = speaker.say_something();
         imitated_utterance = imitator.imitate_sound(start_utterance);
         validation = speaker.validate_imitation(imitated_utterance);
         imitator.process_non_verbal_imitation_confirmation(validation);
-        
-    def play_imitation_game(self, checkpoints: list):
-        """Plays an imitation game and returns a vector of GameState objects.
-        - checkpoints: list of iteration numbers at which the state of the game should be saved (after playing that iteration)."""
-        
-        game_states = [None] * len(checkpoints);
+        trace_game_end(speaker, imitator, validation);
+        
+    def play_imitation_game(self, checkpoints: list, save_path: str = None, save_interval: int = None,
+                            convergence_monitor: ConvergenceMonitor = None, snapshot_writer: SnapshotWriter = None):
+        """Plays the remaining iterations of an imitation game and returns a vector of GameState objects.
+        - checkpoints: list of iteration numbers at which the state of the game should be saved (after playing that iteration)
+        - save_path: file to which the full engine state is written every save_interval iterations, see resume_from
+        - save_interval: amount of iterations between two saves, only saved at the end when None
+        - convergence_monitor: stops the game early once converged, see play_and_save
+        - snapshot_writer: writes the saves in the background, see SnapshotWriter"""
+        self.captured_states.update(play_and_save(self, checkpoints, save_path, save_interval, convergence_monitor, snapshot_writer));
+
+        # Return the game states
+        return [self.captured_states.get(checkpoint) for checkpoint in checkpoints];
+
+    def play_iterations(self, amount: int, checkpoints: list):
+        """Plays the given amount of iterations, continuing from the current iteration of the engine.
+        Returns a dictionary with the GameState of every checkpoint reached.
+        - amount: number of single pair imitation rounds to be played
+        - checkpoints: list of iteration numbers at which the state of the game should be saved (after playing that iteration),
+          recorded by the checkpoint_recorder instead when it is set"""
+        game_states = {};
+
+        for _ in range(amount):
+            i = self.iteration;
 
-        for i in range(self.iterations):
             # Play one iteration of the game
             self.__play_single_pair_imitation_round();
+            self.iteration += 1;
 
             # After playing the game, check if checkpoint reached for storing
             if i + 1 in checkpoints:
-                # Force merge of agent for Energy measure
-                for agent in self.agents:
-                    agent.merge_similar_sound();
-                    
-                # Store imitation game state
-                game_states[checkpoints.index(i + 1)] = GameState(self.agents, i + 1);
+                if self.checkpoint_recorder is not None:
+                    self.checkpoint_recorder.record(self);
+                else:
+                    game_states[i + 1] = self.capture_game_state();
+
+            # Show progress
+            self.progress_reporter.progress(i + 1, self.iterations);
 
-        # Return the game states
         return game_states;
 
+    def capture_game_state(self):
+        """Returns the GameState at the current iteration."""
+        # Store imitation game state
+        game_state = GameState(self.agents, self.iteration);
+
+        # Force merge of agent for Energy measure, on the copied agents so that the game itself is not changed
+        merge_similar_sounds_of_game_state(game_state);
+
+        return game_state;
+
+    def save_state(self, path: str):
+        """Writes the full state of the engine to path, see save_engine_state."""
+        save_engine_state(self, path);
+
+    @classmethod
+    def resume_from(cls, path: str, progress_reporter: ProgressReporter = None):
+        """Returns the engine saved to path, continuing it gives exactly the same game as an uninterrupted run.
+        Raise iterations before playing to extend a finished game.
+        - progress_reporter: reporter informed after every iteration, silent when None"""
+        return load_engine_state(path, cls, progress_reporter if progress_reporter is not None else SilentProgressReporter());
+
 
 ############################################################################################
 # Statistics
 ############################################################################################
 
+def game_state_metrics(game_state: GameState):
+    """Returns the vowel size, success ratio and energy of every agent of a game state as arrays, in a single pass.
+    The success ratio of agents that did not play yet is nan.
+    The energy is the same as Agent.energy, the sound pairs of all agents are compared at once in padded (agent, sound) arrays,
+    so memory grows with the agents times their largest repetoire squared, as in merge_similar_sounds_of_game_state."""
+    agents = game_state.agents;
+    games_counts = np.array([agent.games_count for agent in agents], dtype=np.float64);
+    success_counts = np.array([agent.success_count for agent in agents], dtype=np.float64);
+    second_formant_weights = np.array([agent.bark_operator.second_formant_weight for agent in agents], dtype=np.float64);
+    sizes = np.array([len(agent.known_sounds) for agent in agents], dtype=np.int64);
+
+    # Community game states are not game states, but hold agents in the same way
+    f1, f2, agent_indexes = GameState.bark_points(game_state);
+
+    # Padded (agent, sound) arrays of the bark points, padding is nan
+    positions = np.arange(len(agent_indexes)) - np.repeat(np.cumsum(sizes) - sizes, sizes);
+    shape = (len(agents), sizes.max() if len(agents) > 0 else 0);
+    f1_barks = np.full(shape, np.nan);
+    f1_barks[agent_indexes, positions] = f1;
+    f2_barks = np.full(shape, np.nan);
+    f2_barks[agent_indexes, positions] = f2;
+
+    # Squared distances between all sounds of the same agent, equal sounds and padding are skipped
+    squared_distances = ((f1_barks[:, :, None] - f1_barks[:, None, :])**2
+                         + second_formant_weights[:, None, None] * (f2_barks[:, :, None] - f2_barks[:, None, :])**2);
+    squared_distances[(squared_distances == 0) | np.isnan(squared_distances)] = np.inf;
+    sound_energies = (1 / squared_distances).sum(axis=2)[agent_indexes, positions];
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        success_ratios = np.where(games_counts > 0, success_counts / games_counts, np.nan);
+
+    return {"sound_size": sizes.astype(np.float64),
+            "success_ratio": success_ratios,
+            "energy": np.bincount(agent_indexes, weights=sound_energies, minlength=len(agents)).astype(np.float64)};
+
+# Metrics of every evaluated game state, kept as long as the game state itself exists
+game_state_metrics_cache = weakref.WeakKeyDictionary();
+
+# Game states evaluated by a worker process
+#   With the fork start method these are inherited from the parent process without being copied
+statistics_source_states = None;
+
+def set_statistics_source(game_states: list):
+    """Initializes a worker process with the game states to be evaluated."""
+    global statistics_source_states;
+    statistics_source_states = game_states;
+
+def source_game_state_metrics(index: int):
+    """Returns the metrics of a game state of the worker process, see game_state_metrics."""
+    return game_state_metrics(statistics_source_states[index]);
+
+# Phonemes (p, h, r) and IPA symbols of the known reference vowels
+reference_vowel_phonemes = np.array([[0, 0, 0],
+                                     [0, 0, 1],
+                                     [0.5, 0, 0],
+                                     [0.5, 0, 1],
+                                     [1, 0, 0],
+                                     [1, 0, 1],
+                                     [0, 0.5, 0],
+                                     [0, 0.5, 1],
+                                     [0.5, 0.5, 0],
+                                     [0.5, 0.5, 1],
+                                     [1, 0.5, 0],
+                                     [1, 0.5, 1],
+                                     [0, 1, 0],
+                                     [0, 1, 1],
+                                     [0.5, 1, 0],
+                                     [0.5, 1, 1],
+                                     [1, 1, 0],
+                                     [1, 1, 1]], dtype=np.float64);
+
+reference_vowel_symbols = ["[a]", "[œ]", "[ɐ]", "[ɐ̹]", "[ɑ]", "[ɒ]", "[e]", "[ø]", "[ə]", "[e]", "[ɤ]", "[o]", "[i]", "[y]", "[ɨ]", "[ʉ]", "[ɯ]", "[u]"];
+
+# Bark points of the reference vowels per bark conversion and critical distance
+reference_vowel_tables = {};
+
+def reference_vowel_table(bark_operator: BarkOperator):
+    """Returns the first formant barks and effective second formant barks of the noiseless reference vowels for a bark operator,
+    synthesised once per bark conversion and critical distance."""
+    key = (bark_operator.better_bark_conversion, bark_operator.critical_distance);
+    if key not in reference_vowel_tables:
+        reference_vowel_tables[key] = bark_operator.bark_points(Synthesizer.formant_array(reference_vowel_phonemes));
+
+    return reference_vowel_tables[key];
+
+class VowelSystem:
+    """This is a class used to represent the vowel categories shared by the agents of a game state.
+    Categories are ordered from the most to the least densely used."""
+    def __init__(self, iteration: int, centroids: np.ndarray, spreads: np.ndarray, support: np.ndarray,
+                 coverage: np.ndarray, point_categories: np.ndarray):
+        """Creates a Vowel System instance.
+        - iteration: iteration of the game state
+        - centroids: first formant bark and effective second formant bark of every category, shape (categories, 2)
+        - spreads: root mean square bark distance of the sounds of every category to its centroid
+        - support: fraction of the agents having a sound in every category
+        - coverage: fraction of the categories every agent has a sound in
+        - point_categories: category of every sound, in GameState.bark_points order, -1 for sounds of no category"""
+        self.iteration = iteration;
+        self.centroids = centroids;
+        self.spreads = spreads;
+        self.support = support;
+        self.coverage = coverage;
+        self.point_categories = point_categories;
+
+    @property
+    def category_count(self):
+        """Returns the amount of vowel categories."""
+        return len(self.centroids);
+
+def extract_vowel_system(game_state, second_formant_weight: float, cell_size: float = 0.25, category_distance: float = 1.0,
+                         min_agent_fraction: float = 0.5, iterations: int = 10):
+    """Returns the VowelSystem of a game state by clustering the bark points of the sounds of all agents.
+    The points are first hashed into a grid of cells, the densest cells separated by category_distance seed a weighted k-means
+    over the cells, and categories used by fewer than min_agent_fraction of the agents are left out.
+    Distances are bark distances, the effective second formant is weighted by second_formant_weight."""
+    f1, f2, agent_indexes = GameState.bark_points(game_state);
+    number_of_agents = len(game_state.agents);
+    if len(f1) == 0:
+        return VowelSystem(game_state.iteration, np.empty((0, 2)), np.empty(0), np.empty(0), np.zeros(number_of_agents), np.empty(0, dtype=np.int64));
+
+    # Points in a space where the euclidean distance is the bark distance
+    second_formant_scale = math.sqrt(second_formant_weight);
+    points = np.stack([f1, f2 * second_formant_scale], axis=1);
+
+    # Grid hashing, every cell is a single point weighted by its amount of sounds
+    cells, point_cells, cell_weights = np.unique(np.floor(points / cell_size).astype(np.int64), axis=0, return_inverse=True, return_counts=True);
+    point_cells = point_cells.reshape(-1);
+    cell_points = np.zeros((len(cells), 2));
+    np.add.at(cell_points, point_cells, points);
+    cell_points /= cell_weights[:, None];
+
+    # Seeds, the densest cells at least category_distance apart
+    seeds = [];
+    for cell in np.argsort(-cell_weights, kind="stable"):
+        if not seeds or np.min(np.sum((cell_points[seeds] - cell_points[cell])**2, axis=1)) >= category_distance**2:
+            seeds.append(cell);
+    centroids = cell_points[seeds];
+
+    # Weighted k-means over the cells
+    for _ in range(iterations):
+        cell_categories = np.argmin(np.sum((cell_points[:, None, :] - centroids[None, :, :])**2, axis=2), axis=1);
+        totals = np.bincount(cell_categories, weights=cell_weights, minlength=len(centroids));
+        sums = np.zeros_like(centroids);
+        np.add.at(sums, cell_categories, cell_points * cell_weights[:, None]);
+        new_centroids = np.where(totals[:, None] > 0, sums / np.maximum(totals, 1)[:, None], centroids);
+        if np.allclose(new_centroids, centroids):
+            break;
+        centroids = new_centroids;
+    cell_categories = np.argmin(np.sum((cell_points[:, None, :] - centroids[None, :, :])**2, axis=2), axis=1);
+    point_categories = cell_categories[point_cells];
+
+    # Keep the categories used by enough agents
+    membership = np.zeros((number_of_agents, len(centroids)), dtype=bool);
+    membership[agent_indexes, point_categories] = True;
+    support = membership.mean(axis=0);
+    kept = np.flatnonzero(support >= min_agent_fraction);
+    category_numbers = np.full(len(centroids), -1, dtype=np.int64);
+    category_numbers[kept] = np.arange(len(kept));
+    point_categories = category_numbers[point_categories];
+
+    # Spread of every kept category around its centroid
+    categorised = point_categories >= 0;
+    squared_distances = np.sum((points[categorised] - centroids[kept][point_categories[categorised]])**2, axis=1);
+    spreads = np.sqrt(np.bincount(point_categories[categorised], weights=squared_distances, minlength=len(kept))
+                      / np.maximum(np.bincount(point_categories[categorised], minlength=len(kept)), 1));
+
+    centroids = centroids[kept] / np.array([1, second_formant_scale]);
+    coverage = membership[:, kept].mean(axis=1) if len(kept) > 0 else np.zeros(number_of_agents);
+
+    return VowelSystem(game_state.iteration, centroids, spreads, support[kept], coverage, point_categories);
+
+# Vowel systems of every evaluated game state per set of clustering settings, kept as long as the game state itself exists
+vowel_system_cache = weakref.WeakKeyDictionary();
+
 class Statistics:
-    """This is a class used to calculate and plot some of the experiment statistics."""
-    def __init__(self, bark_operator: BarkOperator):
+    """This is a class used to calculate and plot some of the experiment statistics.
+    The metrics of every game state are computed once, in parallel for many game states when workers are asked for,
+    and cached while the game state exists, so summaries and distributions of the same game states do not compute them again."""
+    # Smallest amount of new game states evaluated by worker processes, fewer are evaluated in this process.
+    # Starting the workers and sending back the metrics costs about 0.1 seconds while a game state takes about 0.4 ms,
+    # so fewer game states are evaluated faster in this process, even on several cores
+    parallel_minimum = 1000;
+
+    def __init__(self, bark_operator: BarkOperator, workers: int = 1):
+        """Creates a Statistics instance.
+        - bark_operator: bark operator used for plotting the known vowels
+        - workers: amount of worker processes evaluating many game states, the amount of CPUs when None"""
         self.bark_operator = bark_operator;
+        self.workers = workers if workers is not None else os.cpu_count();
+
+    def evaluate(self, game_states: list):
+        """Computes the metrics of all game states that were not evaluated before, in parallel when there are many."""
+        missing = list({id(game_state): game_state for game_state in game_states if game_state not in game_state_metrics_cache}.values());
+        if not missing:
+            return;
+
+        if self.workers > 1 and len(missing) >= self.parallel_minimum:
+            context = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else mp.get_context();
+            with context.Pool(processes = self.workers, initializer = set_statistics_source, initargs = (missing,)) as pool:
+                metrics = pool.map(source_game_state_metrics, range(len(missing)), chunksize = max(1, len(missing) // (4 * self.workers)));
+        else:
+            metrics = [game_state_metrics(game_state) for game_state in missing];
+
+        for game_state, game_state_metric in zip(missing, metrics):
+            game_state_metrics_cache[game_state] = game_state_metric;
+
+    def game_state_metrics(self, game_state: GameState):
+        """Returns the cached metrics of a game state, see game_state_metrics."""
+        if game_state not in game_state_metrics_cache:
+            game_state_metrics_cache[game_state] = game_state_metrics(game_state);
+
+        return game_state_metrics_cache[game_state];
+
+    def average_metrics(self, game_states: list, metric: str):
+        """Returns the metric averaged over the agents for every game state as an array.
+        - metric: "sound_size", "success_ratio" or "energy" """
+        self.evaluate(game_states);
+
+        return np.array([game_state_metrics_cache[game_state][metric].mean() for game_state in game_states]);
+
+    def vowel_system(self, game_state: GameState, cell_size: float = 0.25, category_distance: float = 1.0, min_agent_fraction: float = 0.5):
+        """Returns the vowel categories shared by the agents of a game state, see extract_vowel_system, cached per game state.
+        - cell_size: size in bark of the grid cells the sounds are hashed into
+        - category_distance: smallest bark distance between the seeds of two categories
+        - min_agent_fraction: fraction of the agents that should have a sound in a category"""
+        key = (self.bark_operator.second_formant_weight, cell_size, category_distance, min_agent_fraction);
+        vowel_systems = vowel_system_cache.setdefault(game_state, {});
+        if key not in vowel_systems:
+            vowel_systems[key] = extract_vowel_system(game_state, self.bark_operator.second_formant_weight, cell_size = cell_size,
+                                                      category_distance = category_distance, min_agent_fraction = min_agent_fraction);
+
+        return vowel_systems[key];
+
+    def average_category_count(self, game_states: list, cell_size: float = 0.25, category_distance: float = 1.0, min_agent_fraction: float = 0.5):
+        """Returns the average amount of vowel categories of the population together with the standard deviation [avg, std]
+        for the provided list of gamestates, see vowel_system."""
+        category_counts = np.array([self.vowel_system(game_state, cell_size, category_distance, min_agent_fraction).category_count
+                                        for game_state in game_states]);
+
+        return [category_counts.mean(), category_counts.std()];
+
+    def classify_sounds(self, game_state: GameState):
+        """Returns the index of the nearest reference vowel (see reference_vowel_symbols) and its bark distance for every sound
+        of every agent, in GameState.bark_points order, together with the agent index of every sound."""
+        f1, f2, agent_indexes = GameState.bark_points(game_state);
+        vowel_f1, vowel_f2 = reference_vowel_table(self.bark_operator);
+
+        distances = np.sqrt((f1[:, None] - vowel_f1[None, :])**2 + self.bark_operator.second_formant_weight * (f2[:, None] - vowel_f2[None, :])**2);
+        vowels = np.argmin(distances, axis=1) if len(f1) > 0 else np.empty(0, dtype=np.int64);
+
+        return vowels, distances[np.arange(len(f1)), vowels], agent_indexes;
+
+    def vowel_inventory(self, game_state: GameState, max_distance: float = None):
+        """Returns the amount of sounds nearest to every reference vowel, see classify_sounds.
+        - max_distance: sounds further than this bark distance from their nearest reference vowel are not counted"""
+        vowels, distances, _ = self.classify_sounds(game_state);
+        if max_distance is not None:
+            vowels = vowels[distances <= max_distance];
+
+        return np.bincount(vowels, minlength=len(reference_vowel_symbols));
+
+    def vowel_inventories(self, game_states: list, max_distance: float = None):
+        """Returns the vowel inventory of every game state as an (game states, reference vowels) array, see vowel_inventory."""
+        return np.array([self.vowel_inventory(game_state, max_distance) for game_state in game_states]).reshape(-1, len(reference_vowel_symbols));
+
+    def precision_differences(self, game_states: list, precision: str = "float32"):
+        """Returns the largest relative difference over the game states between the average metrics (see average_metrics)
+        and category count (see vowel_system) of the game states and those of their CompactGameState in the given precision,
+        to check that archiving in a lower precision does not change the results. Metrics that are nan for both count as equal."""
+        compact_states = [CompactGameState(game_state, precision).game_state() for game_state in game_states];
+
+        values = {metric: (self.average_metrics(game_states, metric), self.average_metrics(compact_states, metric))
+                    for metric in ["sound_size", "success_ratio", "energy"]};
+        values["category_count"] = tuple(np.array([self.vowel_system(game_state).category_count for game_state in states], dtype=np.float64)
+                                            for states in [game_states, compact_states]);
+
+        differences = {};
+        for metric, (full_values, compact_values) in values.items():
+            with np.errstate(divide="ignore", invalid="ignore"):
+                relative_differences = np.abs(compact_values - full_values) / np.maximum(np.abs(full_values), np.finfo(np.float64).tiny);
+            relative_differences[np.isnan(full_values) & np.isnan(compact_values)] = 0;
+            differences[metric] = float(relative_differences.max()) if len(relative_differences) > 0 else 0.0;
+
+        return differences;
 
     def sound_sizes_from_game_state(self, game_state: GameState):
         """Returns the vowel sizes of agents for the provided gamestate."""
-        sound_sizes = [len(agent.known_sounds) for agent in game_state.agents];
-
-        return sound_sizes;
+        return self.game_state_metrics(game_state)["sound_size"].astype(int).tolist();
 
     def average_agent_sound_size(self, game_states: list):
         """Returns the average agent vowel size together with the standard deviation [avg, std] for the provided list of gamestates.
         Does this one a Game State per Game State basis."""
-        average_sound_sizes = [];
-        
-        for game_state in game_states:
-            average_sound_sizes += [np.array(self.sound_sizes_from_game_state(game_state)).mean()];
-
-        # Go to np array from sound sizes
-        average_sound_sizes = np.array(average_sound_sizes);
+        average_sound_sizes = self.average_metrics(game_states, "sound_size");
 
         # return mean and std
         return [average_sound_sizes.mean(), average_sound_sizes.std()];
 
     def plot_agent_sound_size_distribution(self, game_states: list, left_limit: int = 3, right_limit: int = 9, n_bins = None, rwidth = 0.9, show_grid: bool = True):
         """Plots a histogram of the agent's vowel sizes for the provided list of gamestates."""
-        average_sound_sizes = [];
-        
-        for game_state in game_states:
-            average_sound_sizes += [np.array(self.sound_sizes_from_game_state(game_state)).mean()];
+        ax = plotting().new_pyplot_axes();
+        self.draw_agent_sound_size_distribution(ax, game_states, left_limit = left_limit, right_limit = right_limit,
+                                                n_bins = n_bins, rwidth = rwidth, show_grid = show_grid);
+
+    def draw_agent_sound_size_distribution(self, ax, game_states: list, left_limit: int = 3, right_limit: int = 9, n_bins = None, rwidth = 0.9, show_grid: bool = True):
+        """Draws a histogram of the agent's vowel sizes for the provided list of gamestates on the given axes."""
+        average_sound_sizes = self.average_metrics(game_states, "sound_size");
 
         if n_bins == None:
             # 4 bins per step of size 1 (as used by de Boer)
             n_bins=list(np.linspace(left_limit, right_limit, (right_limit-left_limit)*4 + 1));
 
-        # Change plot size and color, then start new plot 
-        plt.rcParams["figure.figsize"] = (10,10);
-        plt.rcParams['figure.facecolor'] = 'white';
-        plt.figure();
-
         # Make histogram
-        plt.hist(average_sound_sizes, bins = n_bins, rwidth= rwidth);
+        ax.hist(average_sound_sizes, bins = n_bins, rwidth= rwidth);
         
         # Set titles
-        plt.title(f"Distribution for known sounds repetoire size of agents ({round(min(average_sound_sizes), 2)} - {round(max(average_sound_sizes), 2)})");
-        plt.xlabel("Repetoire size");
-        plt.ylabel("Game count");
+        ax.set_title(f"Distribution for known sounds repetoire size of agents ({round(min(average_sound_sizes), 2)} - {round(max(average_sound_sizes), 2)})");
+        ax.set_xlabel("Repetoire size");
+        ax.set_ylabel("Game count");
 
         # Set Xlim
-        plt.xticks(np.arange(left_limit, right_limit + 1, 1));
-        plt.xlim(left_limit, right_limit);
+        ax.set_xticks(np.arange(left_limit, right_limit + 1, 1));
+        ax.set_xlim(left_limit, right_limit);
 
         # Show grid
         if show_grid:
-            plt.grid(axis="y", alpha=0.5);
-
-        # Reset figure size for next figures
-        plt.rcParams["figure.figsize"] = plt.rcParamsDefault["figure.figsize"];
-        plt.rcParams["figure.facecolor"] = plt.rcParamsDefault["figure.facecolor"];
+            ax.grid(axis="y", alpha=0.5);
 
     def success_ratios_from_agents(self, game_state: GameState):
-        """Returns the vowel sizes of agents for the provided gamestate."""
-        success_ratios = [agent.success_ratio() for agent in game_state.agents];
-
-        return success_ratios;
+        """Returns the success ratios of agents for the provided gamestate, nan for agents that did not play yet."""
+        return self.game_state_metrics(game_state)["success_ratio"].tolist();
 
     def average_agent_success_ratio(self, game_states: list):
         """Returns the average agent success ratio together with the standard deviation [avg, std] for the provided list of gamestates.
         Does this one a Game State per Game State basis."""
-        average_success_ratios = [];
-        
-        for game_state in game_states:
-            average_success_ratios += [np.array(self.success_ratios_from_agents(game_state)).mean()];
-
-        # Go to np array from sound sizes
-        average_success_ratios = np.array(average_success_ratios);
+        average_success_ratios = self.average_metrics(game_states, "success_ratio");
 
         # return mean and std
         return [average_success_ratios.mean(), average_success_ratios.std()];
 
     def plot_agent_success_ratio_distribution(self, game_states: list, left_limit: float = 0.8, right_limit: float = 1, n_bins = None, rwidth = 0.9, show_grid: bool = True):
         """Plots a histogram of the agent's success ratio for the provided list of gamestates."""
-        average_success_ratios = [];
-        
-        for game_state in game_states:
-            average_success_ratios += [np.array(self.success_ratios_from_agents(game_state)).mean()];
+        ax = plotting().new_pyplot_axes();
+        self.draw_agent_success_ratio_distribution(ax, game_states, left_limit = left_limit, right_limit = right_limit,
+                                                   n_bins = n_bins, rwidth = rwidth, show_grid = show_grid);
+
+    def draw_agent_success_ratio_distribution(self, ax, game_states: list, left_limit: float = 0.8, right_limit: float = 1, n_bins = None, rwidth = 0.9, show_grid: bool = True):
+        """Draws a histogram of the agent's success ratio for the provided list of gamestates on the given axes."""
+        average_success_ratios = self.average_metrics(game_states, "success_ratio");
 
         if n_bins == None:
             # A bin every 2%
             list(np.arange(left_limit, right_limit + 0.02, 0.02))
 
-        # Change plot size and color, then start new plot 
-        plt.rcParams["figure.figsize"] = (10,10);
-        plt.rcParams['figure.facecolor'] = 'white';
-        plt.figure();
-
         # Make histogram
-        plt.hist(average_success_ratios, bins = n_bins, rwidth= rwidth);
+        ax.hist(average_success_ratios, bins = n_bins, rwidth= rwidth);
         
         # Set titles
-        plt.title(f"Distribution for success ratio's of agents averaged over game ({round(min(average_success_ratios), 2)} - {round(max(average_success_ratios), 2)})");
-        plt.xlabel("Success ratio");
-        plt.ylabel("Game count");
+        ax.set_title(f"Distribution for success ratio's of agents averaged over game ({round(min(average_success_ratios), 2)} - {round(max(average_success_ratios), 2)})");
+        ax.set_xlabel("Success ratio");
+        ax.set_ylabel("Game count");
 
         # Set Xlim
-        plt.xticks(list(np.around(np.arange(0, 1 + 0.03, 0.03), 2)));
-        plt.xlim(left_limit, right_limit);
+        ax.set_xticks(list(np.around(np.arange(0, 1 + 0.03, 0.03), 2)));
+        ax.set_xlim(left_limit, right_limit);
 
         # Show grid
         if show_grid:
-            plt.grid(axis="y", alpha=0.5);
-
-        # Reset figure size for next figures
-        plt.rcParams["figure.figsize"] = plt.rcParamsDefault["figure.figsize"];
-        plt.rcParams["figure.facecolor"] = plt.rcParamsDefault["figure.facecolor"];
+            ax.grid(axis="y", alpha=0.5);
 
     def energy_from_agents(self, game_state: GameState):
         """Returns the energy of agents in the given game states."""
-        energies = [agent.energy() for agent in game_state.agents];
-
-        return energies;
+        return self.game_state_metrics(game_state)["energy"].tolist();
 
     def average_agent_energy(self, game_states: list):
         """Returns the average agent energy together with the standard deviation [avg, std] for the provided list of gamestates.
         Does this one a Game State per Game State basis."""
-        average_energies = [];
-            
-        for game_state in game_states:
-            average_energies += [np.array(self.energy_from_agents(game_state)).mean()];
-        
-        # Go to np array from sound sizes
-        average_energies = np.array(average_energies);
+        average_energies = self.average_metrics(game_states, "energy");
 
         # return mean and std
         return [average_energies.mean(), average_energies.std()];
 
     def plot_agent_energy_distribution(self, game_states: list, left_limit: float = 1, right_limit: float = 15, n_bins = None, rwidth = 0.9, show_grid: bool = True):
         """Plots a histogram of the agent's success ratio for the provided list of gamestates."""
-        average_energies = [];
-        
-        for game_state in game_states:
-            average_energies += [np.array(self.energy_from_agents(game_state)).mean()];
+        ax = plotting().new_pyplot_axes();
+        self.draw_agent_energy_distribution(ax, game_states, left_limit = left_limit, right_limit = right_limit,
+                                            n_bins = n_bins, rwidth = rwidth, show_grid = show_grid);
+
+    def draw_agent_energy_distribution(self, ax, game_states: list, left_limit: float = 1, right_limit: float = 15, n_bins = None, rwidth = 0.9, show_grid: bool = True):
+        """Draws a histogram of the agent's energy for the provided list of gamestates on the given axes."""
+        average_energies = self.average_metrics(game_states, "energy");
 
         if n_bins == None:
             # A bin every 0.5
             n_bins = list(np.arange(left_limit, right_limit + 0.5, 0.5))
 
-        # Change plot size and color, then start new plot 
-        plt.rcParams["figure.figsize"] = (10,10);
-        plt.rcParams['figure.facecolor'] = 'white';
-        plt.figure();
-
         # Make histogram
-        plt.hist(average_energies, bins = n_bins, rwidth= rwidth);
+        ax.hist(average_energies, bins = n_bins, rwidth= rwidth);
         
         # Set titles
-        plt.title(f"Distribution for energy of agents averaged over game ({round(min(average_energies), 2)} - {round(max(average_energies), 2)})");
-        plt.xlabel("Energy");
-        plt.ylabel("Game count");
+        ax.set_title(f"Distribution for energy of agents averaged over game ({round(min(average_energies), 2)} - {round(max(average_energies), 2)})");
+        ax.set_xlabel("Energy");
+        ax.set_ylabel("Game count");
 
         # Set Xlim
-        plt.xticks(list(np.arange(left_limit, right_limit + 2, 2)));
-        plt.xlim(left_limit, right_limit);
+        ax.set_xticks(list(np.arange(left_limit, right_limit + 2, 2)));
+        ax.set_xlim(left_limit, right_limit);
 
         # Show grid
         if show_grid:
-            plt.grid(axis="y", alpha=0.5);
-
-        # Reset figure size for next figures
-        plt.rcParams["figure.figsize"] = plt.rcParamsDefault["figure.figsize"];
-        plt.rcParams["figure.facecolor"] = plt.rcParamsDefault["figure.facecolor"];
+            ax.grid(axis="y", alpha=0.5);
 
     def plot_known_vowels_over_sounds(self, game_state: GameState):
-        # Change plot size and color, then start new plot 
-        plt.rcParams["figure.figsize"] = (10,10);
-        plt.rcParams['figure.facecolor'] = 'white';
-        plt.figure();
-        
-        # Init vars
-        f1 = [];
-        f2 = [];
-        
+        """Plots the sounds of all agents together with the known vowels."""
+        ax = plotting().new_pyplot_axes();
+        self.draw_known_vowels_over_sounds(ax, game_state);
+
+    def draw_known_vowels_over_sounds(self, ax, game_state: GameState):
+        """Draws the sounds of all agents together with the known vowels on the given axes."""
         # Plot the utterances of the agents
-        for agent in game_state.agents:
-            f1 += [agent.bark_operator.bark_f1(sound.utterance) for sound in agent.known_sounds];
-            f2 += [agent.bark_operator.bark_f2(sound.utterance) for sound in agent.known_sounds];
-        
-        plt.plot(f2, f1, 'bo', alpha=0.4, label="Agent sound");
+        f1, f2, _ = game_state.bark_points();
+        ax.plot(f2, f1, 'bo', alpha=0.4, label="Agent sound");
 
         # Plot the known vowels
-        argument_sets = [[0, 0, 0],
-                    [0, 0, 1],
-                    [0.5, 0, 0],
-                    [0.5, 0, 1],
-                    [1, 0, 0],
-                    [1, 0, 1],
-                    [0, 0.5, 0],
-                    [0, 0.5, 1],
-                    [0.5, 0.5, 0],
-                    [0.5, 0.5, 1],
-                    [1, 0.5, 0],
-                    [1, 0.5, 1],
-                    [0, 1, 0],
-                    [0, 1, 1],
-                    [0.5, 1, 0],
-                    [0.5, 1, 1],
-                    [1, 1, 0],
-                    [1, 1, 1]];
-
-        vowels = ["[a]", "[œ]", "[ɐ]", "[ɐ̹]", "[ɑ]", "[ɒ]", "[e]", "[ø]", "[ə]", "[e]", "[ɤ]", "[o]", "[i]", "[y]", "[ɨ]", "[ʉ]", "[ɯ]", "[u]"];
-
-        synthesizer = Synthesizer(max_noise_ambient = 0);
-
-        for i in range(0, len(argument_sets)):
-            phoneme = Phoneme(argument_sets[i][0], argument_sets[i][1], argument_sets[i][2]);    
-            utterance = synthesizer.synthesise(phoneme);
-            vowel = vowels[i];
-            f1 = self.bark_operator.bark_f1(utterance);
-            f2 = self.bark_operator.bark_f2(utterance);
-            plt.text(f2, f1, vowel, color='red', fontsize=18, ha='center', va='center')
+        for vowel, vowel_f1, vowel_f2 in zip(reference_vowel_symbols, *reference_vowel_table(self.bark_operator)):
+            ax.text(vowel_f2, vowel_f1, vowel, color='red', fontsize=18, ha='center', va='center')
 
 
-        # Set titles
-        plt.title("Known vowels compared to sounds of agents");
-        plt.xlabel("F'2 in bark");
-        plt.ylabel("F1 in bark");
-        
-        # Change pot parameters
-        plt.ylim(1, 8);
-        plt.xlim(7, 16);
-        plt.gca().invert_xaxis();
-        plt.gca().invert_yaxis();
-        plt.grid();
-
-        # Reset figure size for next figures
-        plt.rcParams["figure.figsize"] = plt.rcParamsDefault["figure.figsize"];
-        plt.rcParams["figure.facecolor"] = plt.rcParamsDefault["figure.facecolor"];
\ No newline at end of file
+        # Set titles and plot parameters
+        plotting().VowelSpacePlotter().format_axes(ax, "Known vowels compared to sounds of agents");
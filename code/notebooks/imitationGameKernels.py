@@ -0,0 +1,184 @@
+# This file includes the compiled kernels used by the "numba" backend of the imitation game classes
+# The kernels are plain functions on floats and arrays, compiled with numba when it is installed
+
+############################################################################################
+# IMPORTS
+############################################################################################
+
+# Used for more complex mathematical operations
+import math;
+
+# Used for datatype representation
+import numpy as np;
+
+# Used for warning when the numba backend is not available
+import warnings;
+
+# Used for compiling the kernels, optional
+try:
+    import numba;
+    numba_available = True;
+except ImportError:
+    numba = None;
+    numba_available = False;
+
+def jit(function):
+    """Returns the function compiled to native code by numba, or the plain function when numba is not installed."""
+    if numba_available:
+        return numba.njit(cache=True)(function);
+
+    return function;
+
+############################################################################################
+# BACKEND SELECTION
+############################################################################################
+
+# Names of the available backends
+kernel_backends = ["python", "numba"];
+
+def resolve_kernel_backend(kernel_backend: str):
+    """Returns the backend to be used for the requested one, "numba" falls back to "python" when numba is not installed."""
+    if kernel_backend not in kernel_backends:
+        raise ValueError(f"Unknown kernel backend {kernel_backend}, use one of {', '.join(kernel_backends)}.");
+
+    if kernel_backend == "numba" and not numba_available:
+        warnings.warn("numba is not installed, the python kernel backend is used instead.");
+        return "python";
+
+    return kernel_backend;
+
+############################################################################################
+# SYNTHESIS KERNELS
+############################################################################################
+
+@jit
+def clamp_unit(value):
+    """Returns the value limited to [0, 1], as done by Phoneme."""
+    return max(min(value, 1.0), 0.0);
+
+@jit
+def formants(p, h, r):
+    """Returns the four formants in hertz of a phoneme, the same polynomials as the Synthesizer."""
+    f1 = ((-392+392*r)*pow(h, 2)+(596-668*r)*h-146+166*r)*pow(p, 2);
+    f1 += ((348-348*r)*pow(h, 2)+(-494+606*r)*h+141-175*r)*p;
+    f1 += ((340-72*r)*pow(h, 2)+(-796+108*r)*h+708-38*r);
+
+    f2 = ((-1200+1208*r)*pow(h, 2)+(1320-1328*r)*h+118-158*r)*pow(p, 2);
+    f2 += ((1864-1488*r)*pow(h, 2)+(-2644+1510*r)*h-561+221*r)*p;
+    f2 += ((-670+490*r)*pow(h, 2) + (1355-697*r)*h + 1517-117*r);
+
+    f3 = ((604-604*r)*pow(h, 2)+(1038-1178*r)*h+246+566*r)*pow(p, 2);
+    f3 +=((-1150+1262*r)*pow(h, 2)+(-1443+1313*r)*h-317-483*r)*p;
+    f3 +=((1130-836*r)*pow(h, 2)+(-315+44*r)*h+2427-127*r);
+
+    f4 = ((-1120+16*r)*pow(h, 2)+(1696-180*r)*h+500+522*r)*pow(p, 2);
+    f4 +=((-140+240*r)*pow(h, 2)+(-578+214*r)*h-692-419*r)*p;
+    f4 +=((1480-602*r)*pow(h, 2)+(-1220+289*r)*h+3678-178*r);
+
+    return f1, f2, f3, f4;
+
+############################################################################################
+# BARK KERNELS
+############################################################################################
+
+@jit
+def hertz_to_bark(hertz, alternative):
+    """Converts hertz to bark, the same as BarkOperator.hertz_to_bark."""
+    if alternative:
+        bark = (26.81*hertz)/(1960 + hertz) - 0.53;
+        if bark < 2:
+            bark = bark + (0.15 * (2 - bark));
+        if bark > 20.1:
+            bark = bark + (0.22 * (bark - 20.1));
+        return bark;
+
+    if hertz > 271.32:
+        return (math.log(hertz/271.32) / 0.1719) + 2;
+    return (hertz-51)/110;
+
+@jit
+def weighted_f2(f2_bark, f3_bark, f4_bark, critical_distance):
+    """Calculates the effective second formant, the same as BarkOperator.weighted_f2."""
+    if f3_bark - f2_bark > critical_distance:
+        return f2_bark;
+
+    weight1 = (critical_distance - (f3_bark - f2_bark)) / critical_distance;
+    weight2 = ((f4_bark - f3_bark) - (f3_bark - f2_bark)) / (f4_bark - f2_bark);
+
+    if weight2 < 0:
+        weight2 = -weight2;
+
+    if (f4_bark - f2_bark) > critical_distance:
+        return (((2 - weight1) * f2_bark) + (weight1 * f3_bark)) / 2;
+
+    if (f3_bark - f2_bark) < (f4_bark - f3_bark):
+        return (((weight2 * f2_bark) + ((2 - weight2) * f3_bark)) / 2) - 1;
+
+    return ((((2 - weight2) * f3_bark) + (weight2 * f4_bark)) / 2) - 1;
+
+@jit
+def bark_point(f1, f2, f3, f4, alternative, critical_distance):
+    """Returns the first formant bark and the effective second formant bark of four formants in hertz."""
+    return (hertz_to_bark(f1, alternative),
+            weighted_f2(hertz_to_bark(f2, alternative), hertz_to_bark(f3, alternative), hertz_to_bark(f4, alternative), critical_distance));
+
+@jit
+def bark_distance(f1_bark_1, f2_bark_1, f1_bark_2, f2_bark_2, second_formant_weight):
+    """Returns the distance between two bark points, the same as BarkOperator.distance_between_utterances."""
+    return math.sqrt(math.pow(f1_bark_1 - f1_bark_2, 2) + (second_formant_weight * math.pow(f2_bark_1 - f2_bark_2, 2)));
+
+############################################################################################
+# AGENT KERNELS
+############################################################################################
+
+@jit
+def nearest_formants(formant_table, goal_f1, goal_f2, goal_f3, goal_f4, alternative, critical_distance, second_formant_weight):
+    """Returns the index of the row of an (n, 4) formant table closest to the goal formants, the first one on ties, -1 when empty."""
+    goal_f1_bark, goal_f2_bark = bark_point(goal_f1, goal_f2, goal_f3, goal_f4, alternative, critical_distance);
+
+    best_distance = math.inf;
+    best_index = -1;
+    for i in range(formant_table.shape[0]):
+        f1_bark, f2_bark = bark_point(formant_table[i, 0], formant_table[i, 1], formant_table[i, 2], formant_table[i, 3],
+                                      alternative, critical_distance);
+        distance = bark_distance(goal_f1_bark, goal_f2_bark, f1_bark, f2_bark, second_formant_weight);
+        if distance < best_distance:
+            best_distance = distance;
+            best_index = i;
+
+    return best_index;
+
+@jit
+def improve_phoneme(p, h, r, step, steps, goal_f1, goal_f2, goal_f3, goal_f4, alternative, critical_distance, second_formant_weight):
+    """Moves (p, h, r) steps times to the variation by -step, 0 and step (27 in total) whose sound is closest to the goal formants,
+    the first one in itertools.product order on ties, as done by Agent.improve_sound.
+    Stops early once the phoneme itself is the best variation."""
+    goal_f1_bark, goal_f2_bark = bark_point(goal_f1, goal_f2, goal_f3, goal_f4, alternative, critical_distance);
+
+    for _ in range(steps):
+        best_distance = math.inf;
+        best_p = p;
+        best_h = h;
+        best_r = r;
+        for i in range(27):
+            new_p = clamp_unit(p + (i // 9 - 1) * step);
+            new_h = clamp_unit(h + ((i // 3) % 3 - 1) * step);
+            new_r = clamp_unit(r + (i % 3 - 1) * step);
+
+            f1, f2, f3, f4 = formants(new_p, new_h, new_r);
+            f1_bark, f2_bark = bark_point(f1, f2, f3, f4, alternative, critical_distance);
+            distance = bark_distance(goal_f1_bark, goal_f2_bark, f1_bark, f2_bark, second_formant_weight);
+            if distance < best_distance:
+                best_distance = distance;
+                best_p = new_p;
+                best_h = new_h;
+                best_r = new_r;
+
+        if best_p == p and best_h == h and best_r == r:
+            break;
+
+        p = best_p;
+        h = best_h;
+        r = best_r;
+
+    return p, h, r;
@@ -0,0 +1,264 @@
+# This file includes the classes used to play community imitation games on multiple islands
+
+############################################################################################
+# IMPORTS
+############################################################################################
+
+# Import community imitation game classes made in the previous notebook
+from communityImitationGameClasses import CommunityGameEngine;
+
+# Used for random number generation
+import random as rnd;
+
+# Used for running every island in its own worker process
+import multiprocessing as mp;
+
+# Used for combining the progress of the islands
+from progressReporterClasses import ProgressReporter, PrintProgressReporter, QueueProgressReporter, ProgressAggregator, set_event_reporter;
+
+# Used for datatype representation
+import numpy as np;
+
+# Used for sending errors of the workers back to the parent process
+import traceback;
+
+############################################################################################
+# ISLAND WORKER
+############################################################################################
+
+def island_statistics(engine: CommunityGameEngine):
+    """Returns the statistics of the live agents of an island as a dictionary.
+    Agents which did not play a game yet (newborn babies) are left out of the success ratio."""
+    played_agents = [a for a in engine.agents if a.games_count > 0];
+
+    role_counts = {};
+    for agent in engine.agents:
+        role_counts[agent.community_role] = role_counts.get(agent.community_role, 0) + 1;
+
+    return {"iteration": engine.iteration,
+            "agent_count": len(engine.agents),
+            "role_counts": role_counts,
+            "success_ratio": float(np.mean([a.success_ratio() for a in played_agents])) if played_agents else float("nan"),
+            "sound_size": float(np.mean([len(a.known_sounds) for a in engine.agents])),
+            "energy": float(np.mean([a.energy() for a in engine.agents]))};
+
+def island_worker(connection, engine_settings: dict, seed: int, island: int, progress_queue):
+    """Runs a single island in a worker process, executing the commands send over the connection.
+    Progress and agent events are send to the progress_queue of the parent process.
+    - ("play", amount, checkpoints): plays amount iterations, replies (captured game states, island statistics)
+    - ("emigrate", role_amounts): replies the compact states of randomly chosen agents per role
+    - ("immigrate", role_states): replaces the previously emigrated agents by the given compact states
+    - ("stop",): ends the worker
+    Every reply is wrapped as ("ok", reply), an error ends the worker and is replied as ("error", traceback)."""
+    try:
+        run_island(connection, engine_settings, seed, island, progress_queue);
+    except Exception:
+        try:
+            connection.send(("error", traceback.format_exc()));
+        except (OSError, EOFError):
+            # The parent process closed the connection already
+            pass;
+    finally:
+        connection.close();
+
+def send_command(connection, command: tuple):
+    """Sends a command to an island worker, a worker that failed closed its end of the pipe
+    and its error is raised by the next receive_reply instead."""
+    try:
+        connection.send(command);
+    except (OSError, EOFError):
+        pass;
+
+def receive_reply(connection, island: int):
+    """Returns the reply of an island worker, re-raises the error of the worker in the parent process.
+    - connection: parent end of the pipe to the island worker
+    - island: index of the island, used in the error message"""
+    try:
+        status, reply = connection.recv();
+    except EOFError:
+        raise RuntimeError(f"The worker of island {island} stopped without replying.") from None;
+
+    if status == "error":
+        raise RuntimeError(f"The worker of island {island} failed:\n{reply}");
+
+    return reply;
+
+def run_island(connection, engine_settings: dict, seed: int, island: int, progress_queue):
+    """Executes the commands of the parent process on a single island, see island_worker."""
+    # Every island uses its own random stream
+    rnd.seed(seed);
+
+    # Report to the parent process instead of printing
+    reporter = QueueProgressReporter(progress_queue, worker_id = island);
+    set_event_reporter(reporter);
+
+    engine = CommunityGameEngine(**engine_settings, progress_reporter = reporter);
+
+    # Agents that left the island, their place is taken by the immigrants
+    emigrated_agents = {};
+
+    while True:
+        command = connection.recv();
+
+        if command[0] == "play":
+            _, amount, checkpoints = command;
+
+            # Only the checkpoints that are reached in this part of the game are send back
+            captured_states = list(engine.play_iterations(amount, checkpoints).items());
+
+            connection.send(("ok", (captured_states, island_statistics(engine))));
+
+        elif command[0] == "emigrate":
+            _, role_amounts = command;
+
+            emigrated_agents = {};
+            role_states = {};
+            for role, amount in role_amounts.items():
+                agents_of_role = [a for a in engine.agents if a.community_role == role];
+                emigrated_agents[role] = rnd.sample(agents_of_role, min(amount, len(agents_of_role)));
+                role_states[role] = [agent.compact_state() for agent in emigrated_agents[role]];
+
+            connection.send(("ok", role_states));
+
+        elif command[0] == "immigrate":
+            _, role_states = command;
+
+            # The immigrant takes the place (role, behaviour and family) of the agent that left
+            for role, compact_states in role_states.items():
+                for agent, compact_state in zip(emigrated_agents.get(role, []), compact_states):
+                    agent.restore_compact_state(compact_state);
+            emigrated_agents = {};
+
+            connection.send(("ok", True));
+
+        elif command[0] == "stop":
+            return;
+
+############################################################################################
+# ISLAND GAME ENGINE
+############################################################################################
+
+class IslandGameEngine:
+    """This is a meta engine which plays a community imitation game on multiple islands.
+    Every island is a CommunityGameEngine running in its own worker process,
+    the islands exchange part of their agents every migration_interval iterations."""
+    def __init__(self, island_settings: list, iterations: int, migration_interval: int, migration_fraction: float,
+                 migrating_roles: list = None, seeds: list = None, progress_reporter: ProgressReporter = None):
+        """Creates an Island Game Engine instance.
+        - island_settings: list of keyword argument dictionaries for the CommunityGameEngine of every island, the iterations are set by this engine
+        - iterations: amount of iterations (full agent aging rounds) the game should be played for
+        - migration_interval: amount of iterations between two migrations
+        - migration_fraction: fraction of the agents of every migrating role that moves to the next island
+        - migrating_roles: community roles that migrate, all roles when None
+        - seeds: random seed for every island, random when None
+        - progress_reporter: reporter for the combined progress of all islands, printed when None"""
+        self.island_settings = [dict(settings, iterations = iterations) for settings in island_settings];
+        self.iterations = iterations;
+        self.migration_interval = migration_interval;
+        self.migration_fraction = migration_fraction;
+        self.migrating_roles = migrating_roles;
+
+        if seeds is None:
+            seeds = [rnd.randrange(2**32) for _ in island_settings];
+        self.seeds = seeds;
+
+        if progress_reporter is None:
+            progress_reporter = PrintProgressReporter(description = "iterations over all islands");
+        self.progress_reporter = progress_reporter;
+
+        # Statistics of every island after every played part of the game
+        self.island_statistics = [[] for _ in island_settings];
+
+    def __migration_amounts(self):
+        """Returns the amount of agents per role that migrate, limited by the island with the fewest agents of that role."""
+        last_role_counts = [statistics[-1]["role_counts"] for statistics in self.island_statistics];
+
+        roles = self.migrating_roles;
+        if roles is None:
+            roles = set().union(*[role_counts.keys() for role_counts in last_role_counts]);
+
+        # Fixed role order so that the islands draw their emigrants reproducibly
+        roles = sorted(roles, key=lambda role: role.value);
+
+        role_amounts = {};
+        for role in roles:
+            fewest_agents = min(role_counts.get(role, 0) for role_counts in last_role_counts);
+            if int(self.migration_fraction * fewest_agents) > 0:
+                role_amounts[role] = int(self.migration_fraction * fewest_agents);
+
+        return role_amounts;
+
+    def __migrate(self, connections: list):
+        """Moves the emigrants of every island to the next island (ring topology)."""
+        role_amounts = self.__migration_amounts();
+        if not role_amounts:
+            return;
+
+        for connection in connections:
+            send_command(connection, ("emigrate", role_amounts));
+        emigrants = [receive_reply(connection, island) for island, connection in enumerate(connections)];
+
+        for i, connection in enumerate(connections):
+            send_command(connection, ("immigrate", emigrants[i - 1]));
+        for island, connection in enumerate(connections):
+            receive_reply(connection, island);
+
+    def play_imitation_game(self, checkpoints: list):
+        """Plays the imitation game on all islands and returns a list of CommunityGameState vectors, one per island.
+        - checkpoints: list of iteration numbers at which the state of the islands should be saved (after playing that iteration)."""
+        game_states = [[None] * len(checkpoints) for _ in self.island_settings];
+        self.island_statistics = [[] for _ in self.island_settings];
+
+        # Combine the progress of all islands in a single report
+        progress_queue = mp.Queue(maxsize = 1000);
+        aggregator = ProgressAggregator(progress_queue, reporter = self.progress_reporter);
+        aggregator.start();
+
+        # Start a worker for every island
+        connections = [];
+        workers = [];
+        for island, (settings, seed) in enumerate(zip(self.island_settings, self.seeds)):
+            parent_connection, child_connection = mp.Pipe();
+            worker = mp.Process(target=island_worker, args=(child_connection, settings, seed, island, progress_queue), daemon=True);
+            worker.start();
+            child_connection.close();
+
+            connections.append(parent_connection);
+            workers.append(worker);
+
+        try:
+            iteration = 0;
+            while iteration < self.iterations:
+                # All islands play independently until the next migration
+                amount = min(self.migration_interval, self.iterations - iteration);
+                for connection in connections:
+                    send_command(connection, ("play", amount, checkpoints));
+
+                for island, connection in enumerate(connections):
+                    captured_states, statistics = receive_reply(connection, island);
+                    for checkpoint, state in captured_states:
+                        game_states[island][checkpoints.index(checkpoint)] = state;
+                    self.island_statistics[island].append(statistics);
+
+                iteration += amount;
+
+                # Exchange agents between the islands
+                if iteration < self.iterations and len(connections) > 1:
+                    self.__migrate(connections);
+        finally:
+            for connection in connections:
+                send_command(connection, ("stop",));
+                connection.close();
+            for worker in workers:
+                worker.join();
+            aggregator.stop();
+
+        # Return the game states
+        return game_states;
+
+    def aggregated_statistics(self, statistic: str):
+        """Returns the mean and standard deviation over the islands of the given island statistic after every played part.
+        - statistic: one of "success_ratio", "sound_size", "energy" or "agent_count"."""
+        values = np.array([[statistics[statistic] for statistics in island] for island in self.island_statistics]);
+
+        return [values.mean(axis=0), values.std(axis=0)];
@@ -0,0 +1,293 @@
+# This file includes the classes used to plot game states in the vowel space
+
+############################################################################################
+# IMPORTS
+############################################################################################
+
+# Used for plotting
+import matplotlib;
+import matplotlib.colors;
+from matplotlib.lines import Line2D;
+
+# Used for rendering figures without pyplot
+from matplotlib.figure import Figure;
+from matplotlib.backends.backend_agg import FigureCanvasAgg;
+
+# Used for rendering figures in parallel worker processes
+from concurrent.futures import ProcessPoolExecutor;
+import os;
+
+# Used for datatype representation
+import numpy as np;
+
+############################################################################################
+# PYPLOT FIGURES
+############################################################################################
+
+def new_pyplot_axes(figsize: tuple = (10, 10)):
+    """Starts a new white pyplot figure and returns its axes, pyplot is only imported when used."""
+    import matplotlib.pyplot as plt;
+
+    plt.figure(figsize=figsize, facecolor='white');
+
+    return plt.gca();
+
+############################################################################################
+# VOWEL SPACE PLOTTER
+############################################################################################
+
+class VowelSpacePlotter:
+    """This is a class used to plot groups of Bark points in the F1 / F'2 vowel space.
+    Every group is drawn with a single call, whatever the amount of agents in it.
+    - "scatter" mode draws the points of every group with its own marker
+    - "hexbin" and "density" mode draw the pooled points as a density map, which stays readable for large populations"""
+    # Plotted part of the vowel space
+    f1_limits = (1, 8);
+    f2_limits = (7, 16);
+
+    def __init__(self, mode: str = "scatter", gridsize: int = 40, cmap: str = "viridis", max_legend_entries: int = 20):
+        """Creates a Vowel Space Plotter instance.
+        - mode: "scatter", "hexbin" or "density"
+        - gridsize: amount of hexagons or bins along the F'2 axis for the density modes
+        - cmap: colormap used for the density modes
+        - max_legend_entries: groups of single agents are only given a legend entry up to this amount of agents"""
+        if mode not in ["scatter", "hexbin", "density"]:
+            raise ValueError(f"Unknown plot mode {mode}, use scatter, hexbin or density.");
+
+        self.mode = mode;
+        self.gridsize = gridsize;
+        self.cmap = cmap;
+        self.max_legend_entries = max_legend_entries;
+
+    def plot_groups(self, ax, groups: list):
+        """Plots the groups, a list of (label, marker, f1, f2) tuples, on the given axes."""
+        if self.mode == "scatter":
+            for label, marker, f1, f2 in groups:
+                ax.scatter(f2, f1, marker=marker, label=label);
+        else:
+            self.plot_density(ax, np.concatenate([group[2] for group in groups]), np.concatenate([group[3] for group in groups]));
+
+    def plot_agents(self, ax, f1: np.ndarray, f2: np.ndarray, agent_indexes: np.ndarray, agent_names: list, show_legend: bool):
+        """Plots the points of all agents with a single call, coloured per agent.
+        A legend entry per agent is only made when there are at most max_legend_entries agents."""
+        if self.mode != "scatter":
+            self.plot_density(ax, f1, f2);
+            return;
+
+        # Same colours as one plot call per agent would give
+        colours = matplotlib.rcParams["axes.prop_cycle"].by_key()["color"];
+        point_colours = [colours[index % len(colours)] for index in agent_indexes];
+        ax.scatter(f2, f1, c=point_colours);
+
+        if show_legend and len(agent_names) <= self.max_legend_entries:
+            handles = [Line2D([], [], linestyle="", marker="o", color=colours[index % len(colours)], label=name)
+                            for index, name in enumerate(agent_names)];
+            ax.legend(handles=handles, title="Agent names", loc="lower left");
+
+    def plot_density(self, ax, f1: np.ndarray, f2: np.ndarray):
+        """Plots the pooled points as a hexbin or 2D histogram density map."""
+        extent = (self.f2_limits[0], self.f2_limits[1], self.f1_limits[0], self.f1_limits[1]);
+
+        if self.mode == "hexbin":
+            collection = ax.hexbin(f2, f1, gridsize=self.gridsize, extent=extent, mincnt=1, cmap=self.cmap);
+        else:
+            bins = [self.gridsize, int(self.gridsize * (self.f1_limits[1] - self.f1_limits[0]) / (self.f2_limits[1] - self.f2_limits[0]))];
+            collection = ax.hist2d(f2, f1, bins=bins, range=[self.f2_limits, self.f1_limits], cmin=1, cmap=self.cmap)[3];
+
+        ax.figure.colorbar(collection, ax=ax, label="Sound count");
+
+    def format_axes(self, ax, title: str, show_legend: bool = False, legend_title: str = None):
+        """Sets the titles, limits, inverted axes and grid used for all vowel space plots."""
+        ax.set_title(title);
+        ax.set_xlabel("F'2 in bark");
+        ax.set_ylabel("F1 in bark");
+
+        # Change pot parameters
+        ax.set_ylim(*self.f1_limits);
+        ax.set_xlim(*self.f2_limits);
+        ax.invert_xaxis();
+        ax.invert_yaxis();
+        ax.grid();
+
+        # Show legend, the density modes have a colorbar instead
+        if show_legend and self.mode == "scatter":
+            ax.legend(title=legend_title, loc="lower left");
+
+############################################################################################
+# VOWEL SPACE HISTOGRAM
+############################################################################################
+
+class VowelSpaceHistogram:
+    """This is a class used to count Bark points of many game states in a fixed 2D histogram over the plotted vowel space.
+    Points are added incrementally from game states or live engines, so only the counts are kept in memory,
+    and histograms made in worker processes can be merged.
+    For example
+        histogram = VowelSpaceHistogram();
+        for game_state in game_states:
+            histogram.add_game_state(game_state);
+        histogram.plot(f"{len(game_states)} games");"""
+    def __init__(self, f2_bins: int = 40, f1_bins: int = None, f1_limits: tuple = VowelSpacePlotter.f1_limits,
+                 f2_limits: tuple = VowelSpacePlotter.f2_limits, cmap: str = "viridis"):
+        """Creates a Vowel Space Histogram instance.
+        - f2_bins: amount of bins along the F'2 axis
+        - f1_bins: amount of bins along the F1 axis, bins of about the same size as along the F'2 axis when None
+        - f1_limits, f2_limits: counted part of the vowel space in bark, the plotted part by default
+        - cmap: colormap of the density map"""
+        if f1_bins is None:
+            f1_bins = int(f2_bins * (f1_limits[1] - f1_limits[0]) / (f2_limits[1] - f2_limits[0]));
+
+        self.f1_bins = f1_bins;
+        self.f2_bins = f2_bins;
+        self.f1_limits = f1_limits;
+        self.f2_limits = f2_limits;
+        self.cmap = cmap;
+
+        # Sound count per (F1, F'2) bin, and the amount of points outside the counted part of the vowel space
+        self.counts = np.zeros((f1_bins, f2_bins), dtype=np.int64);
+        self.outside = 0;
+
+        # Amount of game states added
+        self.game_state_count = 0;
+
+    def bin_indexes(self, values: np.ndarray, limits: tuple, bins: int):
+        """Returns the bin of every value, -1 outside the limits, the upper limit is part of the last bin."""
+        indexes = np.floor((values - limits[0]) / (limits[1] - limits[0]) * bins).astype(np.int64);
+        indexes[values == limits[1]] = bins - 1;
+        indexes[(indexes < 0) | (indexes >= bins)] = -1;
+
+        return indexes;
+
+    def add_points(self, f1: np.ndarray, f2: np.ndarray):
+        """Counts the first formant and effective second formant barks of a set of points."""
+        f1_indexes = self.bin_indexes(np.asarray(f1, dtype=np.float64), self.f1_limits, self.f1_bins);
+        f2_indexes = self.bin_indexes(np.asarray(f2, dtype=np.float64), self.f2_limits, self.f2_bins);
+        inside = (f1_indexes >= 0) & (f2_indexes >= 0);
+
+        self.counts += np.bincount(f1_indexes[inside] * self.f2_bins + f2_indexes[inside],
+                                   minlength=self.f1_bins * self.f2_bins).reshape(self.f1_bins, self.f2_bins);
+        self.outside += int(len(inside) - inside.sum());
+
+    def add_game_state(self, game_state):
+        """Counts the sounds of all agents of a game state, community game states and live engines hold agents in the same way."""
+        # Imported on first use, the simulation does not need the plotting classes
+        from imitationGameClasses import GameState;
+
+        f1, f2, _ = GameState.bark_points(game_state);
+        self.add_points(f1, f2);
+        self.game_state_count += 1;
+
+    def add_engine(self, engine):
+        """Counts the current sounds of all agents of a live engine."""
+        self.add_game_state(engine);
+
+    def merge(self, histogram):
+        """Adds the counts of another histogram with the same bins, e.g. one made in a worker process, and returns this histogram."""
+        if (histogram.f1_bins, histogram.f2_bins, tuple(histogram.f1_limits), tuple(histogram.f2_limits)) != \
+                (self.f1_bins, self.f2_bins, tuple(self.f1_limits), tuple(self.f2_limits)):
+            raise ValueError("Only histograms with the same bins can be merged.");
+
+        self.counts += histogram.counts;
+        self.outside += histogram.outside;
+        self.game_state_count += histogram.game_state_count;
+
+        return self;
+
+    def total(self):
+        """Returns the amount of counted points, including those outside the counted part of the vowel space."""
+        return int(self.counts.sum()) + self.outside;
+
+    def draw(self, ax, title: str = None, log: bool = False):
+        """Draws the counts as a density map on the given axes, empty bins are not drawn.
+        - log: use a logarithmic colour scale"""
+        f1_edges = np.linspace(self.f1_limits[0], self.f1_limits[1], self.f1_bins + 1);
+        f2_edges = np.linspace(self.f2_limits[0], self.f2_limits[1], self.f2_bins + 1);
+        norm = matplotlib.colors.LogNorm() if log else None;
+
+        collection = ax.pcolormesh(f2_edges, f1_edges, np.ma.masked_equal(self.counts, 0), cmap=self.cmap, norm=norm);
+        ax.figure.colorbar(collection, ax=ax, label="Sound count");
+
+        plotter = VowelSpacePlotter(mode = "density");
+        plotter.f1_limits = self.f1_limits;
+        plotter.f2_limits = self.f2_limits;
+        plotter.format_axes(ax, f"{self.game_state_count} game states" if title is None else title);
+
+    def plot(self, title: str = None, log: bool = False):
+        """Plots the counts as a density map, see draw."""
+        self.draw(new_pyplot_axes(), title = title, log = log);
+
+############################################################################################
+# BATCH FIGURE RENDERER
+############################################################################################
+
+def render_figure(path: str, draw, args: tuple, kwargs: dict, figsize: tuple = (10, 10), dpi: int = 100):
+    """Renders a single figure to the given PNG path on the Agg canvas, without touching pyplot.
+    - draw: function called as draw(ax, *args, **kwargs), e.g. a bound GameState.draw or Statistics.draw_* method"""
+    figure = Figure(figsize=figsize, facecolor='white');
+    FigureCanvasAgg(figure);
+    draw(figure.add_subplot(), *args, **kwargs);
+    figure.savefig(path, dpi=dpi);
+
+    return path;
+
+def render_figures(jobs: list):
+    """Renders a list of (path, draw, args, kwargs, figsize, dpi) jobs, used as unit of work of a worker process."""
+    return [render_figure(*job) for job in jobs];
+
+class BatchFigureRenderer:
+    """This is a class used to render a series of figures to PNG files in parallel worker processes.
+    Figures are drawn on their own Figure handle with the Agg canvas, so no pyplot state is used or changed.
+    For example
+        renderer = BatchFigureRenderer();
+        for game_state in game_states:
+            renderer.add(f"{game_state.iteration}-iterations.png", game_state.draw);
+        renderer.add("3-energy.png", statistics.draw_agent_energy_distribution, results);
+        renderer.render();"""
+    def __init__(self, workers: int = None, figsize: tuple = (10, 10), dpi: int = 100, chunk_size: int = 4):
+        """Creates a Batch Figure Renderer instance.
+        - workers: amount of worker processes, the amount of CPUs when None
+        - figsize: size of every figure in inches
+        - dpi: resolution of the PNG files
+        - chunk_size: amount of figures send to a worker at once"""
+        self.workers = workers if workers is not None else os.cpu_count();
+        self.figsize = figsize;
+        self.dpi = dpi;
+        self.chunk_size = chunk_size;
+
+        # Figures waiting to be rendered, and their paths
+        self.jobs = [];
+        self.paths = set();
+
+    def add(self, path: str, draw, *args, **kwargs):
+        """Adds a figure to be rendered to path by calling draw(ax, *args, **kwargs).
+        draw and its arguments are send to a worker process and should thus be picklable.
+        Raises a ValueError when another figure waiting to be rendered has the same path."""
+        normalized_path = os.path.normcase(os.path.abspath(path));
+        if normalized_path in self.paths:
+            raise ValueError(f"Another figure is already rendered to {path}, give every figure its own path.");
+
+        self.paths.add(normalized_path);
+        self.jobs.append((path, draw, args, kwargs, self.figsize, self.dpi));
+
+    def add_game_states(self, game_states: list, directory: str, file_name: str = "{index}-{iteration}-iterations.png", **kwargs):
+        """Adds a figure for every game state, file_name is formatted with the index of the game state in the list and its iteration,
+        e.g. game states of several trials at the same iteration need the index. Raises a ValueError when two figures share a path."""
+        for index, game_state in enumerate(game_states):
+            self.add(os.path.join(directory, file_name.format(index = index, iteration = game_state.iteration)), game_state.draw, **kwargs);
+
+    def render(self):
+        """Renders all added figures and returns their paths, in the order they were added."""
+        jobs = self.jobs;
+        self.jobs = [];
+        self.paths = set();
+        chunks = [jobs[i:i + self.chunk_size] for i in range(0, len(jobs), self.chunk_size)];
+
+        # Small batches are not worth starting worker processes for
+        if self.workers <= 1 or len(chunks) <= 1:
+            return render_figures(jobs);
+
+        paths = [];
+        with ProcessPoolExecutor(max_workers = min(self.workers, len(chunks))) as executor:
+            for chunk_paths in executor.map(render_figures, chunks):
+                paths += chunk_paths;
+
+        return paths;
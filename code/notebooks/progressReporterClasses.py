@@ -0,0 +1,204 @@
+# This file includes the classes used to report the progress of imitation games and the events of its agents
+
+############################################################################################
+# IMPORTS
+############################################################################################
+
+# Used for throttling the reports
+import time;
+
+# Used for aggregating reports of worker processes in the background
+import threading;
+import queue as queue_module;
+
+############################################################################################
+# PROGRESS REPORTER
+############################################################################################
+
+class ProgressReporter:
+    """This is the base class used to report the progress of a game and the events of agents.
+    Reports are throttled so that at most one progress report is made every min_interval seconds
+    and at most one event report every event_interval seconds. The base class itself is silent."""
+    def __init__(self, min_interval: float = 0.5, event_interval: float = 0):
+        """Creates a Progress Reporter instance.
+        - min_interval: minimum amount of seconds between two progress reports
+        - event_interval: minimum amount of seconds between two event reports, events in between are dropped"""
+        self.min_interval = min_interval;
+        self.event_interval = event_interval;
+
+        # Keep track of the throttling
+        self.last_progress_time = float('-inf');
+        self.last_event_time = float('-inf');
+        self.dropped_events = 0;
+
+    def progress(self, iteration: int, total: int):
+        """Registers the completion of an iteration, the last iteration is always reported."""
+        now = time.monotonic();
+        if now - self.last_progress_time >= self.min_interval or iteration == total:
+            self.last_progress_time = now;
+            self.report_progress(iteration, total);
+
+    def event(self, name: str, message: str):
+        """Registers an event of the agent with the given name."""
+        now = time.monotonic();
+        if now - self.last_event_time >= self.event_interval:
+            self.last_event_time = now;
+            self.report_event(name, message);
+        else:
+            self.dropped_events += 1;
+
+    def report_progress(self, iteration: int, total: int):
+        """Reports the progress, to be implemented by sub classes."""
+        pass;
+
+    def report_event(self, name: str, message: str):
+        """Reports an event, to be implemented by sub classes."""
+        pass;
+
+    def close(self):
+        """Finishes the reporting."""
+        pass;
+
+    def __deepcopy__(self, memo):
+        """Reporters are shared rather than copied, e.g. when an engine is copied."""
+        return self;
+
+class SilentProgressReporter(ProgressReporter):
+    """This is a reporter that does not report anything."""
+    def progress(self, iteration: int, total: int):
+        """Ignores the progress without checking the time."""
+        pass;
+
+    def event(self, name: str, message: str):
+        """Ignores the event without checking the time."""
+        pass;
+
+class PrintProgressReporter(ProgressReporter):
+    """This is a reporter that prints the progress on a single line and every event on its own line."""
+    def __init__(self, min_interval: float = 0.5, event_interval: float = 0, description: str = "iteration"):
+        """Creates a Print Progress Reporter instance.
+        - description: what is counted, shown in the progress line"""
+        ProgressReporter.__init__(self, min_interval = min_interval, event_interval = event_interval);
+        self.description = description;
+
+    def report_progress(self, iteration: int, total: int):
+        """Prints the progress, overwriting the previous progress line."""
+        print(f"Just completed {self.description}: {iteration}", end='\r');
+
+    def report_event(self, name: str, message: str):
+        """Prints the event."""
+        print(f"{name}: {message}");
+
+class QueueProgressReporter(ProgressReporter):
+    """This is a reporter used in worker processes, it sends its reports to a queue read by a ProgressAggregator.
+    Reports are dropped when the queue is full so that a worker never waits for the parent process."""
+    def __init__(self, queue, worker_id, min_interval: float = 0.5, event_interval: float = 0.5):
+        """Creates a Queue Progress Reporter instance.
+        - queue: multiprocessing queue shared with the parent process
+        - worker_id: identifier of the worker in the aggregated reports"""
+        ProgressReporter.__init__(self, min_interval = min_interval, event_interval = event_interval);
+        self.queue = queue;
+        self.worker_id = worker_id;
+
+    def report_progress(self, iteration: int, total: int):
+        """Sends the progress to the parent process."""
+        try:
+            self.queue.put_nowait(("progress", self.worker_id, iteration, total));
+        except queue_module.Full:
+            pass;
+
+    def report_event(self, name: str, message: str):
+        """Sends the event to the parent process."""
+        try:
+            self.queue.put_nowait(("event", self.worker_id, name, message));
+        except queue_module.Full:
+            pass;
+
+############################################################################################
+# PROGRESS AGGREGATOR
+############################################################################################
+
+class ProgressAggregator:
+    """This is a class used in the parent process to combine the reports of QueueProgressReporters.
+    The combined progress is passed on to its own reporter as a single progress line."""
+    def __init__(self, queue, reporter: ProgressReporter = None, poll_interval: float = 0.1):
+        """Creates a Progress Aggregator instance.
+        - queue: multiprocessing queue given to the QueueProgressReporters of the workers
+        - reporter: reporter used for the combined reports, prints them when None
+        - poll_interval: seconds between reading the queue when running in the background"""
+        self.queue = queue;
+        self.reporter = reporter if reporter is not None else PrintProgressReporter();
+        self.poll_interval = poll_interval;
+
+        # Last reported progress of every worker
+        self.worker_progress = {};
+
+        # Background thread
+        self.thread = None;
+        self.stop_event = threading.Event();
+
+    def poll(self):
+        """Reads all reports currently in the queue and reports the combined progress."""
+        received = False;
+        while True:
+            try:
+                report = self.queue.get_nowait();
+            except queue_module.Empty:
+                break;
+            except (EOFError, OSError):
+                # Queue was closed
+                break;
+
+            received = True;
+            if report[0] == "progress":
+                _, worker_id, iteration, total = report;
+                self.worker_progress[worker_id] = (iteration, total);
+            elif report[0] == "event":
+                _, worker_id, name, message = report;
+                self.reporter.event(f"[{worker_id}] {name}", message);
+
+        if received and self.worker_progress:
+            self.reporter.progress(*self.combined_progress());
+
+    def combined_progress(self):
+        """Returns the summed [iteration, total] over all workers that reported."""
+        iteration = sum(progress[0] for progress in self.worker_progress.values());
+        total = sum(progress[1] for progress in self.worker_progress.values());
+
+        return [iteration, total];
+
+    def __run(self):
+        """Polls the queue until stopped."""
+        while not self.stop_event.wait(self.poll_interval):
+            self.poll();
+
+    def start(self):
+        """Starts reading the queue in a background thread."""
+        self.stop_event.clear();
+        self.thread = threading.Thread(target=self.__run, daemon=True);
+        self.thread.start();
+
+    def stop(self):
+        """Stops the background thread and reports the remaining progress."""
+        if self.thread is not None:
+            self.stop_event.set();
+            self.thread.join();
+            self.thread = None;
+        self.poll();
+        self.reporter.close();
+
+############################################################################################
+# AGENT EVENTS
+############################################################################################
+
+# Reporter used for the events of logging agents in this process
+event_reporter = PrintProgressReporter();
+
+def set_event_reporter(reporter: ProgressReporter):
+    """Sets the reporter used for the events of all logging agents in this process."""
+    global event_reporter;
+    event_reporter = reporter;
+
+def report_event(name: str, message: str):
+    """Reports an event of the agent with the given name to the event reporter of this process."""
+    event_reporter.event(name, message);
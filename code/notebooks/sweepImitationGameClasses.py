@@ -0,0 +1,259 @@
+# This file includes the classes used to sweep over game configurations with an adaptive amount of trials
+
+############################################################################################
+# IMPORTS
+############################################################################################
+
+# Import imitation game classes made in the first notebook
+from imitationGameClasses import Statistics;
+
+# Used for random number generation
+import random as rnd;
+
+# Used for running the trials in parallel worker processes
+from concurrent.futures import ProcessPoolExecutor;
+import os;
+
+# Used for reporting the progress of the sweep
+from progressReporterClasses import ProgressReporter, PrintProgressReporter, SilentProgressReporter;
+
+# Used for more complex mathematical operations
+import math;
+
+# Used for datatype representation
+import numpy as np;
+
+############################################################################################
+# SWEEP TRIAL
+############################################################################################
+
+# Statistics method giving the per agent values of every metric for a game state
+metric_methods = {"sound_size": "sound_sizes_from_game_state",
+                  "success_ratio": "success_ratios_from_agents",
+                  "energy": "energy_from_agents"};
+
+def play_sweep_trial(engine_class, engine_settings: dict, seed: int, metrics: list):
+    """Plays a single trial of a configuration and returns the value of every metric for its final game state,
+    the mean over the agents as done by the average_agent_* methods of Statistics.
+    The random state of the process is restored afterwards."""
+    random_state = rnd.getstate();
+    rnd.seed(seed);
+
+    try:
+        engine = engine_class(**engine_settings, progress_reporter = SilentProgressReporter());
+        game_state = engine.play_imitation_game([engine.iterations])[0];
+    finally:
+        rnd.setstate(random_state);
+
+    statistics = Statistics(engine_settings["bark_operator"]);
+
+    # Agents that did not play yet have no success ratio, they are left out of the mean
+    results = {};
+    for metric in metrics:
+        values = np.array(getattr(statistics, metric_methods[metric])(game_state), dtype=np.float64);
+        values = values[~np.isnan(values)];
+        results[metric] = float(values.mean()) if len(values) > 0 else float("nan");
+
+    return results;
+
+def play_sweep_trial_arguments(arguments: tuple):
+    """Plays a single sweep trial for a (engine_class, engine_settings, seed, metrics) tuple."""
+    return play_sweep_trial(*arguments);
+
+############################################################################################
+# ADAPTIVE SWEEP
+############################################################################################
+
+class AdaptiveSweep:
+    """This is a class used to play trials of many game configurations (cells) until the confidence interval
+    of the mean of every chosen metric is narrower than its target width.
+    Trials are played in parallel batches, every batch goes to the cells whose intervals are widest compared to their target.
+    For example
+        sweep = AdaptiveSweep(GameEngine, [dict(number_of_agents = n, iterations = 5000, synthesizer = synthesizer, bark_operator = bark_operator)
+                                            for n in [5, 10, 20]],
+                              target_widths = {"success_ratio": 0.01, "energy": 1});
+        results = sweep.run();"""
+    def __init__(self, engine_class, cell_settings: list, target_widths: dict, min_trials: int = 10, max_trials: int = 1000,
+                 batch_size: int = None, confidence: float = 0.95, workers: int = None, seed: int = None,
+                 progress_reporter: ProgressReporter = None):
+        """Creates an Adaptive Sweep instance.
+        - engine_class: GameEngine or CommunityGameEngine
+        - cell_settings: list of keyword argument dictionaries for the engine, one per configuration
+        - target_widths: target width of the confidence interval per metric, metrics are "sound_size", "success_ratio" and "energy"
+        - min_trials: amount of trials every cell starts with
+        - max_trials: amount of trials after which a cell is stopped even when its targets are not met
+        - batch_size: amount of trials played in parallel per batch, twice the amount of workers when None
+        - confidence: confidence level of the intervals (Student-t intervals)
+        - workers: amount of worker processes, the amount of CPUs when None
+        - seed: seed from which the seeds of all trials are drawn, random when None (results are reproducible for a fixed seed and batch_size)
+        - progress_reporter: reporter informed after every batch, printed when None"""
+        for metric in target_widths:
+            if metric not in metric_methods:
+                raise ValueError(f"Unknown metric {metric}, use one of {', '.join(metric_methods)}.");
+
+        self.engine_class = engine_class;
+        self.cell_settings = cell_settings;
+        self.target_widths = target_widths;
+        self.min_trials = min_trials;
+        self.max_trials = max_trials;
+        self.workers = workers if workers is not None else os.cpu_count();
+        self.batch_size = batch_size if batch_size is not None else 2 * self.workers;
+        self.confidence = confidence;
+        self.progress_reporter = progress_reporter if progress_reporter is not None else PrintProgressReporter(description = "sweep trials");
+
+        # Two sided t value of the confidence level per amount of degrees of freedom
+        self.t_values = {};
+
+        # Stream of trial seeds, drawn in scheduling order so that a sweep with a fixed seed is reproducible
+        self.seed_generator = rnd.Random(seed);
+
+        # Metric values of every played trial, per cell
+        self.trial_values = [{metric: [] for metric in target_widths} for _ in cell_settings];
+
+    @staticmethod
+    def student_t_probability(t: float, degrees_of_freedom: int):
+        """Returns the probability that a Student-t variable lies between -t and t,
+        by the closed form for an integer amount of degrees of freedom (Abramowitz and Stegun 26.7.3-4)."""
+        theta = math.atan(t / math.sqrt(degrees_of_freedom));
+        cos_squared = math.cos(theta)**2;
+
+        if degrees_of_freedom % 2 == 1:
+            term, total = 1.0, 0.0;
+            for k in range(1, (degrees_of_freedom - 1) // 2 + 1):
+                total += term;
+                term *= cos_squared * (2 * k) / (2 * k + 1);
+            return 2 / math.pi * (theta + math.sin(theta) * math.cos(theta) * total);
+
+        term, total = 1.0, 0.0;
+        for k in range(1, degrees_of_freedom // 2 + 1):
+            total += term;
+            term *= cos_squared * (2 * k - 1) / (2 * k);
+        return math.sin(theta) * total;
+
+    def t_value(self, degrees_of_freedom: int):
+        """Returns the two sided Student-t value of the confidence level, by bisection on student_t_probability."""
+        if degrees_of_freedom not in self.t_values:
+            low, high = 0.0, 1.0;
+            while self.student_t_probability(high, degrees_of_freedom) < self.confidence:
+                high *= 2;
+            for _ in range(100):
+                middle = (low + high) / 2;
+                if self.student_t_probability(middle, degrees_of_freedom) < self.confidence:
+                    low = middle;
+                else:
+                    high = middle;
+            self.t_values[degrees_of_freedom] = (low + high) / 2;
+
+        return self.t_values[degrees_of_freedom];
+
+    def trial_count(self, cell: int):
+        """Returns the amount of trials played for a cell."""
+        return len(next(iter(self.trial_values[cell].values())));
+
+    def metric_values(self, cell: int, metric: str):
+        """Returns the values of a metric of the trials of a cell as an array, trials without a value (nan) are left out."""
+        values = np.array(self.trial_values[cell][metric], dtype=np.float64);
+
+        return values[~np.isnan(values)];
+
+    def interval_width(self, cell: int, metric: str):
+        """Returns the width of the confidence interval of the mean of a metric of a cell."""
+        values = self.metric_values(cell, metric);
+        if len(values) < 2:
+            return float("inf");
+
+        return 2 * self.t_value(len(values) - 1) * values.std(ddof=1) / math.sqrt(len(values));
+
+    def needed_trials(self, cell: int):
+        """Returns the estimated amount of trials a cell needs to meet all its targets, at most max_trials."""
+        needed = self.min_trials;
+        for metric, target_width in self.target_widths.items():
+            values = self.metric_values(cell, metric);
+            if len(values) < 2:
+                continue;
+            needed = max(needed, math.ceil((2 * self.t_value(len(values) - 1) * values.std(ddof=1) / target_width)**2));
+
+        return min(needed, self.max_trials);
+
+    def is_done(self, cell: int):
+        """Returns whether a cell met all its targets or played max_trials trials."""
+        if self.trial_count(cell) >= self.max_trials:
+            return True;
+
+        return self.trial_count(cell) >= self.min_trials and all(self.interval_width(cell, metric) <= target_width
+                                                                  for metric, target_width in self.target_widths.items());
+
+    def noisiness(self, cell: int):
+        """Returns the largest ratio of interval width to target width over the metrics of a cell."""
+        return max(self.interval_width(cell, metric) / target_width for metric, target_width in self.target_widths.items());
+
+    def next_batch(self):
+        """Returns the cells of the trials of the next batch.
+        Cells below min_trials are filled first, the rest of the batch is divided over the unfinished cells
+        in proportion to their estimated remaining trials, the noisiest cells first."""
+        open_cells = [cell for cell in range(len(self.cell_settings)) if not self.is_done(cell)];
+
+        batch = [];
+        for cell in open_cells:
+            batch += [cell] * max(0, self.min_trials - self.trial_count(cell));
+        if batch:
+            return batch;
+
+        open_cells.sort(key=self.noisiness, reverse=True);
+        remaining = {cell: max(1, self.needed_trials(cell) - self.trial_count(cell)) for cell in open_cells};
+        total_remaining = sum(remaining.values());
+
+        for cell in open_cells:
+            share = max(1, round(self.batch_size * remaining[cell] / total_remaining));
+            batch += [cell] * min(share, remaining[cell], self.batch_size - len(batch));
+            if len(batch) >= self.batch_size:
+                break;
+
+        return batch;
+
+    def run(self):
+        """Plays trials until every cell is done and returns the results of every cell, see results."""
+        executor = ProcessPoolExecutor(max_workers = self.workers) if self.workers > 1 else None;
+
+        try:
+            batch = self.next_batch();
+            while batch:
+                trials = [(self.engine_class, self.cell_settings[cell], self.seed_generator.randrange(2**32), list(self.target_widths))
+                            for cell in batch];
+
+                if executor is not None:
+                    trial_results = list(executor.map(play_sweep_trial_arguments, trials));
+                else:
+                    trial_results = [play_sweep_trial_arguments(trial) for trial in trials];
+
+                for cell, values in zip(batch, trial_results):
+                    for metric, value in values.items():
+                        self.trial_values[cell][metric].append(value);
+
+                # Show progress, compared to the currently estimated total
+                played = sum(self.trial_count(cell) for cell in range(len(self.cell_settings)));
+                estimated = sum(max(self.trial_count(cell), self.needed_trials(cell)) for cell in range(len(self.cell_settings)));
+                self.progress_reporter.progress(played, estimated);
+
+                batch = self.next_batch();
+        finally:
+            if executor is not None:
+                executor.shutdown();
+
+        return self.results();
+
+    def results(self):
+        """Returns for every cell a dictionary with [mean, std, interval width, trial count] per metric,
+        trials without a value for a metric are not counted."""
+        results = [];
+        for cell in range(len(self.cell_settings)):
+            cell_results = {};
+            for metric in self.trial_values[cell]:
+                values = self.metric_values(cell, metric);
+                cell_results[metric] = [float(values.mean()) if len(values) > 0 else float("nan"),
+                                        float(values.std()) if len(values) > 0 else float("nan"),
+                                        float(self.interval_width(cell, metric)),
+                                        len(values)];
+            results.append(cell_results);
+
+        return results;